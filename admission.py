@@ -0,0 +1,194 @@
+"""
+Per-tenant admission control for the MCP server.
+Every request is assigned a lane (live-call tools, bulk work, admin work) and
+checked against its tenant's token bucket, its tenant's concurrency limit
+and the lane's share of the server's capacity. Live calls may use all of the
+capacity, lower lanes only part of it, so bulk operations and runaway retry
+loops cannot crowd out other clinics' calls. Requests over a limit are
+rejected at once (429 or 503 with Retry-After) instead of queueing.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from metrics import METRICS
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def try_take(self) -> float:
+        """Takes a token; returns 0 on success, else the seconds until one is available."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        """Returns True once the bucket has refilled, i.e. it is no different from a new one."""
+        return self.tokens + (self.clock() - self.updated) * self.rate >= self.burst
+
+@dataclass
+class LaneLimits:
+    share: float  # Fraction of the server's capacity the lane may fill
+    tenant_concurrency: int  # Requests in flight per tenant
+    rate: float  # Sustained requests per second per tenant
+    burst: float  # Token bucket size per tenant
+
+@dataclass
+class Rejection:
+    status: int
+    reason: str
+    retry_after: float
+
+class AdmissionController:
+    """
+    Tracks in-flight requests per lane and tenant and decides admission.
+
+    Tenants come from an unvalidated header, so their token buckets are
+    bounded: buckets that have refilled are dropped every `sweep_seconds`
+    (a new bucket starts full, so nothing changes for the tenant), and
+    beyond `max_tenants` buckets the least recently used are evicted.
+
+    Args:
+        capacity: Requests the server handles concurrently across all lanes
+        lanes: Limits per lane name
+        max_tenants: Token buckets kept at most
+        sweep_seconds: How often refilled buckets are dropped
+    """
+
+    def __init__(self, capacity: int, lanes: Dict[str, LaneLimits], clock: Callable[[], float] = time.monotonic,
+                 max_tenants: int = 10000, sweep_seconds: float = 60):
+        self.capacity = capacity
+        self.lanes = lanes
+        self.clock = clock
+        self.max_tenants = max_tenants
+        self.sweep_seconds = sweep_seconds
+        self.in_flight = 0
+        self._lane_in_flight: Dict[str, int] = {lane: 0 for lane in lanes}
+        self._tenant_in_flight: Dict[Tuple[str, str], int] = {}
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._swept_at = clock()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: Tuple[str, str], limits: LaneLimits) -> TokenBucket:
+        """Returns a tenant's bucket, creating it and evicting idle ones. Caller holds the lock."""
+        now = self.clock()
+        if now - self._swept_at >= self.sweep_seconds:
+            self._swept_at = now
+            for idle in [k for k, bucket in self._buckets.items() if k not in self._tenant_in_flight and bucket.is_full()]:
+                del self._buckets[idle]
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(limits.rate, limits.burst, self.clock)
+            while len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def try_admit(self, lane: str, tenant: Optional[str]) -> Optional[Rejection]:
+        """
+        Admits a request (returning None) or explains the rejection. An admitted
+        request must be released with release(). Requests without a tenant
+        are only subject to the lane's share of capacity.
+        """
+        limits = self.lanes[lane]
+        with self._lock:
+            if self.in_flight >= self.capacity * limits.share:
+                rejection = Rejection(503, "server_busy", 1.0)
+            elif tenant is not None:
+                key = (lane, tenant)
+                bucket = self._bucket(key, limits)
+                if self._tenant_in_flight.get(key, 0) >= limits.tenant_concurrency:
+                    rejection = Rejection(429, "tenant_concurrency", 0.5)
+                else:
+                    wait = bucket.try_take()
+                    rejection = Rejection(429, "tenant_rate", wait) if wait else None
+            else:
+                rejection = None
+
+            if rejection is None:
+                self.in_flight += 1
+                self._lane_in_flight[lane] += 1
+                if tenant is not None:
+                    self._tenant_in_flight[(lane, tenant)] = self._tenant_in_flight.get((lane, tenant), 0) + 1
+                METRICS.set_gauge("admission_in_flight", self._lane_in_flight[lane], labels={"lane": lane})
+        if rejection is not None:
+            METRICS.inc("admission_rejections_total", labels={"lane": lane, "reason": rejection.reason})
+        return rejection
+
+    def release(self, lane: str, tenant: Optional[str]) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._lane_in_flight[lane] -= 1
+            if tenant is not None:
+                key = (lane, tenant)
+                remaining = self._tenant_in_flight.get(key, 0) - 1
+                if remaining > 0:
+                    self._tenant_in_flight[key] = remaining
+                else:
+                    self._tenant_in_flight.pop(key, None)
+            METRICS.set_gauge("admission_in_flight", self._lane_in_flight[lane], labels={"lane": lane})
+
+# What the agent reads to the caller when a request is shed
+_REJECTION_MESSAGES = {
+    "server_busy": "The clinic system is very busy right now. Please try again in a moment.",
+    "tenant_concurrency": "Too many requests are in progress for this clinic. Please try again in a moment.",
+    "tenant_rate": "Too many requests were made for this clinic just now. Please try again in a moment.",
+}
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController. `classify(method, path)`
+    returns the request's lane, or None for requests that bypass admission
+    (health probes, long-lived streams).
+    """
+
+    def __init__(self, app, controller: AdmissionController, classify: Callable[[str, str], Optional[str]]):
+        self.app = app
+        self.controller = controller
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        lane = self.classify(scope["method"], scope["path"])
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        tenant = None
+        for name, value in scope["headers"]:
+            if name == b"x-user-id":
+                tenant = value.decode("latin-1").strip().lower() or None
+                break
+
+        rejection = self.controller.try_admit(lane, tenant)
+        if rejection is not None:
+            response = JSONResponse(
+                {"result": _REJECTION_MESSAGES[rejection.reason], "error": rejection.reason},
+                status_code=rejection.status,
+                headers={"Retry-After": str(max(1, round(rejection.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(lane, tenant)
@@ -7,30 +7,44 @@ from prompts import AGENT_INSTRUCTION_TEMPLATE, SESSION_INSTRUCTION
 from tools import (
     schedule_appointment,
     check_availability,
+    hold_slot,
+    release_hold,
     reschedule_appointment,
     cancel_appointment,
     get_available_slots,
+    next_available,
     get_today_date,
     add_call_history,
     call_mcp,
+    call_mcp_batch,
+    call_mcp_endpoint,
     get_doctor_details_for_user,
     get_user_id_by_agent_phone,
     get_appointment_details,
     list_appointments_for_patient,
     get_user_settings,
     set_correct_ids,
+    open_mcp_session,
+    close_mcp_session,
+    start_schedule_replica,
+    stop_schedule_replica,
     summarize_call  # Keep import for internal use only
 )
 from datetime import datetime, timedelta # Import timedelta
 import pytz # Import pytz
-from typing import Any
+from typing import Any, Optional
 import os
+from looplag import LoopLagMonitor
 
 # Define Indian Standard Time (IST) timezone
 IST = pytz.timezone('Asia/Kolkata')
 
 load_dotenv()
 
+# Event-loop lag of this worker process, shared by the calls it runs (see looplag.py).
+# The agent serves no /metrics, so the lag summaries carry the METRICS snapshot
+LOOP_MONITOR = LoopLagMonitor.from_env("agent", log_metrics=True)
+
 def generate_fallback_summary(appointment_status: str, conversation_text: str = "") -> str:
     """Generate a fallback summary based on appointment status and conversation context"""
     
@@ -68,6 +82,29 @@ def generate_fallback_summary(appointment_status: str, conversation_text: str =
     
     return base_summary + "."
 
+def format_caller_profile(profile: Optional[dict]) -> str:
+    """Formats a returning caller's profile as prompt context (empty for unknown callers)."""
+    if not profile or not profile.get("known"):
+        return ""
+    lines = [
+        "\n\n# Returning caller",
+        f"This caller's number has booked appointments for: {', '.join(profile['patient_names'])}.",
+    ]
+    upcoming = profile.get("upcoming_appointments") or []
+    if upcoming:
+        lines.append("Their upcoming appointments:")
+        for appointment in upcoming:
+            lines.append(
+                f"- {appointment['patient_name']} with {appointment['assigned_doctor']} on "
+                f"{appointment['appointment_date']} at {appointment['appointment_time']} "
+                f"(appointment_id: {appointment['appointment_id']}, reason: {appointment['appointment_reason']})"
+            )
+        lines.append("If the caller wants to reschedule or cancel one of these, confirm which one and use its appointment_id directly; do not look it up again.")
+    else:
+        lines.append("They have no upcoming appointments.")
+    lines.append("Still confirm the patient's name before acting; the phone may be shared by family members.")
+    return "\n".join(lines)
+
 def extract_call_context(ctx: Any) -> dict:
     """Extracts call_id, job_id, caller_number, called_number, call_start from context."""
     call_id = getattr(ctx.job, 'id', None)
@@ -106,9 +143,12 @@ class ClinicReceptionistAgent(Agent):
             tools = [
                 schedule_appointment,
                 check_availability,
+                hold_slot,
+                release_hold,
                 reschedule_appointment,
                 cancel_appointment,
                 get_available_slots,
+                next_available,
                 get_today_date,
                 get_doctor_details_for_user,
                 get_user_id_by_agent_phone,
@@ -163,6 +203,8 @@ class ClinicReceptionistAgent(Agent):
         return result
 
 async def entrypoint(ctx: JobContext) -> None:
+    # --- Monitor this process's event loop (no-op if already running) ---
+    LOOP_MONITOR.start()
     # --- Extract call metadata from LiveKit context ---
     context_info = extract_call_context(ctx)
     ctx.call_id = context_info["call_id"]
@@ -185,15 +227,40 @@ async def entrypoint(ctx: JobContext) -> None:
     else:
         ctx.user_id = user_id
     # --- Set the correct user_id and call_id for all tool calls ---
-    set_correct_ids(ctx.user_id, ctx.call_id)
+    set_correct_ids(ctx.user_id, ctx.call_id, ctx.caller_number)
+    # --- Open one MCP session for the whole call (no-op unless MCP_TRANSPORT=mcp) ---
+    await open_mcp_session(ctx.user_id, ctx.call_id)
+    # --- Follow today's/tomorrow's schedule so availability is answered locally ---
+    await start_schedule_replica(ctx.user_id, ctx.call_id)
     
-    # --- Fetch doctor details before agent speaks ---
-    doctor_details = await get_doctor_details_for_user(ctx.user_id, call_id=ctx.call_id)
+    # --- Fetch doctor details and the caller's profile before agent speaks (one round-trip) ---
+    bootstrap = await call_mcp_batch(
+        [
+            {"tool": "get_doctor_details_for_user", "args": {}},
+            {"tool": "get_caller_profile", "args": {}},
+        ],
+        user_id=ctx.user_id,
+        call_id=ctx.call_id,
+    )
+    for i, item in enumerate(bootstrap):
+        if item.get("error"):
+            # Retry a failed item on its own before speaking without it
+            print(f"WARNING: Bootstrap {item['tool']} failed ({item['error']}), calling it separately")
+            try:
+                bootstrap[i] = await call_mcp_endpoint(item["tool"], {}, user_id=ctx.user_id, call_id=ctx.call_id)
+            except Exception as e:
+                print(f"Error fetching {item['tool']}: {e}")
+                bootstrap[i] = {"result": None}
+    doctor_details = bootstrap[0].get("result")
+    doctor_details = doctor_details if isinstance(doctor_details, list) else []
+    caller_profile = bootstrap[1].get("result")
+    caller_profile = caller_profile if isinstance(caller_profile, dict) else None
     doctor_names = [d.get("name") for d in doctor_details]
 
     # --- Inject doctor names into the prompt/context for the LLM ---
     doctor_list_str = ', '.join(doctor_names)
     doctor_prompt = f"\n\n# Available doctors: {doctor_list_str}\nAlways use ONLY these names for doctor selection, prompts, and tool calls. Never invent or use any other doctor name."
+    doctor_prompt += format_caller_profile(caller_profile)
 
     # --- Inject current date and clinic details into prompts ---
     today = datetime.now(IST).strftime("%Y-%m-%d") # Use IST for today's date
@@ -267,12 +334,16 @@ async def entrypoint(ctx: JobContext) -> None:
                 ctx.tool_calls.append(f"Scheduled appointment for {data.get('patient_name', 'patient')} with {data.get('assigned_doctor', 'doctor')} on {data.get('appointment_date', 'date')}")
             elif endpoint == "check_availability":
                 ctx.tool_calls.append(f"Checked availability for {data.get('doctor_name', 'doctor')} on {data.get('appointment_date', 'date')}")
+            elif endpoint == "hold_slot":
+                ctx.tool_calls.append(f"Held a slot with {data.get('doctor_name', 'doctor')} on {data.get('appointment_date', 'date')}")
             elif endpoint == "reschedule_appointment":
                 ctx.tool_calls.append(f"Rescheduled appointment {data.get('appointment_id', 'ID')} to {data.get('new_date', 'date')}")
             elif endpoint == "cancel_appointment":
                 ctx.tool_calls.append(f"Cancelled appointment {data.get('appointment_id', 'ID')}")
             elif endpoint == "get_available_slots":
                 ctx.tool_calls.append(f"Retrieved available slots for {data.get('doctor_name', 'doctor')}")
+            elif endpoint == "next_available":
+                ctx.tool_calls.append(f"Searched upcoming openings for {data.get('doctor_name') or data.get('specialty') or 'any doctor'}")
         
         return result
     
@@ -382,6 +453,8 @@ async def entrypoint(ctx: JobContext) -> None:
             call_id=ctx.call_id,
             user_id=ctx.user_id,
         )
+        await stop_schedule_replica()
+        await close_mcp_session()
     session.on("close", lambda ev: asyncio.create_task(on_session_close(ev)))
 
     await session.start(
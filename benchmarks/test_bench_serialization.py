@@ -0,0 +1,44 @@
+"""
+Per-row cost of serializing an appointment list response.
+
+    round_trip_models  the original path: Appointment(**row).dict() per row,
+                       then FastAPI's jsonable_encoder and JSON rendering
+    encoder_passthrough  projected rows returned in a dict: no model round
+                         trip, but jsonable_encoder still walks every row
+    result_response    rows returned in a ResultResponse, rendered once by orjson
+
+Run with: pytest benchmarks --benchmark-storage=benchmarks/baselines --benchmark-compare
+"""
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import mcp_server as m
+
+ROWS = 500
+
+@pytest.fixture(scope="module")
+def rows():
+    return [
+        {
+            "appointment_id": f"SUN-{i:06d}", "user_id": "11111111-1111-1111-1111-111111111111",
+            "patient_name": "Ravi Kumar", "assigned_doctor": "Dr. Asha Rao",
+            "appointment_date": "2026-10-20", "appointment_time": "10:00:00",
+            "appointment_reason": "Follow-up on blood pressure medication", "current_status": "scheduled",
+            "event_id": f"evt{i}", "call_id": f"call-{i}", "patient_phone": "+919876543210",
+        }
+        for i in range(ROWS)
+    ]
+
+def test_round_trip_models(benchmark, rows):
+    benchmark.extra_info["rows"] = ROWS
+    benchmark(lambda: JSONResponse(jsonable_encoder({"result": [m.Appointment(**r).dict() for r in rows]})).body)
+
+def test_encoder_passthrough(benchmark, rows):
+    benchmark.extra_info["rows"] = ROWS
+    benchmark(lambda: ORJSONResponse(jsonable_encoder({"result": rows, "next_cursor": None})).body)
+
+def test_result_response(benchmark, rows):
+    benchmark.extra_info["rows"] = ROWS
+    benchmark(lambda: m.ResultResponse({"result": rows, "next_cursor": None}).body)
@@ -0,0 +1,26 @@
+"""
+Cold-start benchmarks: each round imports the server in a fresh interpreter.
+Run with: pytest benchmarks --benchmark-storage=benchmarks/baselines --benchmark-compare
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_python(code: str, **env) -> None:
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env={**os.environ, **env}, check=True, capture_output=True)
+
+def test_import_mcp_server(benchmark):
+    benchmark.pedantic(run_python, args=("import mcp_server",), rounds=5, iterations=1, warmup_rounds=1)
+
+def test_create_app_with_mcp_transport(benchmark):
+    benchmark.pedantic(
+        run_python, args=("import mcp_server; mcp_server.create_app()",),
+        kwargs={"MCP_PROTOCOL_ENABLED": "true"}, rounds=5, iterations=1, warmup_rounds=1,
+    )
+
+def test_interpreter_baseline(benchmark):
+    """Interpreter startup alone, to subtract from the numbers above."""
+    benchmark.pedantic(run_python, args=("pass",), rounds=5, iterations=1, warmup_rounds=1)
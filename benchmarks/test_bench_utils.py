@@ -0,0 +1,43 @@
+"""
+Cost of the time and date parsers in utils, per call.
+
+The public parsers are memoized, so each is measured twice: uncached (the
+wrapped function, i.e. the first time a string is seen) over a mix of the
+formats callers send, and cached (a repeated string, the common case for
+slot grids and working hours).
+
+Run with: pytest benchmarks --benchmark-storage=benchmarks/baselines --benchmark-compare
+"""
+
+import pytest
+
+from utils import format_time_for_db, normalize_times, parse_date, parse_datetime, parse_time
+
+TIMES = ["14:30", "2:30 PM", "9:00 am", "14:30:45", "2025-07-01T14:30:00Z", "11:15:00.250+05:30", "5 pm", "12:00 a.m."]
+DATES = ["2025-07-01", "01/07/2025", "1/7/25", "2025-07-01T14:30:00Z", "31/12/2025 9:00 am"]
+DATETIMES = ["2025-07-01 14:30", "01/07/2025 2:30 PM", "2025-07-01T14:30:00+05:30", "31/12/2025 9 am"]
+# A day's slot grid, as normalized for get_available_slots
+SLOT_GRID = [f"{(h - 1) % 12 + 1}:{m:02d} {'AM' if h < 12 else 'PM'}" for h in range(9, 19) for m in (0, 30)]
+
+def run_all(parse, values):
+    for value in values:
+        parse(value)
+
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+def test_parse_time(benchmark, cached):
+    benchmark(run_all, parse_time if cached else parse_time.__wrapped__, TIMES)
+
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+def test_parse_date(benchmark, cached):
+    benchmark(run_all, parse_date if cached else parse_date.__wrapped__, DATES)
+
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+def test_parse_datetime(benchmark, cached):
+    benchmark(run_all, parse_datetime if cached else parse_datetime.__wrapped__, DATETIMES)
+
+def test_normalize_times(benchmark):
+    benchmark.extra_info["values"] = len(SLOT_GRID)
+    benchmark(normalize_times, SLOT_GRID)
+
+def test_format_time_for_db(benchmark):
+    benchmark(run_all, format_time_for_db, TIMES)
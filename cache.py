@@ -0,0 +1,104 @@
+"""
+In-process caches for the MCP server.
+This module provides a small thread-safe TTL cache used for tenant settings
+and other lookups that change rarely but are read on every request.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    A thread-safe mapping whose entries expire after a fixed time-to-live.
+
+    Args:
+        ttl_seconds: Default lifetime of an entry
+        max_entries: When exceeded, expired entries are purged and then the
+            oldest entries are evicted
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Stores value under key for ttl_seconds (the cache default if omitted)."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def setdefault(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> Any:
+        """Atomically stores value under key unless a live entry exists, and returns the entry's value."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            self._entries[key] = (value, now + ttl)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+            return value
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], cache_none: bool = False) -> Any:
+        """
+        Returns the cached value for key, calling loader() on a miss.
+
+        None results are not cached unless cache_none is set.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None or cache_none:
+            self.set(key, value)
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        """Removes key from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes every key for which predicate(key) is true and returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self) -> None:
+        """Drops expired entries, then the oldest ones, until under max_entries. Caller holds the lock."""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
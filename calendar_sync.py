@@ -0,0 +1,204 @@
+"""
+Incremental Google Calendar sync for doctor availability.
+This module keeps an in-memory store of busy intervals per doctor calendar,
+kept current with incremental events.list calls using syncTokens, so that
+availability checks can honour blocks added directly in Google Calendar
+without calling Google on the request path.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils import IST
+
+# Private extended property set on events created for appointments; those are
+# already accounted for by appointment_details and are skipped by the sync
+APPOINTMENT_EVENT_PROPERTY = "syraa_appointment_id"
+
+# Busy intervals are kept for this many days ahead
+SYNC_HORIZON_DAYS = 30
+
+class BusyIntervalStore:
+    """
+    Busy intervals per calendar, indexed by event so that incremental changes
+    can replace or remove them.
+
+    Layout: calendar_id -> event_id -> [(start, end), ...] with IST datetimes.
+    """
+
+    def __init__(self):
+        self._events: Dict[str, Dict[str, List[Tuple[datetime, datetime]]]] = {}
+        self._lock = threading.Lock()
+
+    def replace_calendar(self, calendar_id: str, events: Dict[str, List[Tuple[datetime, datetime]]]) -> None:
+        """Replaces every interval of a calendar (after a full sync)."""
+        with self._lock:
+            self._events[calendar_id] = dict(events)
+
+    def apply_changes(self, calendar_id: str, changes: Dict[str, Optional[List[Tuple[datetime, datetime]]]]) -> None:
+        """Applies incremental changes; a None value removes the event."""
+        with self._lock:
+            events = self._events.setdefault(calendar_id, {})
+            for event_id, intervals in changes.items():
+                if intervals:
+                    events[event_id] = intervals
+                else:
+                    events.pop(event_id, None)
+
+    def has_calendar(self, calendar_id: str) -> bool:
+        """Returns True once a calendar has completed at least one full sync."""
+        with self._lock:
+            return calendar_id in self._events
+
+    def busy_intervals(self, calendar_id: str, day: str) -> List[Tuple[datetime, datetime]]:
+        """Returns the busy intervals of a calendar overlapping a YYYY-MM-DD date."""
+        day_start = IST.localize(datetime.strptime(day, "%Y-%m-%d"))
+        day_end = day_start + timedelta(days=1)
+        with self._lock:
+            events = self._events.get(calendar_id, {})
+            return sorted(
+                (start, end)
+                for intervals in events.values()
+                for start, end in intervals
+                if start < day_end and end > day_start
+            )
+
+    def is_busy(self, calendar_id: str, day: str, time_str: str, duration_minutes: int = 30) -> bool:
+        """Returns True if [time, time + duration) on day overlaps a busy interval."""
+        start = IST.localize(datetime.strptime(f"{day} {time_str}", "%Y-%m-%d %H:%M:%S"))
+        end = start + timedelta(minutes=duration_minutes)
+        return any(s < end and e > start for s, e in self.busy_intervals(calendar_id, day))
+
+def _event_intervals(event: dict) -> Optional[List[Tuple[datetime, datetime]]]:
+    """
+    Converts a Calendar event into busy intervals.
+
+    Returns None for events that do not block time: cancelled, transparent
+    ("free"), created for an appointment by this server, or outside the horizon.
+    """
+    if event.get("status") == "cancelled" or event.get("transparency") == "transparent":
+        return None
+    private = (event.get("extendedProperties") or {}).get("private") or {}
+    if APPOINTMENT_EVENT_PROPERTY in private:
+        return None
+
+    start, end = event.get("start") or {}, event.get("end") or {}
+    if "dateTime" in start and "dateTime" in end:
+        start_dt = datetime.fromisoformat(start["dateTime"].replace("Z", "+00:00")).astimezone(IST)
+        end_dt = datetime.fromisoformat(end["dateTime"].replace("Z", "+00:00")).astimezone(IST)
+    elif "date" in start and "date" in end:
+        # All-day events block whole days (end date is exclusive)
+        start_dt = IST.localize(datetime.strptime(start["date"], "%Y-%m-%d"))
+        end_dt = IST.localize(datetime.strptime(end["date"], "%Y-%m-%d"))
+    else:
+        return None
+
+    now = datetime.now(IST)
+    if end_dt < now - timedelta(days=1) or start_dt > now + timedelta(days=SYNC_HORIZON_DAYS):
+        return None
+    return [(start_dt, end_dt)]
+
+class CalendarSyncer:
+    """
+    Keeps a BusyIntervalStore in sync with doctors' Google Calendars.
+
+    The first sync of a calendar lists every event and stores the returned
+    nextSyncToken; later syncs pass that token so only changed events are
+    transferred. An expired token (HTTP 410) triggers a full resync, and a
+    full resync also runs daily so events entering the horizon are picked up.
+
+    Requests are run by `execute` (by default request.execute()), so the
+    server can route them through its Calendar deadline and breaker.
+    """
+
+    def __init__(self, store: BusyIntervalStore, interval_seconds: float = 60, full_sync_seconds: float = 24 * 3600,
+                 execute: Optional[Callable[[object], dict]] = None):
+        self.store = store
+        self.interval_seconds = interval_seconds
+        self.full_sync_seconds = full_sync_seconds
+        self.execute = execute or (lambda request: request.execute())
+        self._sync_tokens: Dict[str, str] = {}
+        self._last_full_sync = time.monotonic()
+
+    def sync_calendar(self, service, calendar_id: str) -> int:
+        """Synchronizes one calendar (blocking) and returns the number of changed events."""
+        sync_token = self._sync_tokens.get(calendar_id)
+        try:
+            changes, next_token = self._list_events(service, calendar_id, sync_token)
+        except Exception as e:
+            if sync_token and getattr(getattr(e, "resp", None), "status", None) == 410:
+                print(f"Calendar sync token expired for {calendar_id}, running a full sync")
+                self._sync_tokens.pop(calendar_id, None)
+                changes, next_token = self._list_events(service, calendar_id, None)
+                sync_token = None
+            else:
+                raise
+
+        if sync_token:
+            self.store.apply_changes(calendar_id, changes)
+        else:
+            self.store.replace_calendar(calendar_id, {k: v for k, v in changes.items() if v})
+        if next_token:
+            self._sync_tokens[calendar_id] = next_token
+        return len(changes)
+
+    def _list_events(self, service, calendar_id: str, sync_token: Optional[str]) -> tuple:
+        """
+        Lists events from the start of today (IST) on, or with a sync token the
+        events changed since; across pages. The token returned by a full sync
+        keeps later incremental syncs to the same window.
+        """
+        changes = {}
+        page_token = None
+        while True:
+            params = {"calendarId": calendar_id, "singleEvents": True, "showDeleted": True, "maxResults": 2500}
+            if sync_token:
+                params["syncToken"] = sync_token
+            else:
+                # Google rejects timeMin together with a sync token
+                params["timeMin"] = IST.localize(datetime.combine(datetime.now(IST).date(), datetime.min.time())).isoformat()
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.execute(service.events().list(**params))
+            for event in response.get("items", []):
+                changes[event["id"]] = _event_intervals(event)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return changes, response.get("nextSyncToken")
+
+    def _sync_target(self, get_service: Callable[[dict], object], calendar_auth: dict, calendar_id: str) -> int:
+        """Builds the Calendar service and synchronizes one calendar with it (blocking)."""
+        service = get_service(calendar_auth)
+        if service is None:
+            return 0
+        return self.sync_calendar(service, calendar_id)
+
+    async def run_forever(self, load_targets: Callable[[], List[tuple]], get_service: Callable[[dict], object]) -> None:
+        """
+        Periodically syncs every target calendar in a worker thread.
+
+        Args:
+            load_targets: Returns a list of (calendar_auth, calendar_id) pairs
+            get_service: Builds a Calendar service from calendar_auth
+        """
+        while True:
+            if time.monotonic() - self._last_full_sync > self.full_sync_seconds:
+                self._sync_tokens.clear()
+                self._last_full_sync = time.monotonic()
+            try:
+                targets = await asyncio.to_thread(load_targets)
+                for calendar_auth, calendar_id in targets:
+                    try:
+                        # Built and used in one worker call: get_service may cache
+                        # per thread, and Calendar clients are not thread-safe
+                        changed = await asyncio.to_thread(self._sync_target, get_service, calendar_auth, calendar_id)
+                        if changed:
+                            print(f"DEBUG: Calendar sync applied {changed} changes for {calendar_id}")
+                    except Exception as e:
+                        print(f"Error syncing calendar {calendar_id}: {e}")
+            except Exception as e:
+                print(f"Error loading calendar sync targets: {e}")
+            await asyncio.sleep(self.interval_seconds)
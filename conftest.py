@@ -0,0 +1,15 @@
+"""
+Shared pytest setup for tests/ and benchmarks/.
+The server reads its configuration from the environment at import; these
+defaults keep it from reaching Supabase, Google or the realtime feed.
+"""
+
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://supabase.invalid")
+os.environ.setdefault("SUPABASE_KEY", "test.supabase.key")
+os.environ.setdefault("MCP_PROTOCOL_ENABLED", "false")
+os.environ.setdefault("INVALIDATION_ENABLED", "false")
+os.environ.setdefault("CALENDAR_SYNC_INTERVAL_SECONDS", "0")
+os.environ.setdefault("PHONE_INDEX_REFRESH_SECONDS", "0")
+os.environ.setdefault("ADMISSION_ENABLED", "false")
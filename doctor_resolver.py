@@ -0,0 +1,115 @@
+"""
+Doctor-name resolution for the MCP server.
+The LLM passes doctors as it heard or remembered them ("Dr. Sharma",
+"sharma", "DR ANITA SHARMA", "the cardiologist"). A DoctorResolver is built
+from a tenant's doctor list once, when its settings load, and maps any of
+these spellings to the canonical doctor with a single dict lookup, so
+queries and bookings always use the name stored in user_settings.
+"""
+
+import re
+from typing import Dict, Generic, Iterable, List, Optional, TypeVar
+
+from name_index import normalize_name
+
+# Anything with .name and .specialty (the server's Doctor model)
+D = TypeVar("D")
+
+# Everyday words callers use for a specialty, keyed to its stem (see _stem)
+_SPECIALTY_ALIASES = {
+    "heart": "cardiolog",
+    "skin": "dermatolog",
+    "hair": "dermatolog",
+    "child": "pediatr",
+    "children": "pediatr",
+    "kids": "pediatr",
+    "paediatr": "pediatr",
+    "tooth": "dent",
+    "teeth": "dent",
+    "dental": "dent",
+    "bone": "orthoped",
+    "bones": "orthoped",
+    "orthopaed": "orthoped",
+    "eye": "ophthalmolog",
+    "eyes": "ophthalmolog",
+    "women": "gynecolog",
+    "gynaecolog": "gynecolog",
+    "ear": "ent",
+    "nose": "ent",
+    "throat": "ent",
+}
+
+# Filler around a specialty ("the heart doctor", "a skin specialist")
+_SPECIALTY_FILLER = {"the", "a", "an", "doctor", "doc", "specialist", "consultant", "department", "dept"}
+
+_SUFFIXES = ("istry", "icians", "ician", "ists", "ist", "ics", "ies", "ic", "y", "s")
+
+def _stem(word: str) -> str:
+    """Reduces a specialty word to a stem shared by its variants (cardiology/cardiologist, pediatrics/pediatrician)."""
+    if word in _SPECIALTY_ALIASES:
+        return _SPECIALTY_ALIASES[word]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return _SPECIALTY_ALIASES.get(word, word)
+
+def specialty_key(text: str) -> str:
+    """Returns the lookup key of a specialty or a caller's description of one."""
+    words = re.sub(r"[^a-z ]+", " ", (text or "").lower()).split()
+    return " ".join(_stem(w) for w in words if w not in _SPECIALTY_FILLER)
+
+def doctor_key(name: str) -> str:
+    """Returns the lookup key of a doctor name: lowercase, without titles or punctuation."""
+    return normalize_name(re.sub(r"\bdoctor\b", " ", (name or "").lower()))
+
+class DoctorResolver(Generic[D]):
+    """
+    Maps the ways a doctor may be referred to onto the tenant's doctors.
+
+    Keys, in order of precedence: the exact stored name, the normalized full
+    name, a single name part (first or last name), the specialty. A part or
+    specialty shared by several doctors is ambiguous and resolves to none of
+    them.
+    """
+
+    def __init__(self, doctors: Iterable[D]):
+        self.doctors: List[D] = list(doctors)
+        self._exact: Dict[str, D] = {d.name: d for d in self.doctors}
+        self._names: Dict[str, D] = {}
+        self._by_specialty: Dict[str, List[D]] = {}
+        parts: Dict[str, List[D]] = {}
+        for doctor in self.doctors:
+            key = doctor_key(doctor.name)
+            self._names.setdefault(key, doctor)
+            for part in key.split():
+                parts.setdefault(part, []).append(doctor)
+            self._by_specialty.setdefault(specialty_key(doctor.specialty), []).append(doctor)
+
+        self._fallback: Dict[str, D] = {}
+        for part, matches in parts.items():
+            if len(matches) == 1:
+                self._fallback[part] = matches[0]
+        for key, matches in self._by_specialty.items():
+            if len(matches) == 1:
+                self._fallback.setdefault(key, matches[0])
+
+    def resolve(self, name: Optional[str]) -> Optional[D]:
+        """Returns the doctor a name or description refers to, or None if it is unknown or ambiguous."""
+        if not name:
+            return None
+        doctor = self._exact.get(name)
+        if doctor is not None:
+            return doctor
+        key = doctor_key(name)
+        return self._names.get(key) or self._fallback.get(key) or self._fallback.get(specialty_key(name))
+
+    def for_specialty(self, specialty: str) -> List[D]:
+        """Returns the doctors practising a specialty, however the caller phrased it."""
+        key = specialty_key(specialty)
+        if not key:
+            return []
+        # Every stem must be one of the specialty's, so "cardiologist" finds
+        # "Interventional Cardiology" but "ent" does not find "dent" (dentistry)
+        stems = set(key.split())
+        return [d for spec, doctors in self._by_specialty.items() if stems <= set(spec.split()) for d in doctors]
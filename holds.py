@@ -0,0 +1,242 @@
+"""
+Short-lived slot holds for the MCP server.
+While the agent confirms a time with the caller, the slot is held for that
+call so other callers see it as taken. Holds expire on their own; expiry is
+tracked by a hashed timer wheel that is advanced lazily on each operation.
+"""
+
+import math
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+# A hold is identified by (user_id, doctor_name, appointment_date, appointment_time)
+SlotKey = Tuple[str, str, str, str]
+
+class TimerWheel:
+    """
+    Hashed timer wheel: timers are bucketed by expiry tick, so scheduling and
+    cancelling are O(1) and advancing only visits the buckets that elapsed.
+
+    Not thread-safe; HoldManager serializes access.
+
+    Args:
+        tick_seconds: Expiry resolution
+        wheel_size: Number of buckets; timers further out than one revolution
+            wait in their bucket for the remaining rounds
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, wheel_size: int = 512, clock: Callable[[], float] = time.monotonic):
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self.clock = clock
+        self._buckets: List[Dict[Hashable, int]] = [{} for _ in range(wheel_size)]
+        self._timers: Dict[Hashable, int] = {}
+        self._current_tick = self._tick(clock())
+
+    def _tick(self, now: float) -> int:
+        return int(now // self.tick_seconds)
+
+    def schedule(self, key: Hashable, delay_seconds: float) -> None:
+        """Schedules (or reschedules) key to expire after delay_seconds."""
+        self.cancel(key)
+        # Round up so a timer never fires early, and fires on the tick it is due
+        tick = max(math.ceil((self.clock() + delay_seconds) / self.tick_seconds), self._current_tick + 1)
+        self._buckets[tick % self.wheel_size][key] = tick
+        self._timers[key] = tick
+
+    def cancel(self, key: Hashable) -> None:
+        """Removes key's timer if present."""
+        tick = self._timers.pop(key, None)
+        if tick is not None:
+            self._buckets[tick % self.wheel_size].pop(key, None)
+
+    def advance(self) -> List[Hashable]:
+        """Moves the wheel to the current time and returns the keys that expired."""
+        target = self._tick(self.clock())
+        expired = []
+        # After a full revolution every bucket has been visited once
+        steps = min(target - self._current_tick, self.wheel_size)
+        for offset in range(1, steps + 1):
+            bucket = self._buckets[(self._current_tick + offset) % self.wheel_size]
+            for key in [k for k, tick in bucket.items() if tick <= target]:
+                del bucket[key]
+                del self._timers[key]
+                expired.append(key)
+        self._current_tick = max(self._current_tick, target)
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+@dataclass
+class Hold:
+    hold_id: str
+    call_id: str
+    expires_at: float
+    booking: bool = False  # Set while the holder's booking is being written
+
+class HoldManager:
+    """
+    Slot holds per tenant, each owned by one call.
+
+    Args:
+        ttl_seconds: Lifetime of a hold unless renewed
+        on_expire: Called with (slot_key, hold) for each hold that expires
+    """
+
+    def __init__(self, ttl_seconds: float = 120, on_expire: Optional[Callable[[SlotKey, Hold], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.on_expire = on_expire
+        self.clock = clock
+        self._holds: Dict[SlotKey, Hold] = {}
+        self._by_call: Dict[Tuple[str, str], Set[SlotKey]] = {}
+        self._wheel = TimerWheel(tick_seconds=1.0, clock=clock)
+        self._lock = threading.Lock()
+
+    def _expire(self) -> List[Tuple[SlotKey, Hold]]:
+        """Drops holds whose timers elapsed. Caller holds the lock."""
+        expired = []
+        for key in self._wheel.advance():
+            hold = self._holds.get(key)
+            if hold is None or hold.booking:
+                continue
+            self._drop(key)
+            expired.append((key, hold))
+        return expired
+
+    def _drop(self, key: SlotKey) -> Optional[Hold]:
+        """Removes a hold. Caller holds the lock."""
+        hold = self._holds.pop(key, None)
+        if hold is None:
+            return None
+        self._wheel.cancel(key)
+        call_keys = self._by_call.get((key[0], hold.call_id))
+        if call_keys is not None:
+            call_keys.discard(key)
+            if not call_keys:
+                del self._by_call[(key[0], hold.call_id)]
+        return hold
+
+    def _notify(self, expired: List[Tuple[SlotKey, Hold]]) -> None:
+        if self.on_expire:
+            for key, hold in expired:
+                try:
+                    self.on_expire(key, hold)
+                except Exception as e:
+                    print(f"Error handling hold expiry: {e}")
+
+    def place(self, key: SlotKey, call_id: str) -> Tuple[Optional[Hold], bool]:
+        """
+        Holds a slot for call_id, or renews the call's existing hold.
+
+        Returns (hold, created); hold is None if another call holds the slot.
+        """
+        with self._lock:
+            expired = self._expire()
+            hold = self._holds.get(key)
+            created = False
+            if hold is not None and hold.call_id != call_id:
+                hold = None
+            else:
+                if hold is None:
+                    hold = Hold(hold_id=uuid.uuid4().hex, call_id=call_id, expires_at=0)
+                    self._holds[key] = hold
+                    self._by_call.setdefault((key[0], call_id), set()).add(key)
+                    created = True
+                hold.expires_at = self.clock() + self.ttl_seconds
+                self._wheel.schedule(key, self.ttl_seconds)
+        self._notify(expired)
+        return hold, created
+
+    def holder(self, key: SlotKey) -> Optional[str]:
+        """Returns the call_id holding a slot, or None."""
+        with self._lock:
+            expired = self._expire()
+            hold = self._holds.get(key)
+        self._notify(expired)
+        return hold.call_id if hold else None
+
+    def held_times(self, user_id: str, doctor_name: str, appointment_date: str, exclude_call_id: Optional[str] = None) -> Set[str]:
+        """Returns the held appointment times of a doctor on a date, except those of exclude_call_id."""
+        with self._lock:
+            expired = self._expire()
+            times = {
+                key[3] for key, hold in self._holds.items()
+                if key[:3] == (user_id, doctor_name, appointment_date) and hold.call_id != exclude_call_id
+            }
+        self._notify(expired)
+        return times
+
+    def holds_for(self, user_id: str, dates: List[str]) -> List[Tuple[SlotKey, Hold]]:
+        """Returns a tenant's holds on the given dates."""
+        with self._lock:
+            expired = self._expire()
+            holds = [(key, hold) for key, hold in self._holds.items() if key[0] == user_id and key[2] in dates]
+        self._notify(expired)
+        return holds
+
+    def begin_booking(self, key: SlotKey, call_id: str) -> Tuple[Optional[Hold], bool]:
+        """
+        Claims a slot for call_id's booking: converts the call's hold, or takes
+        a new one if the slot is free. While booking, the hold cannot expire.
+
+        Returns (hold, created); hold is None if another call holds the slot.
+        """
+        with self._lock:
+            expired = self._expire()
+            hold = self._holds.get(key)
+            created = False
+            if hold is None:
+                hold = Hold(hold_id=uuid.uuid4().hex, call_id=call_id, expires_at=self.clock() + self.ttl_seconds)
+                self._holds[key] = hold
+                self._by_call.setdefault((key[0], call_id), set()).add(key)
+                created = True
+            elif hold.call_id != call_id or hold.booking:
+                hold = None
+            if hold is not None:
+                hold.booking = True
+                self._wheel.cancel(key)
+        self._notify(expired)
+        return hold, created
+
+    def finish_booking(self, key: SlotKey, keep: bool) -> Optional[Hold]:
+        """
+        Ends a booking started with begin_booking: drops the hold (returning
+        it), or with keep set, lets it run on until its original expiry.
+        """
+        with self._lock:
+            hold = self._holds.get(key)
+            if hold is None:
+                return None
+            if not keep:
+                return self._drop(key)
+            hold.booking = False
+            self._wheel.schedule(key, max(hold.expires_at - self.clock(), 0))
+            return None
+
+    def release(self, key: SlotKey, call_id: str) -> Optional[Hold]:
+        """Releases call_id's hold on a slot and returns it, if any."""
+        with self._lock:
+            hold = self._holds.get(key)
+            if hold is None or hold.call_id != call_id or hold.booking:
+                return None
+            return self._drop(key)
+
+    def release_call(self, user_id: str, call_id: str) -> List[Tuple[SlotKey, Hold]]:
+        """Releases every hold of a call."""
+        with self._lock:
+            released = []
+            for key in list(self._by_call.get((user_id, call_id), ())):
+                if not self._holds[key].booking:
+                    released.append((key, self._drop(key)))
+            return released
+
+    def sweep(self) -> None:
+        """Expires elapsed holds (called periodically so expiries are published promptly)."""
+        with self._lock:
+            expired = self._expire()
+        self._notify(expired)
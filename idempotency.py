@@ -0,0 +1,87 @@
+"""
+Idempotent replay of mutating tool calls.
+LLM agents retry tool calls (timeouts, re-planning, repeated turns). A retried
+booking, reschedule or cancellation must not run twice, so completed results
+are stored per idempotency key for a short time and replayed to repeats
+without touching Supabase or Google Calendar.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, Hashable, Optional
+
+import orjson
+
+from cache import TTLCache
+from metrics import METRICS
+
+class _Pending:
+    """Marks a key whose first attempt is still running."""
+
+def derive_idempotency_key(call_id: Optional[str], tool: str, args: dict) -> str:
+    """Builds the default key for a tool call: a hash of call_id, tool and arguments."""
+    payload = orjson.dumps([call_id, tool, args], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+class IdempotencyStore:
+    """
+    Stores completed tool responses by (tenant, call, key).
+
+    Only responses accepted by the caller's store_if predicate are kept, so a
+    failed attempt can be retried. A concurrent repeat waits for the first
+    attempt instead of running alongside it.
+
+    Derived keys (hashes of the arguments) only guard immediate repeats: when
+    a call completes another mutation, its earlier derived entries are dropped,
+    so e.g. booking, cancelling and booking the same slot again still books.
+    """
+
+    def __init__(self, ttl_seconds: float = 600, pending_seconds: float = 30):
+        self.pending_seconds = pending_seconds
+        self._responses = TTLCache(ttl_seconds)
+
+    async def run(
+        self,
+        scope: tuple,
+        key: str,
+        derived: bool,
+        call: Callable[[], Awaitable[dict]],
+        store_if: Callable[[dict], bool],
+    ) -> dict:
+        """
+        Returns the stored response for key, or runs call() and stores its response.
+
+        Args:
+            scope: (user_id, call_id) the key belongs to
+            key: Client-supplied Idempotency-Key or a derived key
+            derived: True if key was derived from the arguments
+            call: Runs the mutation
+            store_if: Decides whether a response is final and may be replayed
+        """
+        entry_key: Hashable = (*scope, key, derived)
+        deadline = time.monotonic() + self.pending_seconds
+        while True:
+            marker = _Pending()
+            existing = self._responses.setdefault(entry_key, marker, ttl_seconds=self.pending_seconds)
+            if existing is marker:
+                break
+            if not isinstance(existing, _Pending):
+                METRICS.inc("idempotent_replays_total")
+                print(f"DEBUG: Replaying stored response for idempotency key {key[:16]}")
+                return existing
+            if time.monotonic() > deadline:
+                break
+            await asyncio.sleep(0.05)
+
+        try:
+            response = await call()
+        except BaseException:
+            self._responses.delete(entry_key)
+            raise
+        if response is not None and store_if(response):
+            self._responses.delete_where(lambda k: k[:len(scope)] == scope and k[-1] and k != entry_key)
+            self._responses.set(entry_key, response)
+        else:
+            self._responses.delete(entry_key)
+        return response
@@ -0,0 +1,131 @@
+"""
+Cache-invalidation change feed for the MCP server.
+Every uvicorn worker and replica subscribes to row changes on the tables its
+caches derive from, and evicts the affected keys when a change arrives. In
+production the changes come from Supabase realtime; LocalPubSub is an
+in-process stand-in that connects several buses directly (for tests and
+single-host development).
+"""
+
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from metrics import METRICS
+
+# Handlers receive one normalized change:
+# {"table", "type" (INSERT/UPDATE/DELETE), "record", "old_record", "commit_timestamp"}
+ChangeHandler = Callable[[dict], None]
+
+def normalize_change(payload: dict) -> dict:
+    """Normalizes a Supabase realtime postgres_changes payload (or a local one)."""
+    data = payload.get("data", payload)
+    return {
+        "table": data.get("table"),
+        "type": data.get("type") or data.get("eventType"),
+        "record": data.get("record") or data.get("new") or {},
+        "old_record": data.get("old_record") or data.get("old") or {},
+        "commit_timestamp": data.get("commit_timestamp"),
+    }
+
+class InvalidationBus:
+    """
+    Dispatches table change events to the cache handlers of one process.
+
+    Staleness (time from commit to eviction) is recorded in the
+    invalidation_staleness_seconds histogram, per table.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[ChangeHandler]] = {}
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self._handlers)
+
+    def subscribe(self, table: str, handler: ChangeHandler) -> None:
+        """Registers handler for changes on table."""
+        self._handlers.setdefault(table, []).append(handler)
+
+    def dispatch(self, payload: dict) -> None:
+        """Runs the handlers for one change event."""
+        change = normalize_change(payload)
+        table = change["table"]
+        for handler in self._handlers.get(table, []):
+            try:
+                handler(change)
+            except Exception as e:
+                print(f"Error handling invalidation for {table}: {e}")
+        METRICS.inc("invalidation_events_total", labels={"table": table})
+
+        staleness = _staleness_seconds(change.get("commit_timestamp"))
+        if staleness is not None:
+            METRICS.observe("invalidation_staleness_seconds", staleness, labels={"table": table})
+            METRICS.set_gauge("invalidation_last_staleness_seconds", staleness, labels={"table": table})
+
+def _staleness_seconds(commit_timestamp) -> Optional[float]:
+    """Returns seconds elapsed since commit_timestamp (ISO string or epoch seconds)."""
+    if commit_timestamp is None:
+        return None
+    try:
+        if isinstance(commit_timestamp, (int, float)):
+            committed = float(commit_timestamp)
+        else:
+            committed = datetime.fromisoformat(str(commit_timestamp).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+    return max(0.0, time.time() - committed)
+
+class LocalPubSub:
+    """
+    In-process stand-in for the realtime change feed: publishing a change
+    delivers it to every attached bus, as realtime would to every worker.
+    """
+
+    def __init__(self):
+        self._buses: List[InvalidationBus] = []
+
+    def attach(self, bus: InvalidationBus) -> None:
+        self._buses.append(bus)
+
+    def publish(self, table: str, change_type: str, record: dict, old_record: Optional[dict] = None) -> None:
+        payload = {
+            "table": table,
+            "type": change_type,
+            "record": record,
+            "old_record": old_record or {},
+            "commit_timestamp": time.time(),
+        }
+        for bus in self._buses:
+            bus.dispatch(payload)
+
+class SupabaseRealtimeListener:
+    """Feeds an InvalidationBus from Supabase realtime postgres_changes."""
+
+    def __init__(self, bus: InvalidationBus, supabase_url: str, supabase_key: str):
+        self.bus = bus
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self._client = None
+        self._channel = None
+
+    async def start(self) -> None:
+        """Connects and subscribes to every table the bus has handlers for."""
+        from supabase import acreate_client
+
+        self._client = await acreate_client(self.supabase_url, self.supabase_key)
+        self._channel = self._client.channel("syraa-cache-invalidation")
+        for table in self.bus.tables:
+            self._channel.on_postgres_changes("*", callback=self.bus.dispatch, table=table, schema="public")
+        await self._channel.subscribe()
+        print(f"Subscribed to realtime changes for: {', '.join(self.bus.tables)}")
+
+    async def stop(self) -> None:
+        """Unsubscribes from realtime."""
+        if self._client is not None and self._channel is not None:
+            try:
+                await self._client.remove_channel(self._channel)
+            except Exception as e:
+                print(f"Error leaving realtime channel: {e}")
+        self._client = None
+        self._channel = None
@@ -0,0 +1,157 @@
+"""
+Event-loop lag monitoring for the agent and the MCP server.
+Both processes run synchronous I/O (Supabase queries, Gemini and Calendar
+calls) next to async code, so a blocking call can stall every conversation
+or request sharing the loop. A LoopLagMonitor measures how late the loop
+wakes up from a short sleep and records the lag in METRICS. In debug mode
+a watchdog thread also catches the loop while it is stalled and logs what
+it is running, with the stack.
+
+The server exposes METRICS on /metrics. The agent has no HTTP endpoint
+(LiveKit runs each call in its own job process), so its monitor logs the
+process's METRICS snapshot with every lag summary instead.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from metrics import METRICS
+
+# Lag histogram buckets, in seconds
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def log_event(event: str, **fields) -> None:
+    """Prints one structured (JSON) log line."""
+    print(json.dumps({"event": event, **fields}, default=str))
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag and, in debug mode, reports stalls.
+
+    Args:
+        process: "agent" or "mcp_server", used as the metrics label
+        interval_seconds: How often the loop is probed
+        stall_threshold_seconds: In debug mode, a loop held longer than this
+            is reported with the stack of the code holding it
+        debug: Start the stall watchdog
+        report_seconds: How often a lag summary is logged (0 disables it)
+        log_metrics: Include the process's METRICS snapshot in each summary,
+            for processes that do not serve /metrics
+    """
+
+    def __init__(
+        self,
+        process: str,
+        interval_seconds: float = 0.1,
+        stall_threshold_seconds: float = 0.25,
+        debug: bool = False,
+        report_seconds: float = 60,
+        log_metrics: bool = False,
+    ):
+        self.process = process
+        self.interval_seconds = interval_seconds
+        self.stall_threshold_seconds = stall_threshold_seconds
+        self.debug = debug
+        self.report_seconds = report_seconds
+        self.log_metrics = log_metrics
+        self._task: Optional[asyncio.Task] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._stopped = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, process: str, log_metrics: bool = False) -> "LoopLagMonitor":
+        """Builds a monitor configured by LOOP_LAG_* environment variables."""
+        return cls(
+            process,
+            interval_seconds=float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1")),
+            stall_threshold_seconds=float(os.getenv("LOOP_LAG_STALL_SECONDS", "0.25")),
+            debug=os.getenv("LOOP_LAG_DEBUG", "false").lower() == "true",
+            report_seconds=float(os.getenv("LOOP_LAG_REPORT_SECONDS", "60")),
+            log_metrics=log_metrics,
+        )
+
+    def start(self) -> Optional[asyncio.Task]:
+        """
+        Starts monitoring the running loop and returns the probe task. Calling
+        it again while the loop is monitored returns None.
+        """
+        if self._task is not None and not self._task.done():
+            return None
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        if self.debug and (self._watchdog is None or not self._watchdog.is_alive()):
+            self._stopped.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        return self._task
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _probe(self) -> None:
+        labels = {"process": self.process}
+        window_max = window_total = 0.0
+        window_count = 0
+        window_started = time.monotonic()
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval_seconds)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - before - self.interval_seconds)
+            METRICS.observe("event_loop_lag_seconds", lag, labels=labels, buckets=LAG_BUCKETS)
+            window_max = max(window_max, lag)
+            window_total += lag
+            window_count += 1
+            if self.report_seconds and now - window_started >= self.report_seconds:
+                METRICS.set_gauge("event_loop_lag_max_seconds", window_max, labels=labels)
+                extra = {"metrics": METRICS.snapshot()} if self.log_metrics else {}
+                log_event(
+                    "event_loop_lag",
+                    process=self.process,
+                    samples=window_count,
+                    mean_ms=round(window_total / window_count * 1000, 2),
+                    max_ms=round(window_max * 1000, 2),
+                    **extra,
+                )
+                window_max = window_total = 0.0
+                window_count = 0
+                window_started = now
+
+    def _watch(self) -> None:
+        """Watchdog thread: reports the loop's stack once per stall, then the stall's length when it ends."""
+        limit = self.interval_seconds + self.stall_threshold_seconds
+        stalled_since = None
+        while not self._stopped.wait(self.stall_threshold_seconds / 4):
+            heartbeat = self._heartbeat
+            held = time.monotonic() - heartbeat
+            if held > limit and stalled_since != heartbeat:
+                stalled_since = heartbeat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = traceback.format_stack(frame) if frame is not None else []
+                METRICS.inc("event_loop_stalls_total", labels={"process": self.process})
+                log_event(
+                    "event_loop_stall",
+                    process=self.process,
+                    held_ms=round(held * 1000, 1),
+                    threshold_ms=round(self.stall_threshold_seconds * 1000, 1),
+                    stack=[line.rstrip() for line in stack],
+                )
+            elif stalled_since is not None and heartbeat != stalled_since:
+                log_event(
+                    "event_loop_stall_end",
+                    process=self.process,
+                    stalled_ms=round((heartbeat - stalled_since - self.interval_seconds) * 1000, 1),
+                )
+                stalled_since = None
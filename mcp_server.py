@@ -1,45 +1,440 @@
 """
 MCP server for the clinic AI receptionist system.
 This module provides FastAPI endpoints for appointment management and other clinic operations.
+
+The application is built by ``create_app()``, on first access to ``app``;
+the MCP transport is only imported when it is enabled. Heavy client libraries
+(Gemini, Google Calendar) are imported lazily on first use so the server
+starts fast; clients and caches are warmed in the background before /ready
+reports ready.
 """
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-from fastapi import FastAPI, HTTPException, Header
-from supabase import create_client, Client
-from pydantic import BaseModel, Field
-from typing import List, Optional
-import uvicorn
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import functools
+import heapq
+import inspect
+import threading
+from contextlib import asynccontextmanager, AsyncExitStack
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, BeforeValidator, Field, PrivateAttr
+from typing import Annotated, List, Optional, Tuple
 from dotenv import load_dotenv
 import uuid
 import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import base64
+import re
+import orjson
 from datetime import datetime, timedelta
-import google.generativeai as genai
-import os
 import pytz
+from cache import TTLCache
+from calendar_sync import BusyIntervalStore, CalendarSyncer, APPOINTMENT_EVENT_PROPERTY
+from doctor_resolver import DoctorResolver
+from holds import HoldManager
+from idempotency import IdempotencyStore, derive_idempotency_key
+from invalidation import InvalidationBus, SupabaseRealtimeListener
+from looplag import LoopLagMonitor
+from admission import AdmissionController, AdmissionMiddleware, LaneLimits
+from metrics import METRICS
+from name_index import PatientNameIndex
+from phone_index import PhoneIndex, phone_key
+from profiling import ProfilingMiddleware, RequestProfiler, profile_current_thread
+from readiness import Readiness
+from resilience import Dependency, DependencyUnavailable, GuardedClient
+from schedule_feed import ScheduleFeed
+from slot_materializer import SlotMaterializer
 from utils import (
     format_time_for_db,
     validate_user_id,
     convert_to_ist,
     format_datetime_for_google_calendar,
+    normalize_phone_number,
+    normalize_times,
+    resolve_date,
+    resolve_time,
     IST
 )
 
 # Load environment variables
 load_dotenv()
 
-# Configure the generative AI model for summarization
-genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+# All endpoints are registered on this router and mounted by create_app()
+router = APIRouter()
+
+class ResultResponse(ORJSONResponse):
+    """
+    An ORJSONResponse that keeps its payload. Endpoints returning many rows
+    return it directly, so FastAPI serializes the rows once with orjson
+    instead of first walking each of them with jsonable_encoder, while
+    in-process callers (/batch, the MCP transport) still read ["result"].
+    """
+
+    def __init__(self, content: dict, **kwargs):
+        self.payload = content
+        super().__init__(content, **kwargs)
+
+    def get(self, key: str, default=None):
+        return self.payload.get(key, default)
+
+    def __getitem__(self, key: str):
+        return self.payload[key]
+
+# Set in threads running an endpoint through off_loop
+_off_loop_thread = threading.local()
+
+def off_loop(endpoint):
+    """
+    Runs an async endpoint to completion on ENDPOINT_EXECUTOR, on a private event loop.
+
+    The endpoints make blocking Supabase, Calendar and Gemini calls, which wait
+    up to the dependency's deadline and sleep between retries (see
+    resilience.Dependency); on the server's event loop that would stall every
+    other request. Calls from the server's loop, including each /batch item
+    and MCP tool call, get a worker thread; an endpoint called from an
+    endpoint already running off the loop runs inline in its thread.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        if getattr(_off_loop_thread, "active", False):
+            return await endpoint(*args, **kwargs)
+
+        def run():
+            _off_loop_thread.active = True
+            try:
+                with profile_current_thread():
+                    return asyncio.run(endpoint(*args, **kwargs))
+            finally:
+                _off_loop_thread.active = False
+        # Like asyncio.to_thread, the worker sees the caller's context variables
+        return await asyncio.get_running_loop().run_in_executor(ENDPOINT_EXECUTOR, copy_context().run, run)
+    return wrapper
+
+# Lazily initialized clients (see get_supabase / get_genai / get_calendar_service)
+_supabase_client = None
+_guarded_supabase = None
+_genai_module = None
+
+def is_supabase_outage(error: Exception) -> bool:
+    """
+    Returns True for errors that mean Supabase is unhealthy: transport errors
+    and PostgREST's own connection errors (PGRST0xx). Other API errors are
+    answers from a healthy server, such as "no rows" for .single().
+    """
+    code = getattr(error, "code", None)
+    return code is None or str(code).startswith("PGRST0")
 
-# Initialize FastAPI app
-app = FastAPI()
+def is_calendar_outage(error: Exception) -> bool:
+    """
+    Returns True for errors that mean Google Calendar is unhealthy: transport
+    errors, rate limiting and 5xx responses. Other HTTP errors are answers,
+    such as 404 for a deleted event or 410 for an expired sync token.
+    """
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return status is None or int(status) == 429 or int(status) >= 500
+
+# Deadlines, retries and circuit breakers per outbound dependency (see
+# resilience.py). Reads are retried with jitter; set *_HEDGE_SECONDS to send a
+# second attempt for reads that are still running after that long.
+SUPABASE = Dependency(
+    "supabase",
+    deadline_seconds=float(os.getenv("SUPABASE_DEADLINE_SECONDS", "4")),
+    retries=int(os.getenv("SUPABASE_RETRIES", "2")),
+    hedge_after_seconds=float(os.getenv("SUPABASE_HEDGE_SECONDS", "0")) or None,
+    unavailable_message="The clinic's booking system is not responding right now. Please try again in a moment.",
+    is_failure=is_supabase_outage,
+    max_workers=int(os.getenv("SUPABASE_MAX_IN_FLIGHT", "32")),
+)
+CALENDAR = Dependency(
+    "calendar",
+    deadline_seconds=float(os.getenv("CALENDAR_DEADLINE_SECONDS", "8")),
+    retries=int(os.getenv("CALENDAR_RETRIES", "1")),
+    unavailable_message="The doctor's calendar is not responding right now.",
+    is_failure=is_calendar_outage,
+)
+GEMINI = Dependency(
+    "gemini",
+    deadline_seconds=float(os.getenv("GEMINI_DEADLINE_SECONDS", "20")),
+    retries=int(os.getenv("GEMINI_RETRIES", "1")),
+    failure_threshold=3,
+    unavailable_message="The call summary could not be generated right now.",
+)
+
+# Admission control per tenant (X-User-Id, see admission.py). Live-call tools
+# may use all of ADMISSION_CAPACITY; bulk and admin work only a share of it,
+# so they are shed first when the server is busy.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() != "false"
+ADMISSION = AdmissionController(
+    capacity=int(os.getenv("ADMISSION_CAPACITY", "64")),
+    lanes={
+        "live": LaneLimits(
+            share=1.0,
+            tenant_concurrency=int(os.getenv("TENANT_MAX_CONCURRENCY", "16")),
+            rate=float(os.getenv("TENANT_RATE_PER_SECOND", "20")),
+            burst=float(os.getenv("TENANT_BURST", "40")),
+        ),
+        "bulk": LaneLimits(share=0.5, tenant_concurrency=2, rate=1, burst=5),
+        "admin": LaneLimits(share=0.25, tenant_concurrency=1, rate=1, burst=3),
+    },
+)
+BULK_PATHS = {"/bulk_doctor_leave"}
+
+# Threads running endpoints (see off_loop): one per request admission control
+# lets in, kept apart from the default executor used by warmup, calendar sync
+# and /ready so admitted requests do not queue behind them
+ENDPOINT_EXECUTOR = ThreadPoolExecutor(max_workers=ADMISSION.capacity, thread_name_prefix="endpoint")
+
+# Opt-in request profiling (see profiling.py): requests to PROFILE_ROUTES,
+# from PROFILE_TENANTS or, with PROFILE_HEADER=true, sent with "X-Profile: 1"
+# are profiled at PROFILE_SAMPLE_RATE into PROFILE_DIR. Without a trigger the
+# middleware is not installed.
+PROFILER = RequestProfiler(
+    routes=[p.strip() for p in os.getenv("PROFILE_ROUTES", "").split(",") if p.strip()],
+    tenants=[t.strip() for t in os.getenv("PROFILE_TENANTS", "").split(",") if t.strip()],
+    header_enabled=os.getenv("PROFILE_HEADER", "false").lower() == "true",
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0.1")),
+    mode=os.getenv("PROFILE_MODE", "sample"),
+    output_dir=os.getenv("PROFILE_DIR", "profiles"),
+    interval_seconds=float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005")),
+)
 
-# Initialize Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+def admission_lane(method: str, path: str) -> Optional[str]:
+    """
+    Returns the admission lane of a request. GET requests (health checks,
+    metrics, the schedule stream and MCP event streams) bypass admission.
+    """
+    if method == "GET":
+        return None
+    if path.startswith("/admin/"):
+        return "admin"
+    if path in BULK_PATHS:
+        return "bulk"
+    return "live"
+
+# Startup timings recorded by the lifespan hook, exposed on /health
+STARTUP_METRICS = {}
+
+# Event-loop lag reported on /metrics; LOOP_LAG_DEBUG=true also logs the stack
+# of any code holding the loop longer than LOOP_LAG_STALL_SECONDS
+LOOP_MONITOR = LoopLagMonitor.from_env("mcp_server")
+
+# Tenant settings are read on nearly every request but edited rarely
+SETTINGS_CACHE = TTLCache(float(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "60")))
+
+# Busy time added directly in doctors' Google Calendars, kept current in the
+# background; 0 disables the sync
+CALENDAR_SYNC_INTERVAL_SECONDS = float(os.getenv("CALENDAR_SYNC_INTERVAL_SECONDS", "60"))
+BUSY_STORE = BusyIntervalStore()
+CALENDAR_SYNCER = CalendarSyncer(
+    BUSY_STORE,
+    interval_seconds=CALENDAR_SYNC_INTERVAL_SECONDS,
+    execute=lambda request: calendar_call(request, idempotent=True),
+)
+
+# Booking deltas pushed to agent-side schedule replicas over /schedule_stream
+SCHEDULE_FEED = ScheduleFeed()
+SCHEDULE_SNAPSHOT_DAYS = int(os.getenv("SCHEDULE_SNAPSHOT_DAYS", "2"))
+
+# Row changes made by other workers and replicas evict this worker's caches;
+# "false" disables the realtime subscription (single-worker deployments)
+INVALIDATION_ENABLED = os.getenv("INVALIDATION_ENABLED", "true").lower() != "false"
+INVALIDATION_BUS = InvalidationBus()
+
+# Appointment changes this worker already published to SCHEDULE_FEED, so their
+# realtime echo is not published twice
+_LOCAL_APPOINTMENT_CHANGES = TTLCache(30)
+
+# Completed mutations replayed to repeated tool calls (see idempotent())
+IDEMPOTENCY = IdempotencyStore(float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600")))
+
+# Slots held for a call while the caller confirms (see /hold_slot). Holds live
+# in this process, so a tenant's calls must be served by the same worker.
+HOLD_TTL_SECONDS = float(os.getenv("HOLD_TTL_SECONDS", "120"))
+HOLDS = HoldManager(HOLD_TTL_SECONDS, on_expire=lambda key, hold: publish_hold_release(key, hold))
+
+# Free-slot tables for the next two weeks, built per tenant on first use,
+# updated on every booking mutation and rebuilt nightly; optionally persisted
+# to SLOT_MATERIALIZE_PATH so a restart does not start cold
+SLOT_MATERIALIZER = SlotMaterializer(
+    days=int(os.getenv("SLOT_MATERIALIZE_DAYS", "14")),
+    path=os.getenv("SLOT_MATERIALIZE_PATH") or None,
+)
+
+# Stored patient names per tenant, so names heard over the phone resolve to
+# their stored spelling; loaded on a tenant's first lookup and extended on
+# every booking
+PATIENT_NAMES = PatientNameIndex()
+# A heard name is looked up as a similar stored spelling only with at least
+# this score and this lead over the next stored name; otherwise the caller is
+# asked which patient they mean
+PATIENT_NAME_MIN_SCORE = float(os.getenv("PATIENT_NAME_MIN_SCORE", "0.85"))
+PATIENT_NAME_MARGIN = float(os.getenv("PATIENT_NAME_MARGIN", "0.1"))
+
+# Agent phone number (E.164) -> user_id, loaded with every tenant's settings
+# during warmup and kept current from user_settings changes (and a full
+# reload every PHONE_INDEX_REFRESH_SECONDS); numbers of no tenant are answered
+# from memory for PHONE_NEGATIVE_TTL_SECONDS
+AGENT_PHONES = PhoneIndex(float(os.getenv("PHONE_NEGATIVE_TTL_SECONDS", "60")))
+PHONE_INDEX_REFRESH_SECONDS = float(os.getenv("PHONE_INDEX_REFRESH_SECONDS", "300"))
+
+# Calendar (calendar_auth, calendarId) used by the /ready latency probe,
+# picked during warmup
+_calendar_probe_target = None
+
+def get_supabase():
+    """
+    Returns the shared Supabase client, creating it on first use. Queries made
+    through it run under the SUPABASE deadline, retry policy and breaker.
+    """
+    global _supabase_client, _guarded_supabase
+    if _supabase_client is None:
+        from supabase import create_client, ClientOptions
+        supabase_url = os.environ.get("SUPABASE_URL")
+        supabase_key = os.environ.get("SUPABASE_KEY")
+        # The HTTP timeout frees threads of calls the deadline already gave up on
+        _supabase_client = create_client(supabase_url, supabase_key, options=ClientOptions(postgrest_client_timeout=SUPABASE.deadline_seconds))
+    if _guarded_supabase is None or _guarded_supabase.client is not _supabase_client:
+        _guarded_supabase = GuardedClient(_supabase_client, SUPABASE)
+    return _guarded_supabase
+
+def get_genai():
+    """Returns the configured google.generativeai module, importing it on first use."""
+    global _genai_module
+    if _genai_module is None:
+        import google.generativeai as genai
+        # Configure the generative AI model for summarization
+        genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+        _genai_module = genai
+    return _genai_module
+
+def warm_connections() -> None:
+    """Creates the Supabase client and opens its HTTP connection before traffic arrives."""
+    get_supabase().table("user_settings").select("user_id").limit(1).execute()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Records startup timings and starts background work. Clients and caches
+    are warmed in the background; /ready reports when that has finished.
+    """
+    STARTUP_METRICS["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 4)
+    print(f"Startup completed: {STARTUP_METRICS}")
+    SCHEDULE_FEED.bind_loop(asyncio.get_running_loop())
+
+    background_tasks = []
+    loop_probe = LOOP_MONITOR.start()
+    if loop_probe is not None:
+        background_tasks.append(loop_probe)
+    if CALENDAR_SYNC_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            CALENDAR_SYNCER.run_forever(db_list_calendar_targets, get_calendar_service)
+        ))
+    background_tasks.append(asyncio.create_task(sweep_holds()))
+    try:
+        if SLOT_MATERIALIZER.load(datetime.now(IST).strftime("%Y-%m-%d")):
+            print(f"Loaded materialized slots for {len(SLOT_MATERIALIZER.tenants())} tenants")
+    except Exception as e:
+        print(f"Warning: Could not load materialized slots: {e}")
+    # After the load, so warmup only builds the tenants missing from disk
+    background_tasks.append(asyncio.create_task(asyncio.to_thread(run_warmup)))
+    background_tasks.append(asyncio.create_task(rebuild_slots_nightly()))
+    if PHONE_INDEX_REFRESH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(refresh_agent_phones()))
+    realtime_listener = None
+    if INVALIDATION_ENABLED:
+        realtime_listener = SupabaseRealtimeListener(
+            INVALIDATION_BUS, os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+        )
+        try:
+            await asyncio.wait_for(realtime_listener.start(), timeout=10)
+        except Exception as e:
+            # Caches still expire on their TTL without the change feed
+            print(f"Warning: Realtime cache invalidation unavailable: {e}")
+            realtime_listener = None
+    try:
+        async with AsyncExitStack() as stack:
+            mcp = getattr(app.state, "mcp", None)
+            if mcp is not None:
+                # The streamable HTTP transport needs its session manager running
+                await stack.enter_async_context(mcp.session_manager.run())
+            yield
+    finally:
+        LOOP_MONITOR.stop()
+        READINESS.stop()
+        for task in background_tasks:
+            task.cancel()
+        if realtime_listener is not None:
+            await realtime_listener.stop()
+        try:
+            SLOT_MATERIALIZER.save()
+        except Exception as e:
+            print(f"Warning: Could not save materialized slots: {e}")
+
+async def sweep_holds() -> None:
+    """Expires holds every second so replicas learn about expiries without waiting for traffic."""
+    while True:
+        await asyncio.sleep(1)
+        HOLDS.sweep()
+
+async def refresh_agent_phones() -> None:
+    """Reloads AGENT_PHONES periodically, so numbers reassigned while the change feed was down are picked up."""
+    while True:
+        await asyncio.sleep(PHONE_INDEX_REFRESH_SECONDS)
+        try:
+            phones = await asyncio.to_thread(db_fetch_agent_phones)
+        except Exception as e:
+            print(f"Warning: Could not refresh agent phone index: {e}")
+            continue
+        AGENT_PHONES.load(phones)
+        print(f"DEBUG: Refreshed agent phone index ({len(AGENT_PHONES)} numbers)")
+
+async def rebuild_slots_nightly() -> None:
+    """Rebuilds every materialized tenant just after midnight (IST), when the window moves on a day."""
+    while True:
+        now = datetime.now(IST)
+        next_run = IST.localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time())) + timedelta(minutes=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        tenants = SLOT_MATERIALIZER.tenants()
+        for user_id in tenants:
+            await asyncio.to_thread(materialize_tenant, user_id)
+        try:
+            await asyncio.to_thread(SLOT_MATERIALIZER.save)
+        except Exception as e:
+            print(f"Warning: Could not save materialized slots: {e}")
+        print(f"Rebuilt materialized slots for {len(tenants)} tenants")
+
+def create_app() -> FastAPI:
+    """
+    Builds the FastAPI application with all MCP tool endpoints.
+
+    The REST endpoints are served at the root. Unless MCP_PROTOCOL_ENABLED is
+    "false", the same tools are also exposed over the Model Context Protocol:
+    streamable HTTP at /mcp/ and SSE at /mcp-sse/sse. Unless
+    ADMISSION_ENABLED is "false", requests pass through admission control;
+    profiling is installed only when PROFILER has a trigger.
+    """
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.include_router(router)
+    if PROFILER.enabled:
+        # Added before admission control, so only admitted requests are profiled
+        app.add_middleware(ProfilingMiddleware, profiler=PROFILER)
+    if ADMISSION_ENABLED:
+        app.add_middleware(AdmissionMiddleware, controller=ADMISSION, classify=admission_lane)
+
+    app.state.mcp = None
+    if os.getenv("MCP_PROTOCOL_ENABLED", "true").lower() != "false":
+        from mcp_transport import build_mcp_server
+        mcp = build_mcp_server()
+        app.mount("/mcp-sse", mcp.sse_app("/mcp-sse"))
+        app.mount("/mcp", mcp.streamable_http_app())
+        app.state.mcp = mcp
+    return app
 
 # Pydantic Models for data validation
 class Appointment(BaseModel):
@@ -53,6 +448,11 @@ class Appointment(BaseModel):
     call_id: Optional[str] = None
     appointment_id: Optional[str] = None
     current_status: str = "scheduled"
+    patient_phone: Optional[str] = None  # Caller's number (E.164) the appointment was booked from
+
+# Columns returned for appointment rows; rows selected with this projection are
+# already in Appointment shape and are returned without revalidation
+APPOINTMENT_COLUMNS = ",".join(Appointment.model_fields)
 
 class Doctor(BaseModel):
     name: str
@@ -66,6 +466,15 @@ class UserSettings(BaseModel):
     doctor_details: List[Doctor]
     calendar_auth: Optional[dict] = None
     agent_phone: Optional[str] = None
+    _doctor_resolver: DoctorResolver = PrivateAttr()
+
+    def model_post_init(self, __context) -> None:
+        # Built once per load; settings are cached, so lookups reuse it
+        self._doctor_resolver = DoctorResolver(self.doctor_details)
+
+    @property
+    def doctor_resolver(self) -> DoctorResolver:
+        return self._doctor_resolver
 
 class CalendarAuth(BaseModel):
     token: str
@@ -75,22 +484,31 @@ class CalendarAuth(BaseModel):
     client_secret: str
     scopes: List[str]
 
+# Date and time arguments accept what the caller said ("tomorrow evening",
+# "next Friday", "5 pm") and are resolved in IST when the body is parsed;
+# anything unreadable is rejected before it can reach a query
+DateExpression = Annotated[str, BeforeValidator(lambda value: value if value is None else resolve_date(value))]
+TimeExpression = Annotated[str, BeforeValidator(lambda value: value if value is None else resolve_time(value))]
+# Pagination cursors are checked when the body is parsed, since their fields
+# are written into a PostgREST filter (see db_fetch_appointment_page)
+AppointmentCursor = Annotated[str, BeforeValidator(lambda value: value if value is None else validate_appointment_cursor(value))]
+
 class ScheduleAppointmentBody(BaseModel):
     patient_name: str
     assigned_doctor: str
-    appointment_date: str
-    appointment_time: str
+    appointment_date: DateExpression
+    appointment_time: TimeExpression
     appointment_reason: str
 
 class CheckAvailabilityBody(BaseModel):
     doctor_name: str
-    appointment_date: str
-    appointment_time: str
+    appointment_date: DateExpression
+    appointment_time: TimeExpression
 
 class RescheduleAppointmentBody(BaseModel):
     appointment_id: str
-    new_date: str
-    new_time: str
+    new_date: DateExpression
+    new_time: TimeExpression
 
 class CancelAppointmentBody(BaseModel):
     appointment_id: str
@@ -98,6 +516,10 @@ class CancelAppointmentBody(BaseModel):
 class GetDoctorDetailsBody(BaseModel):
     pass
 
+class GetCallerProfileBody(BaseModel):
+    caller_number: Optional[str] = None  # Defaults to the X-Caller-Number header
+    limit: int = Field(5, ge=1, le=20)
+
 class AddCallHistoryBody(BaseModel):
     caller_number: str
     called_number: str
@@ -114,17 +536,83 @@ class GetUserIdBody(BaseModel):
 class GetAppointmentDetailsBody(BaseModel):
     patient_name: str
     assigned_doctor: Optional[str] = None
-    appointment_date: Optional[str] = None
+    appointment_date: Optional[DateExpression] = None
+    include_past: bool = False
+    limit: int = Field(10, ge=1, le=100)
+    cursor: Optional[AppointmentCursor] = None
 
 class ListAppointmentsBody(BaseModel):
     patient_name: str
+    limit: int = Field(10, ge=1, le=100)
+    cursor: Optional[AppointmentCursor] = None
+
+class ExportAppointmentsBody(BaseModel):
+    patient_name: Optional[str] = None
+    assigned_doctor: Optional[str] = None
+    from_date: Optional[DateExpression] = None
+    to_date: Optional[DateExpression] = None
+    page_size: int = Field(500, ge=1, le=1000)
 
 class SummarizeCallBody(BaseModel):
     transcript: str
 
 class GetAvailableSlotsBody(BaseModel):
     doctor_name: str
-    appointment_date: str
+    appointment_date: DateExpression
+
+class NextAvailableBody(BaseModel):
+    doctor_name: Optional[str] = None
+    specialty: Optional[str] = None
+    from_date: Optional[DateExpression] = None  # Defaults to today (IST)
+    from_time: Optional[TimeExpression] = None  # Defaults to the start of the day
+    days: int = Field(7, ge=1, le=30)
+    k: int = Field(3, ge=1, le=10)
+
+class BulkDoctorLeaveBody(BaseModel):
+    doctor_name: str
+    dates: List[DateExpression]
+    action: str = "cancel"  # "cancel" or "reschedule"
+    shift_days: int = 0  # for "reschedule": days to move each appointment by
+
+class ScheduleSnapshotBody(BaseModel):
+    days: Optional[int] = None
+
+class SlotConsistencyBody(BaseModel):
+    repair: bool = False
+
+class HoldSlotBody(BaseModel):
+    doctor_name: str
+    appointment_date: DateExpression
+    appointment_time: TimeExpression
+
+class ReleaseHoldBody(BaseModel):
+    doctor_name: Optional[str] = None
+    appointment_date: Optional[DateExpression] = None
+    appointment_time: Optional[TimeExpression] = None
+
+class BatchInvocation(BaseModel):
+    tool: str
+    args: dict = Field(default_factory=dict)
+
+class BatchBody(BaseModel):
+    invocations: List[BatchInvocation]
+
+# Per-request cache shared by all tool invocations of one /batch request
+_request_cache: ContextVar[Optional[dict]] = ContextVar("request_cache", default=None)
+
+def request_cached(key: tuple, loader):
+    """
+    Returns loader() memoized in the current request's cache, if one is active.
+
+    Outside a /batch request there is no cache and loader() is called directly.
+    """
+    cache = _request_cache.get()
+    if cache is None:
+        return loader()
+    with cache["_lock"]:
+        if key not in cache:
+            cache[key] = loader()
+        return cache[key]
 
 
 # Placeholder for database interaction functions
@@ -133,19 +621,78 @@ def db_fetch_user_settings(user_id: str) -> Optional[UserSettings]:
     try:
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
-        
-        response = supabase.table("user_settings").select("*").eq("user_id", validated_user_id).single().execute()
-        if response.data:
-            return UserSettings(**response.data)
-        return None
+        return request_cached(
+            ("user_settings", validated_user_id),
+            lambda: SETTINGS_CACHE.get_or_load(validated_user_id, lambda: _db_load_user_settings(validated_user_id))
+        )
     except ValueError as e:
         print(f"Invalid user_id format: {e}")
         return None
+
+def _db_load_user_settings(validated_user_id: str) -> Optional[UserSettings]:
+    """Loads user settings for an already validated user_id from Supabase."""
+    try:
+        response = get_supabase().table("user_settings").select("*").eq("user_id", validated_user_id).single().execute()
+        if response.data:
+            return UserSettings(**response.data)
+        return None
     except Exception as e:
         print(f"Error fetching user settings: {e}")
         return None
 
-@app.post("/get_user_settings")
+def db_list_calendar_targets() -> List[tuple]:
+    """Returns (calendar_auth, calendarId) for every doctor of every tenant with calendar auth."""
+    try:
+        response = get_supabase().table("user_settings").select("user_id,doctor_details,calendar_auth").execute()
+    except Exception as e:
+        print(f"Error listing calendar sync targets: {e}")
+        return []
+    targets = {}
+    for row in response.data or []:
+        calendar_auth = row.get("calendar_auth")
+        if not calendar_auth:
+            continue
+        for doctor in row.get("doctor_details") or []:
+            calendar_id = doctor.get("calendarId")
+            if calendar_id:
+                targets[calendar_id] = calendar_auth
+    return [(auth, calendar_id) for calendar_id, auth in targets.items()]
+
+def find_doctor(user_settings: Optional[UserSettings], doctor_name: str) -> Optional[Doctor]:
+    """Returns the doctor a name refers to ("Dr. Sharma", "sharma", ...) from a tenant's settings."""
+    if not user_settings:
+        return None
+    return user_settings.doctor_resolver.resolve(doctor_name)
+
+def canonical_doctor_args(body: BaseModel, user_id: str) -> BaseModel:
+    """
+    Returns body with its assigned_doctor / doctor_name replaced by the doctor's
+    name as stored in user_settings, so queries, holds and bookings all use one
+    spelling. Names that match no doctor (or several) are left as given.
+    """
+    names = {field: getattr(body, field) for field in ("assigned_doctor", "doctor_name") if getattr(body, field, None)}
+    if not names:
+        return body
+    user_settings = db_fetch_user_settings(user_id)
+    update = {}
+    for field, name in names.items():
+        doctor = find_doctor(user_settings, name)
+        if doctor is not None and doctor.name != name:
+            update[field] = doctor.name
+    if not update:
+        return body
+    print(f"DEBUG: Resolved doctor names {names} to {update}")
+    return body.model_copy(update=update)
+
+def is_calendar_blocked(doctor_name: str, appointment_date: str, appointment_time: str, user_id: str) -> bool:
+    """Returns True if the doctor's synced Google Calendar has busy time at the slot."""
+    doctor = find_doctor(db_fetch_user_settings(user_id), doctor_name)
+    if not doctor or not doctor.calendarId:
+        return False
+    return BUSY_STORE.is_busy(doctor.calendarId, appointment_date, format_time_for_db(appointment_time))
+
+@router.post("/get_user_settings")
+@off_loop
 async def get_user_settings(body: GetDoctorDetailsBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> Optional[dict]:
     """
     Fetches the entire user settings object for a given user_id.
@@ -156,7 +703,7 @@ async def get_user_settings(body: GetDoctorDetailsBody, user_id: str = Header(..
         
         user_settings = db_fetch_user_settings(validated_user_id)
         if user_settings:
-            return {"result": user_settings.dict()}
+            return {"result": user_settings.model_dump()}
         return None
     except ValueError as e:
         print(f"Invalid user_id format: {e}")
@@ -171,10 +718,10 @@ def db_schedule_appointment(appointment: Appointment, user_id: str, call_id: str
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
         
-        appointment_data = appointment.dict()
+        appointment_data = appointment.model_dump()
         appointment_data["user_id"] = validated_user_id
         appointment_data["call_id"] = call_id
-        response = supabase.table("appointment_details").insert(appointment_data).execute()
+        response = get_supabase().table("appointment_details").insert(appointment_data).execute()
         if response.data:
             return Appointment(**response.data[0])
         return None
@@ -278,6 +825,214 @@ def parse_working_hours(working_hours_str: str, appointment_date: str) -> tuple:
         print(f"Error parsing working hours '{working_hours_str}': {e}")
         return None, None
 
+# Monday to Sunday of an arbitrary week, for compiling weekly working hours
+_REFERENCE_WEEK = [(datetime(2024, 1, 1) + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
+
+@functools.lru_cache(maxsize=1024)
+def compile_working_hours(working_hours_str: str) -> tuple:
+    """
+    Compiles a working hours string into (start, end) HH:MM:SS pairs per
+    weekday (Monday first), or None for days off. Cached per string, so
+    scanning many dates parses each doctor's schedule once.
+    """
+    compiled = []
+    for day in _REFERENCE_WEEK:
+        start_time_str, end_time_str = parse_working_hours(working_hours_str, day)
+        if start_time_str and end_time_str:
+            compiled.append((format_time_for_db(start_time_str), format_time_for_db(end_time_str)))
+        else:
+            compiled.append(None)
+    return tuple(compiled)
+
+def weekly_working_hours(working_hours_str: str) -> Optional[tuple]:
+    """Returns compile_working_hours(working_hours_str), or None if a time in it cannot be read."""
+    try:
+        return compile_working_hours(working_hours_str)
+    except ValueError as e:
+        print(f"WARNING: Unreadable working hours '{working_hours_str}': {e}")
+        METRICS.inc("working_hours_parse_errors_total")
+        return None
+
+def working_hours_by_doctor(user_settings: UserSettings) -> dict:
+    """
+    Maps each doctor to a function returning their (start, end) working
+    interval on a date. Doctors whose working hours cannot be read are left
+    out, so their lookups are not materialized instead of failing the tenant.
+    """
+    by_doctor = {}
+    for doctor in user_settings.doctor_details:
+        compiled = weekly_working_hours(doctor.working_hours) if doctor.working_hours else (None,) * 7
+        if compiled is None:
+            continue
+        by_doctor[doctor.name] = lambda day, compiled=compiled: compiled[datetime.strptime(day, "%Y-%m-%d").weekday()]
+    return by_doctor
+
+def db_compute_slot_tables(user_id: str, today: str) -> Optional[tuple]:
+    """Computes a tenant's free-slot tables from settings and one query over the window."""
+    user_settings = db_fetch_user_settings(user_id)
+    if not user_settings:
+        return None
+    dates = SLOT_MATERIALIZER.window(today)
+    response = get_supabase().table("appointment_details")\
+        .select("appointment_id,assigned_doctor,appointment_date,appointment_time")\
+        .eq("user_id", user_id)\
+        .gte("appointment_date", dates[0])\
+        .lte("appointment_date", dates[-1])\
+        .eq("current_status", "scheduled")\
+        .execute()
+    return working_hours_by_doctor(user_settings), dates, response.data or []
+
+def materialize_tenant(user_id: str) -> bool:
+    """(Re)builds a tenant's free-slot tables. Returns False if they could not be built."""
+    today = datetime.now(IST).strftime("%Y-%m-%d")
+    # Bookings published while the query runs are replayed onto the new tables
+    changes = SLOT_MATERIALIZER.record_changes(user_id)
+    try:
+        computed = db_compute_slot_tables(user_id, today)
+        if computed is None:
+            return False
+        working_hours, _, appointments = computed
+        SLOT_MATERIALIZER.build_tenant(user_id, working_hours, today, appointments, changes=changes)
+    except Exception as e:
+        print(f"Error materializing slots for {user_id}: {e}")
+        return False
+    finally:
+        SLOT_MATERIALIZER.stop_recording(user_id, changes)
+    print(f"DEBUG: Materialized slots for {user_id} ({len(appointments)} bookings)")
+    return True
+
+def ensure_materialized(user_id: str) -> bool:
+    """Returns True if the tenant's free-slot tables are current, building them on first use."""
+    if SLOT_MATERIALIZER.has_tenant(user_id, datetime.now(IST).strftime("%Y-%m-%d")):
+        return True
+    return materialize_tenant(user_id)
+
+def db_fetch_all_user_settings(page_size: int = 200) -> List[dict]:
+    """Fetches every tenant's user_settings row."""
+    rows = []
+    start = 0
+    while True:
+        response = get_supabase().table("user_settings").select("*")\
+            .order("user_id", desc=False)\
+            .range(start, start + page_size - 1)\
+            .execute()
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+def db_fetch_agent_phones() -> dict:
+    """Fetches {user_id: agent_phone} for every tenant with an agent phone."""
+    response = get_supabase().table("user_settings").select("user_id,agent_phone").execute()
+    return {validate_user_id(row["user_id"]): row["agent_phone"] for row in response.data or [] if row.get("agent_phone")}
+
+def warm_settings(tenants: List[UserSettings]) -> dict:
+    """Caches every tenant's settings and agent phone mapping, appending the settings to tenants."""
+    phones = 0
+    for row in db_fetch_all_user_settings():
+        try:
+            settings = UserSettings(**row)
+            validated_user_id = validate_user_id(settings.user_id)
+        except Exception as e:
+            print(f"Warning: Skipping settings of {row.get('user_id')}: {e}")
+            continue
+        SETTINGS_CACHE.set(validated_user_id, settings)
+        if settings.agent_phone:
+            AGENT_PHONES.set(validated_user_id, settings.agent_phone)
+            phones += 1
+        tenants.append(settings)
+    return {"tenants": len(tenants), "agent_phones": phones}
+
+def warm_calendar_clients(tenants: List[UserSettings]) -> dict:
+    """Builds the Calendar client of every tenant with calendar auth and picks the probe target."""
+    global _calendar_probe_target
+    clients = 0
+    for settings in tenants:
+        if not settings.calendar_auth or get_calendar_service(settings.calendar_auth) is None:
+            continue
+        clients += 1
+        calendar_id = next((d.calendarId for d in settings.doctor_details if d.calendarId), None)
+        if calendar_id and _calendar_probe_target is None:
+            _calendar_probe_target = (settings.calendar_auth, calendar_id)
+    return {"clients": clients}
+
+def warm_occupancy(tenants: List[UserSettings]) -> dict:
+    """Builds the free-slot tables (today, tomorrow and the rest of the window) of tenants not loaded from disk."""
+    today = datetime.now(IST).strftime("%Y-%m-%d")
+    built = 0
+    for settings in tenants:
+        user_id = validate_user_id(settings.user_id)
+        if not SLOT_MATERIALIZER.has_tenant(user_id, today) and materialize_tenant(user_id):
+            built += 1
+    return {"tenants_built": built, "tenants_loaded": len(SLOT_MATERIALIZER.tenants())}
+
+def run_warmup() -> None:
+    """Warms clients and caches, retrying failed steps, then lets /ready report ready."""
+    started = time.perf_counter()
+    tenants: List[UserSettings] = []
+
+    def settings_step() -> dict:
+        # A retry reloads every tenant rather than appending to a partial list
+        tenants.clear()
+        return warm_settings(tenants)
+
+    if READINESS.run_warmup({
+        "connections": warm_connections,
+        "settings": settings_step,
+        "calendar": lambda: warm_calendar_clients(tenants),
+        "occupancy": lambda: warm_occupancy(tenants),
+    }, retry_seconds=WARMUP_RETRY_SECONDS):
+        STARTUP_METRICS["warmup_seconds"] = round(time.perf_counter() - started, 4)
+
+def probe_dependencies() -> dict:
+    """Times one cheap request to Supabase and, if a tenant has one, a doctor's Google Calendar."""
+    probes = {}
+    started = time.perf_counter()
+    try:
+        get_supabase().table("user_settings").select("user_id").limit(1).execute()
+        probes["supabase"] = {"ok": True}
+    except Exception as e:
+        probes["supabase"] = {"ok": False, "error": str(e)}
+    probes["supabase"]["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    probes["supabase"]["breaker_state"] = SUPABASE.breaker.state
+
+    if _calendar_probe_target is not None:
+        calendar_auth, calendar_id = _calendar_probe_target
+        started = time.perf_counter()
+        try:
+            service = get_calendar_service(calendar_auth)
+            if service is None:
+                raise RuntimeError("Calendar client could not be created")
+            calendar_call(service.calendars().get(calendarId=calendar_id), idempotent=True)
+            probes["calendar"] = {"ok": True}
+        except Exception as e:
+            probes["calendar"] = {"ok": False, "error": str(e)}
+        probes["calendar"]["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        probes["calendar"]["breaker_state"] = CALENDAR.breaker.state
+    return probes
+
+# Warmup progress and dependency probes reported on /ready
+# Calendar clients are optional: without one, availability falls back to the database
+READINESS = Readiness(
+    ["connections", "settings", "calendar", "occupancy"],
+    probe=probe_dependencies,
+    probe_interval_seconds=float(os.getenv("READY_PROBE_INTERVAL_SECONDS", "10")),
+    required_steps=["connections", "settings", "occupancy"],
+)
+
+# Seconds before a failed warmup step is retried; doubles on each retry up to a minute
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+def is_slot_unbooked(doctor_name: str, appointment_date: str, appointment_time: str, user_id: str) -> bool:
+    """Checks the slot against bookings, from the materialized tables when possible."""
+    formatted_time = format_time_for_db(appointment_time)
+    if ensure_materialized(user_id):
+        unbooked = SLOT_MATERIALIZER.is_free(user_id, doctor_name, appointment_date, formatted_time)
+        if unbooked is not None:
+            return unbooked
+    return db_check_availability(doctor_name, appointment_date, formatted_time)
+
 def is_within_working_hours(doctor_name: str, appointment_date: str, appointment_time: str, user_id: str) -> bool:
     """Check if appointment time is within doctor's working hours."""
     try:
@@ -286,7 +1041,7 @@ def is_within_working_hours(doctor_name: str, appointment_date: str, appointment
             print(f"No user settings found for working hours check")
             return False
         
-        doctor = next((d for d in user_settings.doctor_details if d.name == doctor_name), None)
+        doctor = find_doctor(user_settings, doctor_name)
         if not doctor:
             print(f"Doctor {doctor_name} not found for working hours check")
             return False
@@ -308,12 +1063,8 @@ def is_within_working_hours(doctor_name: str, appointment_date: str, appointment
         start_time_formatted = format_time_for_db(start_time_str)
         end_time_formatted = format_time_for_db(end_time_str)
         
-        # Compare times
-        appointment_dt = datetime.strptime(appointment_time_formatted, "%H:%M:%S").time()
-        start_dt = datetime.strptime(start_time_formatted, "%H:%M:%S").time()
-        end_dt = datetime.strptime(end_time_formatted, "%H:%M:%S").time()
-        
-        is_within = start_dt <= appointment_dt <= end_dt
+        # Zero-padded HH:MM:SS strings compare in time order
+        is_within = start_time_formatted <= appointment_time_formatted <= end_time_formatted
         print(f"Working hours check for {doctor_name}: {start_time_str}-{end_time_str}, appointment: {appointment_time}, within hours: {is_within}")
         
         return is_within
@@ -327,7 +1078,7 @@ def db_check_availability(doctor_name: str, appointment_date: str, appointment_t
     try:
         # Format time consistently before checking
         formatted_time = format_time_for_db(appointment_time)
-        response = supabase.table("appointment_details").select("*").eq("assigned_doctor", doctor_name).eq("appointment_date", appointment_date).eq("appointment_time", formatted_time).eq("current_status", "scheduled").execute()
+        response = get_supabase().table("appointment_details").select("*").eq("assigned_doctor", doctor_name).eq("appointment_date", appointment_date).eq("appointment_time", formatted_time).eq("current_status", "scheduled").execute()
         return not response.data
     except Exception as e:
         print(f"Error checking availability: {e}")
@@ -338,7 +1089,7 @@ def db_reschedule_appointment(appointment_id: str, new_date: str, new_time: str)
     try:
         # Format time consistently before updating
         formatted_time = format_time_for_db(new_time)
-        response = supabase.table("appointment_details").update({
+        response = get_supabase().table("appointment_details").update({
             "appointment_date": new_date, 
             "appointment_time": formatted_time
         }).eq("appointment_id", appointment_id).execute()
@@ -352,7 +1103,7 @@ def db_reschedule_appointment(appointment_id: str, new_date: str, new_time: str)
 def db_cancel_appointment(appointment_id: str) -> Optional[Appointment]:
     """Cancels an appointment in Supabase."""
     try:
-        response = supabase.table("appointment_details").update({"current_status": "cancelled"}).eq("appointment_id", appointment_id).execute()
+        response = get_supabase().table("appointment_details").update({"current_status": "cancelled"}).eq("appointment_id", appointment_id).execute()
         if response.data:
             return Appointment(**response.data[0])
         return None
@@ -366,7 +1117,7 @@ def db_get_clinic_prefix(user_id: str) -> Optional[str]:
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
         
-        response = supabase.table("profiles").select("name").eq("id", validated_user_id).single().execute()
+        response = get_supabase().table("profiles").select("name").eq("id", validated_user_id).single().execute()
         if response.data and response.data.get("name"):
             return response.data["name"][:3].upper()
         return None
@@ -380,7 +1131,7 @@ def db_get_clinic_prefix(user_id: str) -> Optional[str]:
 def db_get_last_appointment_numeric_id(prefix: str) -> int:
     """Finds the last appointment number for a given clinic prefix."""
     try:
-        response = supabase.table("appointment_details").select("appointment_id").like("appointment_id", f"{prefix}-%").execute()
+        response = get_supabase().table("appointment_details").select("appointment_id").like("appointment_id", f"{prefix}-%").execute()
         if not response.data:
             return 0
         
@@ -397,22 +1148,340 @@ def db_get_last_appointment_numeric_id(prefix: str) -> int:
         print(f"Error fetching last appointment ID: {e}")
         return 0
 
+def encode_appointment_cursor(row: dict) -> str:
+    """Encodes the (date, time, id) keyset position of an appointment row as an opaque cursor."""
+    key = [row["appointment_date"], row["appointment_time"], row["appointment_id"]]
+    return base64.urlsafe_b64encode(orjson.dumps(key)).decode("ascii")
+
+# Appointment ids are "<clinic prefix>-<number>" (see schedule_appointment);
+# quotes, commas, parentheses and backslashes would change a PostgREST filter
+_APPOINTMENT_ID_RE = re.compile(r'[^",()\\]{1,3}-\d+')
+
+def decode_appointment_cursor(cursor: str) -> tuple:
+    """
+    Decodes a cursor produced by encode_appointment_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or its date (YYYY-MM-DD), time
+            (HH:MM:SS) or appointment id is not in the stored format
+    """
+    try:
+        appointment_date, appointment_time, appointment_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        datetime.strptime(appointment_date, "%Y-%m-%d")
+        datetime.strptime(appointment_time, "%H:%M:%S")
+        if not (re.fullmatch(r"\d{4}-\d{2}-\d{2}", appointment_date) and re.fullmatch(r"\d{2}:\d{2}:\d{2}", appointment_time)
+                and _APPOINTMENT_ID_RE.fullmatch(appointment_id)):
+            raise ValueError("unexpected field format")
+        return appointment_date, appointment_time, appointment_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def validate_appointment_cursor(cursor: str) -> str:
+    """Returns the cursor if it decodes (see decode_appointment_cursor), else raises ValueError."""
+    decode_appointment_cursor(cursor)
+    return cursor
+
+def db_fetch_appointment_page(build_query, limit: int, cursor: Optional[str] = None) -> tuple:
+    """
+    Fetches one page of appointments in (date, time, id) order using keyset pagination.
+
+    Args:
+        build_query: Callable returning a filtered appointment_details query
+        limit: Maximum number of rows to return
+        cursor: Position returned by the previous page, or None for the first page
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    query = build_query()
+    if cursor:
+        d, t, i = decode_appointment_cursor(cursor)
+        query = query.or_(
+            f'appointment_date.gt."{d}",'
+            f'and(appointment_date.eq."{d}",appointment_time.gt."{t}"),'
+            f'and(appointment_date.eq."{d}",appointment_time.eq."{t}",appointment_id.gt."{i}")'
+        )
+    # Fetch one extra row to learn whether another page exists
+    response = query.order("appointment_date", desc=False)\
+        .order("appointment_time", desc=False)\
+        .order("appointment_id", desc=False)\
+        .limit(limit + 1)\
+        .execute()
+    rows = response.data or []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_appointment_cursor(rows[-1])
+    return rows, None
+
+def db_fetch_patient_names(user_id: str, page_size: int = 1000) -> List[str]:
+    """Fetches the distinct patient names a tenant has appointments for."""
+    names = set()
+    start = 0
+    while True:
+        response = get_supabase().table("appointment_details").select("patient_name")\
+            .eq("user_id", user_id)\
+            .order("patient_name", desc=False)\
+            .range(start, start + page_size - 1)\
+            .execute()
+        rows = response.data or []
+        names.update(row["patient_name"] for row in rows if row.get("patient_name"))
+        if len(rows) < page_size:
+            return sorted(names)
+        start += page_size
+
+def resolve_patient_name(user_id: str, patient_name: str, limit: int = 5) -> Tuple[List[str], List[str]]:
+    """
+    Resolves a patient name heard over the phone to the stored names to look
+    up, as (names, candidates). Only one patient's records are ever looked up:
+
+    - stored names equal up to case, titles and punctuation are looked up;
+    - otherwise the best stored spelling is, if it scores at least
+      PATIENT_NAME_MIN_SCORE and no other name comes within PATIENT_NAME_MARGIN;
+    - with no similar stored name, the name as given is looked up, so a row
+      the index has not seen yet is still found.
+
+    When several stored patients are plausible (or the only one is not a
+    confident match) names is empty and candidates lists them, so the caller
+    can be asked which one they mean.
+    """
+    if not PATIENT_NAMES.is_loaded(user_id):
+        try:
+            PATIENT_NAMES.load(user_id, db_fetch_patient_names(user_id))
+        except Exception as e:
+            print(f"Error loading patient names: {e}")
+            return [patient_name], []
+    matches = PATIENT_NAMES.search(user_id, patient_name, limit=limit)
+    exact = [name for name, score in matches if score == 1.0]
+    if exact:
+        names, candidates = exact, []
+    elif not matches:
+        names, candidates = [patient_name], []
+    elif matches[0][1] >= PATIENT_NAME_MIN_SCORE and (len(matches) == 1 or matches[0][1] - matches[1][1] >= PATIENT_NAME_MARGIN):
+        names, candidates = [matches[0][0]], []
+    else:
+        names, candidates = [], [name for name, _ in matches]
+    print(f"DEBUG: Patient name '{patient_name}' resolved to {names or candidates} (scores: {matches})")
+    return names, candidates
+
+def ambiguous_patient_response(patient_name: str, candidates: List[str]) -> "ResultResponse":
+    """Asks the agent to confirm which of several similarly named patients the caller means."""
+    message = (
+        f"No patient named exactly '{patient_name}' was found. Patients with similar names: {', '.join(candidates)}. "
+        "Ask the caller which one they mean, then look the appointments up with that exact name."
+    )
+    return ResultResponse({"result": message, "next_cursor": None, "candidates": candidates})
+
 def db_update_call_history_status(call_id: str, status: str) -> None:
     """Updates the appointment_status in the call_history table."""
     try:
-        supabase.table("call_history").update({"appointment_status": status}).eq("call_id", call_id).execute()
+        get_supabase().table("call_history").update({"appointment_status": status}).eq("call_id", call_id).execute()
     except Exception as e:
         print(f"Error updating call history: {e}")
 
+def publish_hold(key: tuple, hold) -> None:
+    """Pushes a new slot hold to schedule replicas."""
+    user_id, doctor_name, appointment_date, appointment_time = key
+    SCHEDULE_FEED.publish(user_id, {
+        "op": "hold",
+        "hold_id": hold.hold_id,
+        "call_id": hold.call_id,
+        "assigned_doctor": doctor_name,
+        "appointment_date": appointment_date,
+        "appointment_time": appointment_time,
+    })
+
+def publish_hold_release(key: tuple, hold) -> None:
+    """Pushes the end of a slot hold (released, expired or booked) to schedule replicas."""
+    SCHEDULE_FEED.publish(key[0], {"op": "release", "hold_id": hold.hold_id})
+
+def is_held_by_other_call(doctor_name: str, appointment_date: str, appointment_time: str, user_id: str, call_id: Optional[str]) -> bool:
+    """Returns True if another call holds the slot."""
+    holder = HOLDS.holder((user_id, doctor_name, appointment_date, format_time_for_db(appointment_time)))
+    return holder is not None and holder != call_id
+
+def plan_appointment_shift(appointments: List[Appointment], shift_days: int, user_id: str, call_id: str) -> tuple:
+    """
+    Decides which appointments can move by shift_days. Each target slot is
+    checked like /check_availability does (working hours, bookings, holds of
+    other calls, calendar busy time); a slot counts as free if its booking
+    is itself moved away, and as taken once an earlier move claims it.
+
+    Returns (moves, rejected): moves maps appointment_id to its new date,
+    rejected lists {"appointment_id", "appointment_date", "appointment_time", "reason"}.
+    """
+    # Appointments whose target is occupied by another mover are decided after
+    # that mover, so walk away from the direction of the shift
+    ordered = sorted(appointments, key=lambda a: (a.appointment_date, a.appointment_time), reverse=shift_days > 0)
+    vacated = set()
+    claimed = set()
+    moves = {}
+    rejected = []
+    for appointment in ordered:
+        new_date = (datetime.strptime(appointment.appointment_date, "%Y-%m-%d") + timedelta(days=shift_days)).strftime("%Y-%m-%d")
+        time_str = format_time_for_db(appointment.appointment_time)
+        slot = (appointment.assigned_doctor, new_date, time_str)
+        if not is_within_working_hours(appointment.assigned_doctor, new_date, time_str, user_id):
+            reason = "outside the doctor's working hours"
+        elif slot in claimed:
+            reason = "another moved appointment takes the slot"
+        elif is_held_by_other_call(appointment.assigned_doctor, new_date, time_str, user_id, call_id):
+            reason = "the slot is held by another call"
+        elif slot not in vacated and not is_slot_unbooked(appointment.assigned_doctor, new_date, time_str, user_id):
+            reason = "the slot is already booked"
+        elif is_calendar_blocked(appointment.assigned_doctor, new_date, time_str, user_id):
+            reason = "the doctor's calendar is busy"
+        else:
+            moves[appointment.appointment_id] = new_date
+            claimed.add(slot)
+            vacated.add((appointment.assigned_doctor, appointment.appointment_date, time_str))
+            continue
+        rejected.append({
+            "appointment_id": appointment.appointment_id,
+            "appointment_date": appointment.appointment_date,
+            "appointment_time": appointment.appointment_time,
+            "reason": reason,
+        })
+    return moves, rejected
+
+def finish_slot_booking(key: tuple, hold, hold_created: bool, booked: bool) -> None:
+    """
+    Ends a booking claim from HOLDS.begin_booking. A hold taken just for the
+    booking is dropped; a hold the caller placed earlier is kept if the
+    booking did not go through.
+    """
+    keep = not booked and not hold_created
+    HOLDS.finish_booking(key, keep=keep)
+    if not keep and not hold_created:
+        publish_hold_release(key, hold)
+
+def _appointment_change_key(row) -> tuple:
+    """Identifies one state of an appointment row, for deduplicating change echoes."""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name, None)
+    return (get("appointment_id"), get("current_status"), get("assigned_doctor"), get("appointment_date"), get("appointment_time"))
+
+def apply_slot_change(user_id: str, row: dict, deleted: bool = False) -> None:
+    """Updates the materialized slot tables for one appointment row."""
+    if not row.get("appointment_id"):
+        return
+    if deleted or row.get("current_status") != "scheduled":
+        SLOT_MATERIALIZER.apply_remove(user_id, row["appointment_id"])
+    else:
+        SLOT_MATERIALIZER.apply_upsert(user_id, row["appointment_id"], row["assigned_doctor"], row["appointment_date"], row["appointment_time"])
+
+def publish_appointment_change(user_id: str, appointment: Appointment) -> None:
+    """Pushes an appointment's current slot (or its removal) to schedule replicas."""
+    _LOCAL_APPOINTMENT_CHANGES.set(_appointment_change_key(appointment), True)
+    apply_slot_change(user_id, appointment.model_dump())
+    PATIENT_NAMES.add(user_id, appointment.patient_name)
+    if appointment.current_status == "scheduled":
+        SCHEDULE_FEED.publish(user_id, {
+            "op": "upsert",
+            "appointment_id": appointment.appointment_id,
+            "assigned_doctor": appointment.assigned_doctor,
+            "appointment_date": appointment.appointment_date,
+            "appointment_time": appointment.appointment_time,
+        })
+    else:
+        SCHEDULE_FEED.publish(user_id, {"op": "remove", "appointment_id": appointment.appointment_id})
+
+def on_user_settings_change(change: dict) -> None:
+    """Evicts a tenant's cached settings and updates its agent phone after its user_settings row changes."""
+    user_id = (change["record"] or change["old_record"]).get("user_id")
+    if user_id:
+        SETTINGS_CACHE.delete(user_id)
+        SLOT_MATERIALIZER.drop_tenant(user_id)
+        if change["type"] == "DELETE":
+            AGENT_PHONES.drop_user(user_id)
+        else:
+            AGENT_PHONES.set(user_id, change["record"].get("agent_phone"))
+    else:
+        # Deletes only carry the primary key unless the table has REPLICA IDENTITY FULL
+        SETTINGS_CACHE.clear()
+        AGENT_PHONES.clear()
+        for tenant in SLOT_MATERIALIZER.tenants():
+            SLOT_MATERIALIZER.drop_tenant(tenant)
+
+def on_appointment_change(change: dict) -> None:
+    """Relays an appointment change made by another worker to this worker's schedule replicas."""
+    row = change["record"] or change["old_record"]
+    user_id = row.get("user_id")
+    if not user_id or not row.get("appointment_id"):
+        return
+    if row.get("patient_name"):
+        PATIENT_NAMES.add(user_id, row["patient_name"])
+    if _LOCAL_APPOINTMENT_CHANGES.get(_appointment_change_key(row)):
+        return
+    apply_slot_change(user_id, row, deleted=change["type"] == "DELETE")
+    if change["type"] == "DELETE" or row.get("current_status") != "scheduled":
+        SCHEDULE_FEED.publish(user_id, {"op": "remove", "appointment_id": row["appointment_id"]})
+    else:
+        SCHEDULE_FEED.publish(user_id, {
+            "op": "upsert",
+            "appointment_id": row["appointment_id"],
+            "assigned_doctor": row.get("assigned_doctor"),
+            "appointment_date": row.get("appointment_date"),
+            "appointment_time": row.get("appointment_time"),
+        })
+
+INVALIDATION_BUS.subscribe("user_settings", on_user_settings_change)
+INVALIDATION_BUS.subscribe("appointment_details", on_appointment_change)
+
+def idempotent(tool: str, success_result: str):
+    """
+    Makes a mutating endpoint replay its result to repeated calls.
+
+    Adds an optional Idempotency-Key header; without it the key is a hash of
+    call_id, tool and body. Only responses equal to success_result are stored.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(body, user_id: str, call_id: str, idempotency_key: Optional[str] = None, **kwargs) -> dict:
+            if idempotency_key:
+                key, derived = f"{tool}:{idempotency_key}", False
+            else:
+                key, derived = derive_idempotency_key(call_id, tool, body.model_dump()), True
+            return await IDEMPOTENCY.run(
+                (user_id, call_id), key, derived,
+                lambda: endpoint(body, user_id=user_id, call_id=call_id, **kwargs),
+                lambda response: response.get("result") == success_result,
+            )
+
+        signature = inspect.signature(endpoint)
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(
+                "idempotency_key", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=None,
+                annotation=Annotated[Optional[str], Header(alias="Idempotency-Key")],
+            ),
+        ])
+        return wrapper
+    return decorator
+
+async def suggest_openings(doctor_name: str, appointment_date: str, appointment_time: str, user_id: str, call_id: str) -> List[dict]:
+    """Looks up to a week ahead for openings with a doctor when the requested day has none."""
+    response = await next_available(
+        NextAvailableBody(doctor_name=doctor_name, from_date=appointment_date, from_time=appointment_time, days=7, k=3),
+        user_id=user_id, call_id=call_id,
+    )
+    return response.get("result") or []
+
 # MCP Tools
-@app.post("/schedule_appointment")
-async def schedule_appointment(body: ScheduleAppointmentBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+@router.post("/schedule_appointment")
+@off_loop
+@idempotent("schedule_appointment", "Appointment scheduled successfully.")
+async def schedule_appointment(
+    body: ScheduleAppointmentBody,
+    user_id: str = Header(..., alias="X-User-Id"),
+    call_id: str = Header(..., alias="X-Call-Id"),
+    caller_number: Annotated[Optional[str], Header(alias="X-Caller-Number")] = None,
+) -> dict:
     """
     Schedules an appointment for a patient with a doctor.
     """
     try:
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
         
         # Format time consistently before checking availability
         formatted_time = format_time_for_db(body.appointment_time)
@@ -432,13 +1501,30 @@ async def schedule_appointment(body: ScheduleAppointmentBody, user_id: str = Hea
                 formatted_slots = [format_time_for_speech(slot) for slot in available_slots]
                 return {"result": f"Doctor {body.assigned_doctor} is not available at {format_time_for_speech(formatted_time)} on {body.appointment_date} (outside working hours). However, they have openings at: {', '.join(formatted_slots)}. Would any of these times work for you?"}
             else:
+                openings = await suggest_openings(body.assigned_doctor, body.appointment_date, formatted_time, validated_user_id, call_id)
+                if openings:
+                    return {"result": f"Doctor {body.assigned_doctor} is not working on {body.appointment_date}. The nearest openings are: {describe_openings(openings)}. Would any of these work for you?"}
                 return {"result": f"Doctor {body.assigned_doctor} is not working on {body.appointment_date}. Please choose a different date."}
         
-        # Then check if slot is already booked
-        is_available = db_check_availability(body.assigned_doctor, body.appointment_date, formatted_time)
+        # Claim the slot for this call (converting the call's hold, if any) so no
+        # other call can book or hold it while the appointment is written
+        hold_key = (validated_user_id, body.assigned_doctor, body.appointment_date, formatted_time)
+        hold, hold_created = HOLDS.begin_booking(hold_key, call_id)
+
+        # Then check if slot is already booked or blocked in the doctor's calendar
+        try:
+            is_available = hold is not None \
+                and db_check_availability(body.assigned_doctor, body.appointment_date, formatted_time) \
+                and not is_calendar_blocked(body.assigned_doctor, body.appointment_date, formatted_time, validated_user_id)
+        except Exception:
+            if hold is not None:
+                finish_slot_booking(hold_key, hold, hold_created, booked=False)
+            raise
         print(f"DEBUG: Checking slot availability for {body.assigned_doctor} on {body.appointment_date} at {formatted_time}: {is_available}")
         
         if not is_available:
+            if hold is not None:
+                finish_slot_booking(hold_key, hold, hold_created, booked=False)
             print(f"DEBUG: Slot not available, checking for alternative slots...")
             # Create a GetAvailableSlotsBody object to call get_available_slots
             slots_body = GetAvailableSlotsBody(doctor_name=body.assigned_doctor, appointment_date=body.appointment_date)
@@ -449,52 +1535,47 @@ async def schedule_appointment(body: ScheduleAppointmentBody, user_id: str = Hea
                 formatted_slots = [format_time_for_speech(slot) for slot in available_slots]
                 return {"result": f"Doctor {body.assigned_doctor} is not available at {format_time_for_speech(formatted_time)} on {body.appointment_date}. However, they have openings at: {', '.join(formatted_slots)}. Would any of these times work for you?"}
             else:
+                openings = await suggest_openings(body.assigned_doctor, body.appointment_date, formatted_time, validated_user_id, call_id)
+                if openings:
+                    return {"result": f"Doctor {body.assigned_doctor} is fully booked on {body.appointment_date}. The nearest openings are: {describe_openings(openings)}. Would any of these work for you?"}
                 return {"result": f"Doctor {body.assigned_doctor} is not available at {formatted_time} on {body.appointment_date}, and there are no other available slots on that day."}
         
         print(f"DEBUG: Slot is available, proceeding with appointment creation...")
-        
-        # Check for duplicate appointments with same call_id and patient details
-        duplicate_check = supabase.table("appointment_details").select("*")\
-            .eq("call_id", call_id)\
-            .eq("patient_name", body.patient_name)\
-            .eq("assigned_doctor", body.assigned_doctor)\
-            .eq("appointment_date", body.appointment_date)\
-            .eq("appointment_time", formatted_time)\
-            .eq("current_status", "scheduled")\
-            .execute()
-        
-        if duplicate_check.data:
-            existing_appointment = duplicate_check.data[0]
-            print(f"DEBUG: Found duplicate appointment: {existing_appointment['appointment_id']}")
-            return {"result": "Appointment scheduled successfully."}
-
-        clinic_prefix = db_get_clinic_prefix(validated_user_id)
-        if not clinic_prefix:
-            return {"result": "Failed to get clinic prefix for appointment ID generation."}
-
-        last_numeric_id = db_get_last_appointment_numeric_id(clinic_prefix)
-        new_numeric_id = last_numeric_id + 1
-        new_appointment_id = f"{clinic_prefix}-{new_numeric_id:06d}"
-
-        # Create appointment with formatted time
-        appointment = Appointment(
-            patient_name=body.patient_name,
-            assigned_doctor=body.assigned_doctor,
-            appointment_date=body.appointment_date,
-            appointment_time=formatted_time,  # Use formatted time
-            appointment_reason=body.appointment_reason,
-            appointment_id=new_appointment_id,
-            user_id=validated_user_id,
-            call_id=call_id
-        )
+        # Repeated tool calls are answered by @idempotent before reaching here
 
-        print(f"DEBUG: Creating appointment in database...")
-        new_appointment = db_schedule_appointment(appointment, validated_user_id, call_id)
+        new_appointment = None
+        try:
+            clinic_prefix = db_get_clinic_prefix(validated_user_id)
+            if not clinic_prefix:
+                return {"result": "Failed to get clinic prefix for appointment ID generation."}
+
+            last_numeric_id = db_get_last_appointment_numeric_id(clinic_prefix)
+            new_numeric_id = last_numeric_id + 1
+            new_appointment_id = f"{clinic_prefix}-{new_numeric_id:06d}"
+
+            # Create appointment with formatted time
+            appointment = Appointment(
+                patient_name=body.patient_name,
+                assigned_doctor=body.assigned_doctor,
+                appointment_date=body.appointment_date,
+                appointment_time=formatted_time,  # Use formatted time
+                appointment_reason=body.appointment_reason,
+                appointment_id=new_appointment_id,
+                user_id=validated_user_id,
+                call_id=call_id,
+                patient_phone=normalize_phone_number(caller_number)
+            )
+
+            print(f"DEBUG: Creating appointment in database...")
+            new_appointment = db_schedule_appointment(appointment, validated_user_id, call_id)
+        finally:
+            finish_slot_booking(hold_key, hold, hold_created, booked=new_appointment is not None)
         if not new_appointment:
             print(f"DEBUG: Failed to create appointment in database")
             return {"result": "Failed to schedule appointment."}
 
         print(f"DEBUG: Appointment created successfully: {new_appointment.appointment_id}")
+        publish_appointment_change(validated_user_id, new_appointment)
         print(f"DEBUG: Adding appointment to Google Calendar...")
         add_to_google_calendar(new_appointment, validated_user_id)
         
@@ -507,7 +1588,8 @@ async def schedule_appointment(body: ScheduleAppointmentBody, user_id: str = Hea
         print(f"Error scheduling appointment: {e}")
         return {"result": f"Failed to schedule appointment: {e}"}
 
-@app.post("/check_availability")
+@router.post("/check_availability")
+@off_loop
 async def check_availability(body: CheckAvailabilityBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
     """
     Checks the availability of a doctor at a specific time.
@@ -515,11 +1597,14 @@ async def check_availability(body: CheckAvailabilityBody, user_id: str = Header(
     try:
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
         
         # Format time consistently before checking availability
         formatted_time = format_time_for_db(body.appointment_time)
         
-        if db_check_availability(body.doctor_name, body.appointment_date, formatted_time):
+        if not is_held_by_other_call(body.doctor_name, body.appointment_date, formatted_time, validated_user_id, call_id) \
+                and is_slot_unbooked(body.doctor_name, body.appointment_date, formatted_time, validated_user_id) \
+                and not is_calendar_blocked(body.doctor_name, body.appointment_date, formatted_time, validated_user_id):
             return {"result": f"Doctor {body.doctor_name} is available at {formatted_time} on {body.appointment_date}."}
         else:
             return {"result": f"Doctor {body.doctor_name} is not available at {formatted_time} on {body.appointment_date}."}
@@ -530,7 +1615,72 @@ async def check_availability(body: CheckAvailabilityBody, user_id: str = Header(
         print(f"Error checking availability: {e}")
         return {"result": f"Failed to check availability: {e}"}
 
-@app.post("/reschedule_appointment")
+@router.post("/hold_slot")
+@off_loop
+async def hold_slot(body: HoldSlotBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+    """
+    Holds a doctor's slot for this call while the caller confirms.
+    Other calls see the slot as unavailable until it is booked, released or
+    the hold expires; holding it again renews the hold.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
+        formatted_time = format_time_for_db(body.appointment_time)
+
+        if not is_within_working_hours(body.doctor_name, body.appointment_date, formatted_time, validated_user_id):
+            return {"result": f"Doctor {body.doctor_name} is not working at {formatted_time} on {body.appointment_date}."}
+
+        key = (validated_user_id, body.doctor_name, body.appointment_date, formatted_time)
+        hold, created = HOLDS.place(key, call_id)
+        if hold is None:
+            return {"result": f"Doctor {body.doctor_name} is not available at {formatted_time} on {body.appointment_date}."}
+
+        if created:
+            # Held first so no other call can take the slot between the check and the hold
+            if not is_slot_unbooked(body.doctor_name, body.appointment_date, formatted_time, validated_user_id) \
+                    or is_calendar_blocked(body.doctor_name, body.appointment_date, formatted_time, validated_user_id):
+                HOLDS.release(key, call_id)
+                return {"result": f"Doctor {body.doctor_name} is not available at {formatted_time} on {body.appointment_date}."}
+            publish_hold(key, hold)
+
+        minutes = max(1, int(HOLD_TTL_SECONDS // 60))
+        return {"result": f"Doctor {body.doctor_name} is available and the slot at {formatted_time} on {body.appointment_date} is held for {minutes} minutes."}
+    except ValueError as e:
+        print(f"Invalid user_id format: {e}")
+        return {"result": f"Failed to hold slot: Invalid user_id format"}
+    except Exception as e:
+        print(f"Error holding slot: {e}")
+        return {"result": f"Failed to hold slot: {e}"}
+
+@router.post("/release_hold")
+@off_loop
+async def release_hold(body: ReleaseHoldBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+    """
+    Releases this call's hold on a slot, or every hold of the call if no slot is given.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
+        if body.doctor_name and body.appointment_date and body.appointment_time:
+            key = (validated_user_id, body.doctor_name, body.appointment_date, format_time_for_db(body.appointment_time))
+            hold = HOLDS.release(key, call_id)
+            released = [(key, hold)] if hold else []
+        else:
+            released = HOLDS.release_call(validated_user_id, call_id)
+        for key, hold in released:
+            publish_hold_release(key, hold)
+        return {"result": f"Released {len(released)} held slot(s)."}
+    except ValueError as e:
+        print(f"Invalid user_id format: {e}")
+        return {"result": f"Failed to release hold: Invalid user_id format"}
+    except Exception as e:
+        print(f"Error releasing hold: {e}")
+        return {"result": f"Failed to release hold: {e}"}
+
+@router.post("/reschedule_appointment")
+@off_loop
+@idempotent("reschedule_appointment", "Appointment rescheduled successfully.")
 async def reschedule_appointment(body: RescheduleAppointmentBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
     """
     Reschedules an existing appointment.
@@ -542,28 +1692,20 @@ async def reschedule_appointment(body: RescheduleAppointmentBody, user_id: str =
         # Format time consistently
         formatted_time = format_time_for_db(body.new_time)
         
-        # 1. Fetch old appointment details to get event_id and calendar_id
-        try:
-            response = supabase.table("appointment_details").select("*").eq("appointment_id", body.appointment_id).single().execute()
-            old_appointment_data = response.data
-            if not old_appointment_data:
-                return {"result": "Appointment not found for rescheduling."}
-            old_appointment = Appointment(**old_appointment_data)
-        except Exception as e:
-            print(f"Error fetching old appointment for reschedule: {e}")
-            return {"result": "Failed to fetch old appointment details."}
-
-        # 2. Delete the old event from Google Calendar
-        if old_appointment.event_id:
-            remove_from_google_calendar(old_appointment, validated_user_id)
-
-        # 3. Update the database record with new date/time (using formatted time)
+        # 1. Update the database record with new date/time (using formatted time).
+        # The updated row carries the event_id, so no separate fetch is needed.
         updated_appointment = db_reschedule_appointment(body.appointment_id, body.new_date, formatted_time)
         if not updated_appointment:
-            return {"result": "Failed to update appointment in database."}
+            return {"result": "Appointment not found or could not be updated for rescheduling."}
+        publish_appointment_change(validated_user_id, updated_appointment)
 
-        # 4. Create a new event in Google Calendar and get the new event_id
-        add_to_google_calendar(updated_appointment, validated_user_id)
+        # 2. Move the existing Calendar event in place; insert only if it was never created.
+        # Settings are loaded once and shared by the calendar call.
+        user_settings = db_fetch_user_settings(validated_user_id)
+        if updated_appointment.event_id:
+            update_google_calendar(updated_appointment, validated_user_id, user_settings)
+        else:
+            add_to_google_calendar(updated_appointment, validated_user_id, user_settings)
 
         return {"result": "Appointment rescheduled successfully."}
     except ValueError as e:
@@ -573,7 +1715,9 @@ async def reschedule_appointment(body: RescheduleAppointmentBody, user_id: str =
         print(f"Error rescheduling appointment: {e}")
         return {"result": f"Failed to reschedule appointment: {e}"}
 
-@app.post("/cancel_appointment")
+@router.post("/cancel_appointment")
+@off_loop
+@idempotent("cancel_appointment", "Appointment cancelled successfully.")
 async def cancel_appointment(body: CancelAppointmentBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
     """
     Cancels an existing appointment.
@@ -585,6 +1729,7 @@ async def cancel_appointment(body: CancelAppointmentBody, user_id: str = Header(
         cancelled_appointment = db_cancel_appointment(body.appointment_id)
         if not cancelled_appointment:
             return {"result": "Failed to cancel appointment."}
+        publish_appointment_change(validated_user_id, cancelled_appointment)
 
         remove_from_google_calendar(cancelled_appointment, validated_user_id)
 
@@ -596,66 +1741,128 @@ async def cancel_appointment(body: CancelAppointmentBody, user_id: str = Header(
         print(f"Error cancelling appointment: {e}")
         return {"result": f"Failed to cancel appointment: {e}"}
 
+# Calendar services keyed by service account identity. The underlying httplib2
+# transport is not thread-safe, so each worker thread keeps its own services.
+_calendar_services = threading.local()
+
 def get_calendar_service(calendar_auth: dict):
-    """Creates a Google Calendar service using the provided auth credentials."""
+    """Creates (or reuses) a Google Calendar service for the provided auth credentials."""
+    cache_key = (calendar_auth.get("client_email"), calendar_auth.get("private_key_id"))
+    services = getattr(_calendar_services, "by_key", None)
+    if services is None:
+        services = _calendar_services.by_key = {}
+    service = services.get(cache_key)
+    if service is not None:
+        return service
     try:
+        import httplib2
+        from google.oauth2 import service_account
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build
         credentials = service_account.Credentials.from_service_account_info(
             calendar_auth,
             scopes=['https://www.googleapis.com/auth/calendar']
         )
-        return build('calendar', 'v3', credentials=credentials)
+        # Socket timeout so a hung request releases its thread after the deadline
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=CALENDAR.deadline_seconds))
+        service = build('calendar', 'v3', http=http, cache_discovery=False)
     except Exception as e:
         print(f"Error creating calendar service: {e}")
         return None
+    services[cache_key] = service
+    return service
 
-def add_to_google_calendar(appointment: Appointment, user_id: str):
-    """Adds an appointment to Google Calendar."""
+def calendar_call(request, idempotent: bool = False):
+    """
+    Executes a Calendar API request under the CALENDAR deadline and breaker.
+
+    Services are per thread because httplib2 is not thread-safe; a request
+    abandoned at its deadline may still be using this thread's connection, so
+    the thread's services are rebuilt on the next use.
+    """
     try:
-        # Validate and standardize user_id format
-        validated_user_id = validate_user_id(user_id)
-        
-        user_settings = db_fetch_user_settings(validated_user_id)
-        if not user_settings or not user_settings.calendar_auth:
-            print("User settings or calendar auth not found.")
-            return
+        return CALENDAR.call(request.execute, idempotent=idempotent)
+    except DependencyUnavailable:
+        _calendar_services.by_key = {}
+        raise
 
-        doctor = next((d for d in user_settings.doctor_details if d.name == appointment.assigned_doctor), None)
-        if not doctor:
-            print(f"Doctor {appointment.assigned_doctor} not found.")
+def resolve_calendar_target(assigned_doctor: str, user_id: str, user_settings: Optional[UserSettings] = None) -> tuple:
+    """
+    Resolves the Calendar service and doctor for an appointment.
+
+    Pass user_settings when the caller already loaded them to avoid another fetch.
+
+    Returns:
+        (service, doctor), or (None, None) if calendar sync is not configured
+    """
+    if user_settings is None:
+        user_settings = db_fetch_user_settings(validate_user_id(user_id))
+    if not user_settings or not user_settings.calendar_auth:
+        print("User settings or calendar auth not found.")
+        return None, None
+
+    doctor = find_doctor(user_settings, assigned_doctor)
+    if not doctor:
+        print(f"Doctor {assigned_doctor} not found.")
+        return None, None
+
+    service = get_calendar_service(user_settings.calendar_auth)
+    if service is None:
+        return None, None
+    return service, doctor
+
+def build_calendar_event_times(appointment: Appointment) -> dict:
+    """Builds the start/end portion of a Calendar event (1 hour long) for an appointment."""
+    # Format time consistently before creating calendar event
+    formatted_time = format_time_for_db(appointment.appointment_time)
+
+    # Use the utility function to format datetime for Google Calendar
+    start_datetime = format_datetime_for_google_calendar(
+        None,
+        appointment.appointment_date,
+        formatted_time
+    )
+
+    # Calculate end time (1 hour after start)
+    start_dt = datetime.strptime(f"{appointment.appointment_date} {formatted_time}", "%Y-%m-%d %H:%M:%S")
+    end_dt = start_dt + timedelta(hours=1)
+    end_datetime = format_datetime_for_google_calendar(IST.localize(end_dt))
+
+    return {
+        'start': {
+            'dateTime': start_datetime,
+            'timeZone': 'Asia/Kolkata',
+        },
+        'end': {
+            'dateTime': end_datetime,
+            'timeZone': 'Asia/Kolkata',
+        },
+    }
+
+def build_appointment_event(appointment: Appointment) -> dict:
+    """Builds the Calendar event body for a new appointment."""
+    return {
+        'summary': f"Appointment with {appointment.patient_name}",
+        'description': appointment.appointment_reason,
+        **build_calendar_event_times(appointment),
+        # Lets the calendar sync tell our own events from external busy time
+        'extendedProperties': {
+            'private': {APPOINTMENT_EVENT_PROPERTY: appointment.appointment_id or ""},
+        },
+    }
+
+def add_to_google_calendar(appointment: Appointment, user_id: str, user_settings: Optional[UserSettings] = None):
+    """Adds an appointment to Google Calendar."""
+    try:
+        service, doctor = resolve_calendar_target(appointment.assigned_doctor, user_id, user_settings)
+        if not service:
             return
 
-        # Format time consistently before creating calendar event
-        formatted_time = format_time_for_db(appointment.appointment_time)
-        
-        # Use the utility function to format datetime for Google Calendar
-        start_datetime = format_datetime_for_google_calendar(
-            None, 
-            appointment.appointment_date, 
-            formatted_time
-        )
-        
-        # Calculate end time (1 hour after start)
-        start_dt = datetime.strptime(f"{appointment.appointment_date} {formatted_time}", "%Y-%m-%d %H:%M:%S")
-        end_dt = start_dt + timedelta(hours=1)
-        end_datetime = format_datetime_for_google_calendar(IST.localize(end_dt))
-
-        service = get_calendar_service(user_settings.calendar_auth)
-        event = {
-            'summary': f"Appointment with {appointment.patient_name}",
-            'description': appointment.appointment_reason,
-            'start': {
-                'dateTime': start_datetime,
-                'timeZone': 'Asia/Kolkata',
-            },
-            'end': {
-                'dateTime': end_datetime,
-                'timeZone': 'Asia/Kolkata',
-            },
-        }
+        event = build_appointment_event(appointment)
 
         try:
-            created_event = service.events().insert(calendarId=doctor.calendarId, body=event).execute()
-            supabase.table("appointment_details").update({
+            created_event = calendar_call(service.events().insert(calendarId=doctor.calendarId, body=event))
+            get_supabase().table("appointment_details").update({
                 "event_id": created_event['id']
             }).eq("appointment_id", appointment.appointment_id).execute()
         except Exception as e:
@@ -665,50 +1872,15 @@ def add_to_google_calendar(appointment: Appointment, user_id: str):
     except Exception as e:
         print(f"An unexpected error occurred in add_to_google_calendar: {e}")
 
-def update_google_calendar(appointment: Appointment, user_id: str):
+def update_google_calendar(appointment: Appointment, user_id: str, user_settings: Optional[UserSettings] = None):
     """Updates an appointment on Google Calendar."""
     try:
-        # Validate and standardize user_id format
-        validated_user_id = validate_user_id(user_id)
-        
-        user_settings = db_fetch_user_settings(validated_user_id)
-        if not user_settings or not user_settings.calendar_auth:
-            return
-
-        doctor = next((d for d in user_settings.doctor_details if d.name == appointment.assigned_doctor), None)
-        if not doctor:
-            print(f"Doctor {appointment.assigned_doctor} not found.")
+        service, doctor = resolve_calendar_target(appointment.assigned_doctor, user_id, user_settings)
+        if not service:
             return
 
-        # Format time consistently before updating calendar event
-        formatted_time = format_time_for_db(appointment.appointment_time)
-        
-        # Use the utility function to format datetime for Google Calendar
-        start_datetime = format_datetime_for_google_calendar(
-            None, 
-            appointment.appointment_date, 
-            formatted_time
-        )
-        
-        # Calculate end time (1 hour after start)
-        start_dt = datetime.strptime(f"{appointment.appointment_date} {formatted_time}", "%Y-%m-%d %H:%M:%S")
-        end_dt = start_dt + timedelta(hours=1)
-        end_datetime = format_datetime_for_google_calendar(IST.localize(end_dt))
-
-        service = get_calendar_service(user_settings.calendar_auth)
-        event = {
-            'start': {
-                'dateTime': start_datetime,
-                'timeZone': 'Asia/Kolkata',
-            },
-            'end': {
-                'dateTime': end_datetime,
-                'timeZone': 'Asia/Kolkata',
-            },
-        }
-
         try:
-            service.events().patch(calendarId=doctor.calendarId, eventId=appointment.event_id, body=event).execute()
+            calendar_call(service.events().patch(calendarId=doctor.calendarId, eventId=appointment.event_id, body=build_calendar_event_times(appointment)), idempotent=True)
         except Exception as e:
             print(f"Error updating calendar event: {e}")
     except ValueError as e:
@@ -716,25 +1888,15 @@ def update_google_calendar(appointment: Appointment, user_id: str):
     except Exception as e:
         print(f"An unexpected error occurred in update_google_calendar: {e}")
 
-def remove_from_google_calendar(appointment: Appointment, user_id: str):
+def remove_from_google_calendar(appointment: Appointment, user_id: str, user_settings: Optional[UserSettings] = None):
     """Removes an appointment from Google Calendar."""
     try:
-        # Validate and standardize user_id format
-        validated_user_id = validate_user_id(user_id)
-        
-        user_settings = db_fetch_user_settings(validated_user_id)
-        if not user_settings or not user_settings.calendar_auth:
-            return
-
-        doctor = next((d for d in user_settings.doctor_details if d.name == appointment.assigned_doctor), None)
-        if not doctor:
-            print(f"Doctor {appointment.assigned_doctor} not found.")
+        service, doctor = resolve_calendar_target(appointment.assigned_doctor, user_id, user_settings)
+        if not service:
             return
 
-        service = get_calendar_service(user_settings.calendar_auth)
-
         try:
-            service.events().delete(calendarId=doctor.calendarId, eventId=appointment.event_id).execute()
+            calendar_call(service.events().delete(calendarId=doctor.calendarId, eventId=appointment.event_id))
         except Exception as e:
             print(f"Error deleting calendar event: {e}")
     except ValueError as e:
@@ -742,7 +1904,53 @@ def remove_from_google_calendar(appointment: Appointment, user_id: str):
     except Exception as e:
         print(f"An unexpected error occurred in remove_from_google_calendar: {e}")
 
-@app.post("/get_doctor_details_for_user")
+# Google recommends at most 50 calls per Calendar batch request
+CALENDAR_BATCH_SIZE = 50
+
+def run_calendar_batch(service, requests: List[tuple], chunk_size: int = CALENDAR_BATCH_SIZE) -> tuple:
+    """
+    Executes Calendar API requests as batch HTTP requests, in chunks.
+
+    Args:
+        service: Google Calendar service
+        requests: List of (request_id, HttpRequest) pairs
+        chunk_size: Number of requests per batch
+
+    Returns:
+        (responses, failures, progress) where responses and failures map request_id
+        to the API response / error message, and progress has one entry per chunk
+    """
+    responses = {}
+    failures = {}
+    progress = []
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            failures[request_id] = str(exception)
+        else:
+            responses[request_id] = response
+
+    for start in range(0, len(requests), chunk_size):
+        chunk = requests[start:start + chunk_size]
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, request in chunk:
+            batch.add(request, request_id=request_id)
+        try:
+            calendar_call(batch)
+        except Exception as e:
+            # The whole chunk failed to send; record every request in it
+            for request_id, _ in chunk:
+                failures.setdefault(request_id, str(e))
+        progress.append({
+            "processed": start + len(chunk),
+            "total": len(requests),
+            "failed": len(failures),
+        })
+        print(f"DEBUG: Calendar batch progress: {progress[-1]}")
+    return responses, failures, progress
+
+@router.post("/get_doctor_details_for_user")
+@off_loop
 async def get_doctor_details_for_user(body: GetDoctorDetailsBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
     """
     Fetches the doctor details for a given user_id.
@@ -754,7 +1962,7 @@ async def get_doctor_details_for_user(body: GetDoctorDetailsBody, user_id: str =
         user_settings = db_fetch_user_settings(validated_user_id)
         if not user_settings:
             return {"result": []}
-        return {"result": [d.dict() for d in user_settings.doctor_details]}
+        return {"result": [d.model_dump() for d in user_settings.doctor_details]}
     except ValueError as e:
         print(f"Invalid user_id format: {e}")
         return {"result": []}
@@ -762,7 +1970,56 @@ async def get_doctor_details_for_user(body: GetDoctorDetailsBody, user_id: str =
         print(f"Error fetching doctor details: {e}")
         return {"result": []}
 
-@app.post("/add_call_history")
+@router.post("/get_caller_profile")
+@off_loop
+async def get_caller_profile(
+    body: GetCallerProfileBody,
+    user_id: str = Header(..., alias="X-User-Id"),
+    call_id: str = Header(..., alias="X-Call-Id"),
+    caller_number: Annotated[Optional[str], Header(alias="X-Caller-Number")] = None,
+) -> dict:
+    """
+    Looks up a returning caller by phone number: the patient names booked
+    from that number (most recent first) and their upcoming appointments.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+        patient_phone = normalize_phone_number(body.caller_number or caller_number)
+        if not patient_phone:
+            return {"result": None}
+
+        today = datetime.now(IST).strftime("%Y-%m-%d")
+        recent = get_supabase().table("appointment_details").select(APPOINTMENT_COLUMNS)\
+            .eq("user_id", validated_user_id)\
+            .eq("patient_phone", patient_phone)\
+            .order("appointment_date", desc=True)\
+            .order("appointment_time", desc=True)\
+            .limit(50)\
+            .execute()
+        rows = recent.data or []
+        if not rows:
+            return {"result": {"patient_phone": patient_phone, "known": False, "patient_names": [], "upcoming_appointments": []}}
+
+        patient_names = list(dict.fromkeys(row["patient_name"] for row in rows))
+        upcoming = sorted(
+            (row for row in rows if row["current_status"] == "scheduled" and row["appointment_date"] >= today),
+            key=lambda row: (row["appointment_date"], row["appointment_time"]),
+        )[:body.limit]
+        return {"result": {
+            "patient_phone": patient_phone,
+            "known": True,
+            "patient_names": patient_names,
+            "upcoming_appointments": upcoming,
+        }}
+    except ValueError as e:
+        print(f"Invalid user_id format: {e}")
+        return {"result": None}
+    except Exception as e:
+        print(f"Error fetching caller profile: {e}")
+        return {"result": None}
+
+@router.post("/add_call_history")
+@off_loop
 async def add_call_history(body: AddCallHistoryBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
     """
     Adds a call history record to the database.
@@ -781,7 +2038,7 @@ async def add_call_history(body: AddCallHistoryBody, user_id: str = Header(...,
         print(f"DEBUG: Storing call_start: {formatted_call_start}")
         print(f"DEBUG: Storing call_end: {formatted_call_end}")
         
-        supabase.table("call_history").insert({
+        get_supabase().table("call_history").insert({
             "caller_number": body.caller_number,
             "called_number": body.called_number,
             "call_start": formatted_call_start,
@@ -793,6 +2050,9 @@ async def add_call_history(body: AddCallHistoryBody, user_id: str = Header(...,
             "call_id": call_id,
             "user_id": validated_user_id,
         }).execute()
+        # The call is over; free any slot it was still holding
+        for key, hold in HOLDS.release_call(validated_user_id, call_id):
+            publish_hold_release(key, hold)
         return {"result": "Call history added successfully."}
     except ValueError as e:
         print(f"Invalid user_id format: {e}")
@@ -801,22 +2061,38 @@ async def add_call_history(body: AddCallHistoryBody, user_id: str = Header(...,
         print(f"Error adding call history: {e}")
         return {"result": f"Failed to add call history: {e}"}
 
-@app.post("/get_user_id_by_agent_phone")
+@router.post("/get_user_id_by_agent_phone")
+@off_loop
 async def get_user_id_by_agent_phone(body: GetUserIdBody, call_id: str = Header(..., alias="X-Call-Id")) -> Optional[dict]:
     """
     Fetches the user_id associated with a given agent_phone from user_settings.
+
+    Numbers are matched in E.164 form from the in-memory AGENT_PHONES index;
+    the database is only queried for numbers the index has not seen.
     """
     try:
         print(f"DEBUG: Looking for user_id with agent_phone: {body.agent_phone}")
-        response = supabase.table("user_settings").select("user_id").eq("agent_phone", body.agent_phone).single().execute()
+        known, indexed_user_id = AGENT_PHONES.lookup(body.agent_phone)
+        if known:
+            print(f"DEBUG: Returning indexed user_id: {indexed_user_id}")
+            return {"result": indexed_user_id}
+
+        spellings = list({body.agent_phone, phone_key(body.agent_phone)})
+        response = get_supabase().table("user_settings").select("user_id,agent_phone").in_("agent_phone", spellings).limit(2).execute()
         print(f"DEBUG: Database response: {response.data}")
-        
-        if response.data:
+
+        rows = response.data or []
+        if len(rows) == 1:
             # Validate and standardize user_id format before returning
-            validated_user_id = validate_user_id(response.data["user_id"])
+            validated_user_id = validate_user_id(rows[0]["user_id"])
+            AGENT_PHONES.set(validated_user_id, rows[0]["agent_phone"])
             print(f"DEBUG: Returning validated user_id: {validated_user_id}")
             return {"result": validated_user_id}
-        
+
+        if rows:
+            print(f"DEBUG: agent_phone {body.agent_phone} is assigned to {len(rows)} users")
+        else:
+            AGENT_PHONES.remember_missing(body.agent_phone)
         print(f"DEBUG: No user found for agent_phone: {body.agent_phone}")
         return {"result": None}
     except ValueError as e:
@@ -826,75 +2102,140 @@ async def get_user_id_by_agent_phone(body: GetUserIdBody, call_id: str = Header(
         print(f"Error fetching user_id by agent phone: {e}")
         return {"result": None}
 
-@app.post("/get_appointment_details")
-async def get_appointment_details(body: GetAppointmentDetailsBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+@router.post("/get_appointment_details")
+@off_loop
+async def get_appointment_details(body: GetAppointmentDetailsBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> ResultResponse:
     """
     Fetches appointment details based on patient name, doctor, and date.
+
+    Without an appointment_date only upcoming appointments are returned unless
+    include_past is set. Results are paginated; pass next_cursor back as cursor
+    to fetch the following page. When several stored patients have names like
+    patient_name, result is a message asking which one is meant and
+    candidates lists them (see resolve_patient_name).
     """
     try:
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
-        
-        query = supabase.table("appointment_details").select("*").eq("user_id", validated_user_id)
-        if body.patient_name:
-            query = query.eq("patient_name", body.patient_name)
-        if body.assigned_doctor:
-            query = query.eq("assigned_doctor", body.assigned_doctor)
-        if body.appointment_date:
-            query = query.eq("appointment_date", body.appointment_date)
-        
-        response = query.execute()
-        if response.data:
-            return {"result": [Appointment(**d).dict() for d in response.data]}
-        return {"result": []}
+        body = canonical_doctor_args(body, validated_user_id)
+        today = datetime.now(IST).strftime("%Y-%m-%d")
+
+        # Speech-to-text spellings vary: resolve to one stored patient, or ask which one
+        names, candidates = resolve_patient_name(validated_user_id, body.patient_name) if body.patient_name else ([], [])
+        if candidates:
+            return ambiguous_patient_response(body.patient_name, candidates)
+
+        def build_query():
+            query = get_supabase().table("appointment_details").select(APPOINTMENT_COLUMNS).eq("user_id", validated_user_id)
+            if names:
+                query = query.in_("patient_name", names)
+            if body.assigned_doctor:
+                query = query.eq("assigned_doctor", body.assigned_doctor)
+            if body.appointment_date:
+                query = query.eq("appointment_date", body.appointment_date)
+            elif not body.include_past:
+                query = query.gte("appointment_date", today)
+            return query
+
+        rows, next_cursor = db_fetch_appointment_page(build_query, body.limit, body.cursor)
+        return ResultResponse({"result": rows, "next_cursor": next_cursor})
     except ValueError as e:
-        print(f"Invalid user_id format: {e}")
-        return {"result": []}
+        print(f"Invalid request: {e}")
+        return ResultResponse({"result": [], "next_cursor": None})
     except Exception as e:
         print(f"Error getting appointment details: {e}")
-        return {"result": []}
+        return ResultResponse({"result": [], "next_cursor": None})
 
-@app.post("/list_appointments_for_patient")
-async def list_appointments_for_patient(body: ListAppointmentsBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+@router.post("/list_appointments_for_patient")
+@off_loop
+async def list_appointments_for_patient(body: ListAppointmentsBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> ResultResponse:
     """
-    Lists all upcoming appointments for a given patient.
+    Lists upcoming appointments for a given patient, one page at a time.
+    Ambiguous names are answered like in get_appointment_details.
     """
     try:
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
         
-        today = datetime.now().strftime("%Y-%m-%d")
-        response = supabase.table("appointment_details").select("*")\
-            .eq("user_id", validated_user_id)\
-            .eq("patient_name", body.patient_name)\
-            .gte("appointment_date", today)\
-            .order("appointment_date", desc=False)\
-            .order("appointment_time", desc=False)\
-            .execute()
-        if response.data:
-            return {"result": [Appointment(**d).dict() for d in response.data]}
-        return {"result": []}
+        today = datetime.now(IST).strftime("%Y-%m-%d")
+
+        names, candidates = resolve_patient_name(validated_user_id, body.patient_name)
+        if candidates:
+            return ambiguous_patient_response(body.patient_name, candidates)
+
+        def build_query():
+            return get_supabase().table("appointment_details").select(APPOINTMENT_COLUMNS)\
+                .eq("user_id", validated_user_id)\
+                .in_("patient_name", names)\
+                .gte("appointment_date", today)
+
+        rows, next_cursor = db_fetch_appointment_page(build_query, body.limit, body.cursor)
+        return ResultResponse({"result": rows, "next_cursor": next_cursor})
     except ValueError as e:
-        print(f"Invalid user_id format: {e}")
-        return {"result": []}
+        print(f"Invalid request: {e}")
+        return ResultResponse({"result": [], "next_cursor": None})
     except Exception as e:
         print(f"Error listing appointments for patient: {e}")
-        return {"result": []}
+        return ResultResponse({"result": [], "next_cursor": None})
 
-@app.post("/summarize_call")
+@router.post("/admin/appointments/export")
+async def export_appointments(body: ExportAppointmentsBody, user_id: str = Header(..., alias="X-User-Id")) -> StreamingResponse:
+    """
+    Streams all matching appointments as NDJSON, one row per line.
+
+    Rows are read page by page with keyset pagination, so arbitrarily long
+    histories are exported without holding them in memory.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def build_query():
+        query = get_supabase().table("appointment_details").select(APPOINTMENT_COLUMNS).eq("user_id", validated_user_id)
+        if body.patient_name:
+            query = query.eq("patient_name", body.patient_name)
+        if body.assigned_doctor:
+            query = query.eq("assigned_doctor", body.assigned_doctor)
+        if body.from_date:
+            query = query.gte("appointment_date", body.from_date)
+        if body.to_date:
+            query = query.lte("appointment_date", body.to_date)
+        return query
+
+    def generate_rows():
+        cursor = None
+        while True:
+            try:
+                rows, cursor = db_fetch_appointment_page(build_query, body.page_size, cursor)
+            except Exception as e:
+                print(f"Error exporting appointments: {e}")
+                yield orjson.dumps({"error": str(e)}) + b"\n"
+                return
+            for row in rows:
+                yield orjson.dumps(row) + b"\n"
+            if not cursor:
+                return
+
+    return StreamingResponse(generate_rows(), media_type="application/x-ndjson")
+
+@router.post("/summarize_call")
+@off_loop
 async def summarize_call(body: SummarizeCallBody) -> dict:
     """
     Summarizes a given conversation transcript using an LLM.
     """
     try:
-        model = genai.GenerativeModel('gemini-pro') # Using gemini-pro for summarization
-        response = model.generate_content(f"Summarize the following conversation transcript concisely, focusing on key actions like appointments scheduled, rescheduled, or cancelled, and any clinic information provided:\n\n{body.transcript}")
+        model = get_genai().GenerativeModel('gemini-pro') # Using gemini-pro for summarization
+        response = GEMINI.call(lambda: model.generate_content(f"Summarize the following conversation transcript concisely, focusing on key actions like appointments scheduled, rescheduled, or cancelled, and any clinic information provided:\n\n{body.transcript}"), idempotent=True)
         return {"result": response.text}
     except Exception as e:
         print(f"Error summarizing call: {e}")
         return {"result": f"Failed to summarize call: {e}"}
 
-@app.post("/get_available_slots")
+@router.post("/get_available_slots")
+@off_loop
 async def get_available_slots(body: GetAvailableSlotsBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
     """
     Fetches available 30-minute appointment slots for a given doctor on a specific date.
@@ -902,12 +2243,13 @@ async def get_available_slots(body: GetAvailableSlotsBody, user_id: str = Header
     try:
         # Validate and standardize user_id format
         validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
         
         user_settings = db_fetch_user_settings(validated_user_id)
         if not user_settings:
             return {"result": []}
 
-        doctor = next((d for d in user_settings.doctor_details if d.name == body.doctor_name), None)
+        doctor = find_doctor(user_settings, body.doctor_name)
         if not doctor:
             return {"result": []}
 
@@ -934,11 +2276,22 @@ async def get_available_slots(body: GetAvailableSlotsBody, user_id: str = Header
         start_dt = IST.localize(datetime.strptime(f"{body.appointment_date} {formatted_start_time}", "%Y-%m-%d %H:%M:%S"))
         end_dt = IST.localize(datetime.strptime(f"{body.appointment_date} {formatted_end_time}", "%Y-%m-%d %H:%M:%S"))
 
-        # Fetch booked appointments
-        response = supabase.table("appointment_details").select("appointment_time").eq("assigned_doctor", body.doctor_name).eq("appointment_date", body.appointment_date).eq("current_status", "scheduled").execute()
-        
-        # Extract booked times
-        booked_times = [item["appointment_time"] for item in response.data]
+        # Unbooked slots come from the materialized tables when the date is in their window
+        free_times = SLOT_MATERIALIZER.free_times(validated_user_id, body.doctor_name, body.appointment_date) \
+            if ensure_materialized(validated_user_id) else None
+        if free_times is None:
+            # Fetch booked appointments
+            response = get_supabase().table("appointment_details").select("appointment_time").eq("assigned_doctor", body.doctor_name).eq("appointment_date", body.appointment_date).eq("current_status", "scheduled").execute()
+            booked_times = set(normalize_times(item["appointment_time"] for item in response.data))
+        else:
+            free_times = set(free_times)
+            booked_times = set()
+
+        # Add times other calls are holding
+        booked_times.update(HOLDS.held_times(validated_user_id, body.doctor_name, body.appointment_date, exclude_call_id=call_id))
+
+        # Busy time added directly in the doctor's Google Calendar (synced in the background)
+        busy_intervals = BUSY_STORE.busy_intervals(doctor.calendarId, body.appointment_date) if doctor.calendarId else []
         
         # Generate available slots (30-minute intervals) - limit to first 4 slots
         available_slots = []
@@ -947,7 +2300,10 @@ async def get_available_slots(body: GetAvailableSlotsBody, user_id: str = Header
         
         while current_dt < end_dt and len(available_slots) < max_slots:
             current_time_str = current_dt.strftime("%H:%M:%S")
-            if current_time_str not in booked_times:
+            slot_end = current_dt + timedelta(minutes=30)
+            is_busy = any(s < slot_end and e > current_dt for s, e in busy_intervals)
+            is_free = current_time_str in free_times if free_times is not None else True
+            if is_free and current_time_str not in booked_times and not is_busy:
                 available_slots.append(current_time_str)
             current_dt += timedelta(minutes=30)
         
@@ -960,16 +2316,457 @@ async def get_available_slots(body: GetAvailableSlotsBody, user_id: str = Header
         print(f"Error getting available slots: {e}")
         return {"result": []}
 
-@app.get("/health")
+def find_next_available(user_id: str, doctors: List[Doctor], from_date: str, from_time: Optional[str], days: int, k: int, call_id: Optional[str] = None) -> List[dict]:
+    """
+    Returns the k openings closest to from_date/from_time across `days` days
+    for the given doctors, earliest first among equally close ones.
+
+    Bookings for the whole window come from the materialized slot tables, or
+    else from one query; working hours come
+    from compile_working_hours, and calendar busy time and other calls'
+    holds are excluded. Openings earlier on from_date are included (but
+    never past ones), since they may be closer than later days.
+    """
+    start_date = datetime.strptime(from_date, "%Y-%m-%d")
+    dates = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    anchor = IST.localize(datetime.strptime(f"{from_date} {format_time_for_db(from_time or '00:00')}", "%Y-%m-%d %H:%M:%S"))
+    now = datetime.now(IST)
+
+    # Read bookings from the materialized tables when they cover the whole window
+    materialized = ensure_materialized(user_id) and all(
+        SLOT_MATERIALIZER.free_times(user_id, d.name, day) is not None for d in doctors for day in (dates[0], dates[-1])
+    )
+    taken = set()
+    if not materialized:
+        response = get_supabase().table("appointment_details")\
+            .select("assigned_doctor,appointment_date,appointment_time")\
+            .eq("user_id", user_id)\
+            .in_("assigned_doctor", [d.name for d in doctors])\
+            .in_("appointment_date", dates)\
+            .eq("current_status", "scheduled")\
+            .execute()
+        taken = {(row["assigned_doctor"], row["appointment_date"], row["appointment_time"]) for row in response.data or []}
+
+    candidates = []
+    for doctor in doctors:
+        if not doctor.working_hours:
+            continue
+        weekly = weekly_working_hours(doctor.working_hours)
+        if weekly is None:
+            continue
+        for day in dates:
+            hours = weekly[datetime.strptime(day, "%Y-%m-%d").weekday()]
+            if hours is None:
+                continue
+            held = HOLDS.held_times(user_id, doctor.name, day, exclude_call_id=call_id)
+            free_times = set(SLOT_MATERIALIZER.free_times(user_id, doctor.name, day) or ()) if materialized else None
+            busy_intervals = BUSY_STORE.busy_intervals(doctor.calendarId, day) if doctor.calendarId else []
+            current_dt = IST.localize(datetime.strptime(f"{day} {hours[0]}", "%Y-%m-%d %H:%M:%S"))
+            end_dt = IST.localize(datetime.strptime(f"{day} {hours[1]}", "%Y-%m-%d %H:%M:%S"))
+            while current_dt < end_dt:
+                time_str = current_dt.strftime("%H:%M:%S")
+                slot_end = current_dt + timedelta(minutes=30)
+                unbooked = time_str in free_times if free_times is not None else (doctor.name, day, time_str) not in taken
+                if current_dt >= now and unbooked and time_str not in held \
+                        and not any(s < slot_end and e > current_dt for s, e in busy_intervals):
+                    closeness = abs((current_dt - anchor).total_seconds())
+                    candidates.append((closeness, current_dt, doctor.name, day, time_str))
+                current_dt = slot_end
+
+    return [
+        {"doctor_name": name, "appointment_date": day, "appointment_time": time_str}
+        for _, _, name, day, time_str in heapq.nsmallest(k, candidates)
+    ]
+
+def describe_openings(openings: List[dict]) -> str:
+    """Formats openings for speech, e.g. "Dr A on Monday, 20 October at 9:30 AM"."""
+    return ", ".join(
+        f"{o['doctor_name']} on {datetime.strptime(o['appointment_date'], '%Y-%m-%d').strftime('%A, %d %B')} at {format_time_for_speech(o['appointment_time'])}"
+        for o in openings
+    )
+
+@router.post("/next_available")
+@off_loop
+async def next_available(body: NextAvailableBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+    """
+    Finds the earliest openings for a doctor (or any doctor of a specialty)
+    across several days, ranked by closeness to the requested date and time.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
+
+        user_settings = db_fetch_user_settings(validated_user_id)
+        if not user_settings:
+            return {"result": []}
+        resolver = user_settings.doctor_resolver
+        if body.doctor_name:
+            doctor = resolver.resolve(body.doctor_name)
+            # "the cardiologist" with several cardiologists: search all of them
+            doctors = [doctor] if doctor else resolver.for_specialty(body.doctor_name)
+        elif body.specialty:
+            doctors = resolver.for_specialty(body.specialty)
+        else:
+            doctors = list(user_settings.doctor_details)
+        if not doctors:
+            return {"result": []}
+
+        from_date = body.from_date or datetime.now(IST).strftime("%Y-%m-%d")
+        openings = find_next_available(validated_user_id, doctors, from_date, body.from_time, body.days, body.k, call_id)
+        print(f"DEBUG: Found {len(openings)} openings from {from_date} across {body.days} days")
+        return {"result": openings}
+    except ValueError as e:
+        print(f"Invalid request for next available: {e}")
+        return {"result": []}
+    except Exception as e:
+        print(f"Error finding next available slots: {e}")
+        return {"result": []}
+
+@router.post("/bulk_doctor_leave")
+@off_loop
+async def bulk_doctor_leave(body: BulkDoctorLeaveBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+    """
+    Cancels or moves every scheduled appointment of a doctor on the given dates.
+
+    Affected appointments are selected in one query and updated in one statement
+    (one per target date when rescheduling). When rescheduling, each target slot
+    is checked first; appointments that cannot move are left in place and listed
+    under "not_moved". Calendar events are deleted or patched using batch HTTP
+    requests. The response reports per-chunk progress and any appointments whose
+    Calendar event could not be updated.
+    """
+    try:
+        # Validate and standardize user_id format
+        validated_user_id = validate_user_id(user_id)
+        body = canonical_doctor_args(body, validated_user_id)
+
+        if body.action not in ("cancel", "reschedule"):
+            return {"result": f"Unknown action: {body.action}. Use 'cancel' or 'reschedule'."}
+        if body.action == "reschedule" and body.shift_days == 0:
+            return {"result": "shift_days must be non-zero to reschedule appointments."}
+        if not body.dates:
+            return {"result": "No dates provided."}
+
+        response = get_supabase().table("appointment_details").select(APPOINTMENT_COLUMNS)\
+            .eq("user_id", validated_user_id)\
+            .eq("assigned_doctor", body.doctor_name)\
+            .in_("appointment_date", body.dates)\
+            .eq("current_status", "scheduled")\
+            .execute()
+        appointments = [Appointment(**row) for row in response.data or []]
+        if not appointments:
+            return {"result": f"No scheduled appointments found for {body.doctor_name} on {', '.join(body.dates)}.", "affected": 0}
+
+        not_moved = []
+        if body.action == "cancel":
+            get_supabase().table("appointment_details").update({"current_status": "cancelled"})\
+                .in_("appointment_id", [a.appointment_id for a in appointments])\
+                .execute()
+        else:
+            moves, not_moved = plan_appointment_shift(appointments, body.shift_days, validated_user_id, call_id)
+            appointments = [a for a in appointments if a.appointment_id in moves]
+            # Group by target date; ids (not dates) select the rows so that a
+            # shift onto another leave date cannot move an appointment twice
+            ids_by_new_date = {}
+            for appointment in appointments:
+                appointment.appointment_date = moves[appointment.appointment_id]
+                ids_by_new_date.setdefault(appointment.appointment_date, []).append(appointment.appointment_id)
+            for new_date, appointment_ids in ids_by_new_date.items():
+                get_supabase().table("appointment_details").update({"appointment_date": new_date})\
+                    .in_("appointment_id", appointment_ids)\
+                    .execute()
+        print(f"DEBUG: Bulk {body.action} updated {len(appointments)} appointments for {body.doctor_name}")
+        for appointment in appointments:
+            if body.action == "cancel":
+                appointment.current_status = "cancelled"
+            publish_appointment_change(validated_user_id, appointment)
+
+        calendar_failures = {}
+        progress = []
+        service, doctor = resolve_calendar_target(body.doctor_name, validated_user_id)
+        if service:
+            events = service.events()
+            requests = []
+            for appointment in appointments:
+                if body.action == "cancel":
+                    if appointment.event_id:
+                        requests.append((appointment.appointment_id, events.delete(calendarId=doctor.calendarId, eventId=appointment.event_id)))
+                elif appointment.event_id:
+                    requests.append((appointment.appointment_id, events.patch(calendarId=doctor.calendarId, eventId=appointment.event_id, body=build_calendar_event_times(appointment))))
+                else:
+                    requests.append((appointment.appointment_id, events.insert(calendarId=doctor.calendarId, body=build_appointment_event(appointment))))
+            responses, calendar_failures, progress = run_calendar_batch(service, requests)
+
+            # Newly inserted events need their event_id stored
+            for appointment in appointments:
+                created = responses.get(appointment.appointment_id)
+                if created and not appointment.event_id and created.get("id"):
+                    get_supabase().table("appointment_details").update({"event_id": created["id"]})\
+                        .eq("appointment_id", appointment.appointment_id).execute()
+
+        verb = "cancelled" if body.action == "cancel" else "rescheduled"
+        message = f"{len(appointments)} appointments for {body.doctor_name} {verb} successfully."
+        if not_moved:
+            message += f" {len(not_moved)} could not be moved and were left in place: " \
+                + "; ".join(f"{r['appointment_id']} ({r['reason']})" for r in not_moved) + "."
+        return {
+            "result": message,
+            "affected": len(appointments),
+            "not_moved": not_moved,
+            "calendar_failures": [{"appointment_id": k, "error": v} for k, v in calendar_failures.items()],
+            "progress": progress,
+        }
+    except ValueError as e:
+        print(f"Invalid request: {e}")
+        return {"result": f"Failed to process doctor leave: {e}"}
+    except Exception as e:
+        print(f"Error processing doctor leave: {e}")
+        return {"result": f"Failed to process doctor leave: {e}"}
+
+def build_schedule_snapshot(user_id: str, days: int) -> dict:
+    """
+    Builds a tenant's schedule for the next `days` days: each doctor's working
+    interval and synced calendar busy time per date, plus the scheduled
+    appointments in the window, stamped with the feed epoch and version it
+    reflects.
+    """
+    # Read the version first: deltas published meanwhile are re-applied idempotently
+    version = SCHEDULE_FEED.version(user_id)
+    user_settings = db_fetch_user_settings(user_id)
+    today = datetime.now(IST).date()
+    dates = [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+
+    schedule = {}
+    for day in dates:
+        schedule[day] = {}
+        for doctor in (user_settings.doctor_details if user_settings else []):
+            start_time_str, end_time_str = parse_working_hours(doctor.working_hours, day) if doctor.working_hours else (None, None)
+            working = [format_time_for_db(start_time_str), format_time_for_db(end_time_str)] if start_time_str and end_time_str else None
+            busy = BUSY_STORE.busy_intervals(doctor.calendarId, day) if doctor.calendarId else []
+            schedule[day][doctor.name] = {
+                "working": working,
+                "busy": [[s.isoformat(), e.isoformat()] for s, e in busy],
+            }
+
+    response = get_supabase().table("appointment_details")\
+        .select("appointment_id,assigned_doctor,appointment_date,appointment_time")\
+        .eq("user_id", user_id)\
+        .in_("appointment_date", dates)\
+        .eq("current_status", "scheduled")\
+        .execute()
+    holds = [
+        {"hold_id": hold.hold_id, "call_id": hold.call_id, "assigned_doctor": key[1], "appointment_date": key[2], "appointment_time": key[3]}
+        for key, hold in HOLDS.holds_for(user_id, dates)
+    ]
+    return {"epoch": SCHEDULE_FEED.epoch, "version": version, "dates": schedule, "appointments": response.data or [], "holds": holds}
+
+@router.post("/admin/slots/consistency")
+@off_loop
+async def check_slot_consistency(body: SlotConsistencyBody, user_id: str = Header(..., alias="X-User-Id")) -> dict:
+    """
+    Compares the tenant's materialized free slots with a full recompute from
+    Supabase and lists mismatching doctor dates; with repair set, rebuilds
+    the tables from the recompute.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+        today = datetime.now(IST).strftime("%Y-%m-%d")
+        if not SLOT_MATERIALIZER.has_tenant(validated_user_id, today):
+            return {"result": {"materialized": False, "consistent": None, "mismatches": []}}
+        changes = SLOT_MATERIALIZER.record_changes(validated_user_id)
+        try:
+            computed = db_compute_slot_tables(validated_user_id, today)
+            if computed is None:
+                return {"result": None}
+            working_hours, dates, appointments = computed
+            expected, _ = SlotMaterializer.compute(working_hours, dates, appointments)
+            mismatches = SLOT_MATERIALIZER.diff(validated_user_id, expected)
+            if mismatches:
+                print(f"WARNING: {len(mismatches)} materialized slot mismatches for {validated_user_id}")
+                METRICS.inc("slot_materializer_mismatches_total", len(mismatches))
+                if body.repair:
+                    SLOT_MATERIALIZER.build_tenant(validated_user_id, working_hours, today, appointments, changes=changes)
+        finally:
+            SLOT_MATERIALIZER.stop_recording(validated_user_id, changes)
+        return {"result": {"materialized": True, "consistent": not mismatches, "mismatches": mismatches}}
+    except ValueError as e:
+        print(f"Invalid user_id format: {e}")
+        return {"result": None}
+    except Exception as e:
+        print(f"Error checking slot consistency: {e}")
+        return {"result": None}
+
+@router.post("/schedule_snapshot")
+@off_loop
+async def schedule_snapshot(body: ScheduleSnapshotBody, user_id: str = Header(..., alias="X-User-Id"), call_id: str = Header(..., alias="X-Call-Id")) -> dict:
+    """
+    Returns the tenant's near-term schedule for agent-side replicas.
+    Follow /schedule_stream for changes after the returned version.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+        days = body.days or SCHEDULE_SNAPSHOT_DAYS
+        return {"result": build_schedule_snapshot(validated_user_id, max(1, min(days, 14)))}
+    except ValueError as e:
+        print(f"Invalid user_id format: {e}")
+        return {"result": None}
+    except Exception as e:
+        print(f"Error building schedule snapshot: {e}")
+        return {"result": None}
+
+@router.get("/schedule_stream")
+async def schedule_stream(user_id: str = Header(..., alias="X-User-Id")) -> StreamingResponse:
+    """
+    Server-sent events stream of the tenant's booking deltas.
+
+    The first event is {"op": "hello"} with the feed "epoch" and current
+    "version"; a replica whose snapshot has another epoch (taken from another
+    worker, or before a restart) must reload it. Every later event is a JSON
+    object with "op" ("upsert", "remove", "hold" or "release"), the affected
+    appointment or hold, and the feed "epoch" and "version". A comment line is
+    sent every 15 seconds to keep idle connections open.
+    """
+    try:
+        validated_user_id = validate_user_id(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    queue = SCHEDULE_FEED.subscribe(validated_user_id)
+
+    async def events():
+        try:
+            yield b": subscribed\n\n"
+            hello = {"op": "hello", "epoch": SCHEDULE_FEED.epoch, "version": SCHEDULE_FEED.version(validated_user_id)}
+            yield b"data: " + orjson.dumps(hello) + b"\n\n"
+            while True:
+                try:
+                    delta = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"data: " + orjson.dumps(delta) + b"\n\n"
+        finally:
+            SCHEDULE_FEED.unsubscribe(validated_user_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+# Tools that can be invoked through /batch, keyed by endpoint name
+TOOL_REGISTRY = {
+    "schedule_appointment": (schedule_appointment, ScheduleAppointmentBody),
+    "check_availability": (check_availability, CheckAvailabilityBody),
+    "hold_slot": (hold_slot, HoldSlotBody),
+    "release_hold": (release_hold, ReleaseHoldBody),
+    "reschedule_appointment": (reschedule_appointment, RescheduleAppointmentBody),
+    "cancel_appointment": (cancel_appointment, CancelAppointmentBody),
+    "get_doctor_details_for_user": (get_doctor_details_for_user, GetDoctorDetailsBody),
+    "get_caller_profile": (get_caller_profile, GetCallerProfileBody),
+    "get_user_settings": (get_user_settings, GetDoctorDetailsBody),
+    "add_call_history": (add_call_history, AddCallHistoryBody),
+    "get_user_id_by_agent_phone": (get_user_id_by_agent_phone, GetUserIdBody),
+    "get_appointment_details": (get_appointment_details, GetAppointmentDetailsBody),
+    "list_appointments_for_patient": (list_appointments_for_patient, ListAppointmentsBody),
+    "get_available_slots": (get_available_slots, GetAvailableSlotsBody),
+    "next_available": (next_available, NextAvailableBody),
+    "summarize_call": (summarize_call, SummarizeCallBody),
+}
+
+# Tools that write: a batch runs them one after another, after its reads, so
+# e.g. two bookings never race for the same appointment ID
+MUTATING_TOOLS = {
+    "schedule_appointment", "hold_slot", "release_hold", "reschedule_appointment",
+    "cancel_appointment", "add_call_history",
+}
+
+# Upper bound on invocations accepted in one /batch request
+MAX_BATCH_SIZE = 20
+
+def _identity_kwargs(endpoint, identity: dict) -> dict:
+    """Returns the identity headers an endpoint accepts, as keyword arguments."""
+    accepted = inspect.signature(endpoint).parameters
+    return {k: v for k, v in identity.items() if k in accepted}
+
+async def _run_batch_item(invocation: BatchInvocation, identity: dict) -> dict:
+    """Runs one batch invocation and reports its result or error with timing."""
+    started = time.perf_counter()
+    item = {"tool": invocation.tool, "result": None, "error": None}
+    try:
+        entry = TOOL_REGISTRY.get(invocation.tool)
+        if not entry:
+            raise ValueError(f"Unknown tool: {invocation.tool}")
+        endpoint, body_model = entry
+        body = body_model(**invocation.args)
+        # Tool endpoints run off the loop (see off_loop), so batch items overlap their I/O
+        response = await endpoint(body, **_identity_kwargs(endpoint, identity))
+        item["result"] = response.get("result") if response else None
+    except Exception as e:
+        print(f"Error running batch item {invocation.tool}: {e}")
+        item["error"] = str(e)
+    item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return item
+
+@router.post("/batch")
+async def batch(
+    body: BatchBody,
+    user_id: Optional[str] = Header(None, alias="X-User-Id"),
+    call_id: str = Header(..., alias="X-Call-Id"),
+    caller_number: Optional[str] = Header(None, alias="X-Caller-Number"),
+) -> dict:
+    """
+    Runs several tool invocations in one round-trip.
+
+    Read-only invocations run concurrently; mutating ones (MUTATING_TOOLS)
+    then run one at a time in the order given. All invocations share the
+    request's X-User-Id/X-Call-Id/X-Caller-Number and a per-request cache
+    (e.g. user settings are fetched once). Results are returned in the order
+    of the invocations, each with its own error and timing.
+    """
+    started = time.perf_counter()
+    if len(body.invocations) > MAX_BATCH_SIZE:
+        return {"result": [], "error": f"Batch too large: at most {MAX_BATCH_SIZE} invocations are allowed"}
+
+    identity = {"user_id": user_id, "call_id": call_id, "caller_number": caller_number}
+    token = _request_cache.set({"_lock": threading.Lock()})
+    try:
+        reads = [i for i, inv in enumerate(body.invocations) if inv.tool not in MUTATING_TOOLS]
+        items = [None] * len(body.invocations)
+        results = await asyncio.gather(*(_run_batch_item(body.invocations[i], identity) for i in reads))
+        for i, item in zip(reads, results):
+            items[i] = item
+        for i, invocation in enumerate(body.invocations):
+            if items[i] is None:
+                items[i] = await _run_batch_item(invocation, identity)
+    finally:
+        _request_cache.reset(token)
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    print(f"DEBUG: Batch of {len(items)} invocations completed in {elapsed_ms} ms")
+    return {"result": items, "elapsed_ms": elapsed_ms}
+
+@router.get("/health")
 async def health_check():
     """Health check endpoint for deployment monitoring"""
     return {
         "status": "healthy",
         "service": "SYRAA Clinic MCP Server",
-        "timestamp": datetime.now(IST).isoformat()
+        "timestamp": datetime.now(IST).isoformat(),
+        "startup": STARTUP_METRICS
     }
 
-@app.get("/")
+@router.get("/ready")
+async def ready():
+    """
+    Readiness probe for deploys: 503 until warmup has finished and Supabase
+    answers, then 200. Includes warmup steps and dependency latencies.
+    """
+    status = await asyncio.to_thread(READINESS.status, ["supabase"])
+    return ORJSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@router.get("/metrics")
+async def metrics():
+    """Process metrics: counters, gauges and histograms (e.g. invalidation staleness)"""
+    return {"result": METRICS.snapshot()}
+
+@router.get("/")
 async def root():
     """Root endpoint"""
     return {
@@ -978,5 +2775,20 @@ async def root():
         "docs": "/docs"
     }
 
+def __getattr__(name: str):
+    """
+    Builds the module-level ``app`` on first access (``uvicorn mcp_server:app``),
+    so importing this module for its functions neither builds the application
+    nor loads the MCP transport.
+    """
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    import sys
+    import uvicorn
+    # mcp_transport imports "mcp_server": alias this module so it is not loaded a second time
+    sys.modules.setdefault("mcp_server", sys.modules[__name__])
+    uvicorn.run(create_app(), host="0.0.0.0", port=8000)
\ No newline at end of file
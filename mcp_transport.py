@@ -0,0 +1,212 @@
+"""
+Model Context Protocol transport for the clinic MCP server.
+This module registers the same tool set exposed by the REST endpoints in
+mcp_server.py on a FastMCP server, served over streamable HTTP (and SSE for
+older clients). An agent opens one long-lived session per call and can
+pipeline several tool invocations over it.
+"""
+
+import json
+import weakref
+from typing import Optional, Tuple
+
+from mcp.server.fastmcp import FastMCP, Context
+
+import mcp_server as server
+from utils import validate_user_id
+
+# Identity bound to each MCP session: ServerSession -> (user_id, call_id)
+_SESSION_IDENTITIES = weakref.WeakKeyDictionary()
+
+def _bind_identity(ctx: Context) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns the (user_id, call_id) bound to the caller's MCP session.
+
+    Identity is read from the X-User-Id / X-Call-Id headers of the first request
+    that reaches a tool in the session and validated once; later calls on the
+    same session reuse it without revalidation.
+    """
+    session = ctx.session
+    identity = _SESSION_IDENTITIES.get(session)
+    if identity is not None:
+        return identity
+
+    request = getattr(ctx.request_context, "request", None)
+    headers = request.headers if request is not None else {}
+    raw_user_id = headers.get("x-user-id")
+    call_id = headers.get("x-call-id")
+
+    user_id = None
+    if raw_user_id:
+        try:
+            user_id = validate_user_id(raw_user_id)
+        except ValueError as e:
+            print(f"Invalid user_id format on MCP session: {e}")
+
+    identity = (user_id, call_id)
+    _SESSION_IDENTITIES[session] = identity
+    print(f"DEBUG: Bound MCP session to user_id: {user_id}, call_id: {call_id}")
+    return identity
+
+def _require_identity(ctx: Context) -> Tuple[str, str]:
+    """Returns the session identity, raising if the tenant was not supplied."""
+    user_id, call_id = _bind_identity(ctx)
+    if not user_id:
+        raise ValueError("MCP session was opened without a valid X-User-Id header")
+    return user_id, call_id
+
+def _caller_number(ctx: Context) -> Optional[str]:
+    """Returns the X-Caller-Number header of the caller's MCP session, if any."""
+    request = getattr(ctx.request_context, "request", None)
+    return request.headers.get("x-caller-number") if request is not None else None
+
+def _dump(response: Optional[dict]) -> str:
+    """Serializes an endpoint response's result as JSON text for the MCP client."""
+    result = response.get("result") if response else None
+    return json.dumps(result, default=str)
+
+def _dump_page(response: Optional[dict]) -> str:
+    """
+    Serializes a page of appointments as {"appointments": [...], "next_cursor": ...};
+    a message result (such as which patient is meant) is serialized as is.
+    """
+    result = response.get("result") if response else None
+    if isinstance(result, list):
+        result = {"appointments": result, "next_cursor": response.get("next_cursor")}
+    return json.dumps(result, default=str)
+
+def build_mcp_server() -> FastMCP:
+    """Creates a FastMCP server exposing the clinic tools."""
+    mcp = FastMCP("syraa-clinic")
+    # The streamable HTTP app is mounted under /mcp by create_app()
+    mcp.settings.streamable_http_path = "/"
+
+    @mcp.tool()
+    async def schedule_appointment(patient_name: str, assigned_doctor: str, appointment_date: str, appointment_time: str, appointment_reason: str, ctx: Context) -> str:
+        """Schedules an appointment for a patient with a doctor."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.ScheduleAppointmentBody(
+            patient_name=patient_name,
+            assigned_doctor=assigned_doctor,
+            appointment_date=appointment_date,
+            appointment_time=appointment_time,
+            appointment_reason=appointment_reason,
+        )
+        return _dump(await server.schedule_appointment(body, user_id=user_id, call_id=call_id, caller_number=_caller_number(ctx)))
+
+    @mcp.tool()
+    async def check_availability(doctor_name: str, appointment_date: str, appointment_time: str, ctx: Context) -> str:
+        """Checks the availability of a doctor at a specific time."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.CheckAvailabilityBody(doctor_name=doctor_name, appointment_date=appointment_date, appointment_time=appointment_time)
+        return _dump(await server.check_availability(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def hold_slot(doctor_name: str, appointment_date: str, appointment_time: str, ctx: Context) -> str:
+        """Holds a doctor's slot for this call while the caller confirms."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.HoldSlotBody(doctor_name=doctor_name, appointment_date=appointment_date, appointment_time=appointment_time)
+        return _dump(await server.hold_slot(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def release_hold(ctx: Context, doctor_name: Optional[str] = None, appointment_date: Optional[str] = None, appointment_time: Optional[str] = None) -> str:
+        """Releases this call's hold on a slot, or all of its holds."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.ReleaseHoldBody(doctor_name=doctor_name, appointment_date=appointment_date, appointment_time=appointment_time)
+        return _dump(await server.release_hold(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def reschedule_appointment(appointment_id: str, new_date: str, new_time: str, ctx: Context) -> str:
+        """Reschedules an existing appointment."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.RescheduleAppointmentBody(appointment_id=appointment_id, new_date=new_date, new_time=new_time)
+        return _dump(await server.reschedule_appointment(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def cancel_appointment(appointment_id: str, ctx: Context) -> str:
+        """Cancels an existing appointment."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.CancelAppointmentBody(appointment_id=appointment_id)
+        return _dump(await server.cancel_appointment(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def get_doctor_details_for_user(ctx: Context) -> str:
+        """Fetches the doctor details for the session's clinic."""
+        user_id, call_id = _require_identity(ctx)
+        return _dump(await server.get_doctor_details_for_user(server.GetDoctorDetailsBody(), user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def get_caller_profile(ctx: Context, caller_number: Optional[str] = None, limit: int = 5) -> str:
+        """Looks up a returning caller's patient names and upcoming appointments by phone number."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.GetCallerProfileBody(caller_number=caller_number, limit=limit)
+        return _dump(await server.get_caller_profile(body, user_id=user_id, call_id=call_id, caller_number=_caller_number(ctx)))
+
+    @mcp.tool()
+    async def get_user_settings(ctx: Context) -> str:
+        """Fetches the entire user settings object for the session's clinic."""
+        user_id, call_id = _require_identity(ctx)
+        return _dump(await server.get_user_settings(server.GetDoctorDetailsBody(), user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def add_call_history(caller_number: str, called_number: str, call_start: str, call_end: str, call_duration: str, call_status: str, appointment_status: str, call_summary: str, ctx: Context) -> str:
+        """Adds a call history record to the database."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.AddCallHistoryBody(
+            caller_number=caller_number,
+            called_number=called_number,
+            call_start=call_start,
+            call_end=call_end,
+            call_duration=call_duration,
+            call_status=call_status,
+            appointment_status=appointment_status,
+            call_summary=call_summary,
+        )
+        return _dump(await server.add_call_history(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def get_user_id_by_agent_phone(agent_phone: str, ctx: Context) -> str:
+        """Fetches the user_id associated with a given agent_phone from user_settings."""
+        _, call_id = _bind_identity(ctx)
+        return _dump(await server.get_user_id_by_agent_phone(server.GetUserIdBody(agent_phone=agent_phone), call_id=call_id))
+
+    @mcp.tool()
+    async def get_appointment_details(patient_name: str, ctx: Context, assigned_doctor: Optional[str] = None, appointment_date: Optional[str] = None, include_past: bool = False, limit: int = 10, cursor: Optional[str] = None) -> str:
+        """
+        Fetches appointment details based on patient name, doctor, and date.
+        When next_cursor is set, pass it back as cursor for the next page.
+        """
+        user_id, call_id = _require_identity(ctx)
+        body = server.GetAppointmentDetailsBody(patient_name=patient_name, assigned_doctor=assigned_doctor, appointment_date=appointment_date, include_past=include_past, limit=limit, cursor=cursor)
+        return _dump_page(await server.get_appointment_details(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def list_appointments_for_patient(patient_name: str, ctx: Context, limit: int = 10, cursor: Optional[str] = None) -> str:
+        """
+        Lists the next upcoming appointments for a given patient.
+        When next_cursor is set, pass it back as cursor for the next page.
+        """
+        user_id, call_id = _require_identity(ctx)
+        body = server.ListAppointmentsBody(patient_name=patient_name, limit=limit, cursor=cursor)
+        return _dump_page(await server.list_appointments_for_patient(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def get_available_slots(doctor_name: str, appointment_date: str, ctx: Context) -> str:
+        """Fetches available 30-minute appointment slots for a given doctor on a specific date."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.GetAvailableSlotsBody(doctor_name=doctor_name, appointment_date=appointment_date)
+        return _dump(await server.get_available_slots(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def next_available(ctx: Context, doctor_name: Optional[str] = None, specialty: Optional[str] = None, from_date: Optional[str] = None, from_time: Optional[str] = None, days: int = 7, k: int = 3) -> str:
+        """Finds the earliest openings for a doctor or specialty across several days."""
+        user_id, call_id = _require_identity(ctx)
+        body = server.NextAvailableBody(doctor_name=doctor_name, specialty=specialty, from_date=from_date, from_time=from_time, days=days, k=k)
+        return _dump(await server.next_available(body, user_id=user_id, call_id=call_id))
+
+    @mcp.tool()
+    async def summarize_call(transcript: str) -> str:
+        """Summarizes a given conversation transcript using an LLM."""
+        return _dump(await server.summarize_call(server.SummarizeCallBody(transcript=transcript)))
+
+    return mcp
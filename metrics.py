@@ -0,0 +1,92 @@
+"""
+Lightweight in-process metrics.
+This module provides counters, gauges and fixed-bucket histograms shared by
+the MCP server and the agent. The server exposes a snapshot on /metrics.
+"""
+
+import bisect
+import itertools
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _key(name: str, labels: Optional[dict]) -> Tuple[str, Tuple]:
+    return name, tuple(sorted((labels or {}).items()))
+
+class Histogram:
+    """Counts observations into fixed buckets and tracks sum, count and max."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self) -> dict:
+        """Returns the histogram with cumulative buckets: le_X counts observations <= X, like Prometheus."""
+        cumulative = list(itertools.accumulate(self.counts))
+        buckets = {f"le_{b}": c for b, c in zip(self.buckets, cumulative)}
+        buckets["le_inf"] = cumulative[-1]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "max": round(self.max, 6),
+            "buckets": buckets,
+        }
+
+class Metrics:
+    """Thread-safe registry of named, optionally labelled metrics."""
+
+    def __init__(self):
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, labels: Optional[dict] = None) -> None:
+        """Increments a counter."""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        """Sets a gauge to value."""
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """Records an observation in a histogram."""
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """Returns every metric as plain JSON-serializable data."""
+        def render(key):
+            name, labels = key
+            if not labels:
+                return name
+            return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+        with self._lock:
+            return {
+                "counters": {render(k): v for k, v in self._counters.items()},
+                "gauges": {render(k): v for k, v in self._gauges.items()},
+                "histograms": {render(k): h.snapshot() for k, h in self._histograms.items()},
+            }
+
+# Process-wide registry
+METRICS = Metrics()
@@ -0,0 +1,142 @@
+"""
+Fuzzy patient-name index for appointment lookups.
+Names heard over the phone come back from speech-to-text with varying
+spelling and spacing ("Ramesh Kumar", "ramesh kumaar", "Rameshkumar"). This
+module keeps, per tenant, every stored patient name under a normalized key,
+a phonetic key and its character trigrams, so a lookup can resolve a heard
+name to the stored spellings it most likely means in memory, before a
+single database query.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Titles dropped before matching
+_HONORIFICS = {"mr", "mrs", "ms", "miss", "master", "dr", "shri", "sri", "smt", "kumari", "baby"}
+
+# Digraphs that Indian names are commonly spelled with or without
+_PHONETIC_DIGRAPHS = [
+    ("ph", "f"), ("bh", "b"), ("dh", "d"), ("gh", "g"), ("jh", "j"), ("kh", "k"),
+    ("sh", "s"), ("th", "t"), ("ch", "c"), ("ck", "k"), ("ee", "i"), ("oo", "u"),
+]
+_PHONETIC_LETTERS = str.maketrans({"q": "k", "v": "w", "z": "j", "x": "k", "y": "i"})
+
+def normalize_name(name: str) -> str:
+    """Lowercases, strips accents, punctuation and titles, and collapses whitespace."""
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().lower()
+    tokens = [t for t in re.sub(r"[^a-z ]+", " ", text).split() if t not in _HONORIFICS]
+    return " ".join(tokens)
+
+def phonetic_key(name: str) -> str:
+    """
+    Returns a coarse sound-alike key: per token, the first letter followed by
+    its consonants with digraphs folded and repeats collapsed, so that e.g.
+    "kumar" and "kumaar", or "sharma" and "sarma", share a key.
+    """
+    keys = []
+    for token in normalize_name(name).split():
+        for digraph, replacement in _PHONETIC_DIGRAPHS:
+            token = token.replace(digraph, replacement)
+        token = token.translate(_PHONETIC_LETTERS)
+        key = token[0] + re.sub(r"[aeiouh]", "", token[1:])
+        keys.append(re.sub(r"(.)\1+", r"\1", key))
+    return " ".join(keys)
+
+def trigrams(name: str) -> Set[str]:
+    """Returns the character trigrams of the normalized name, spaces removed and padded."""
+    compact = f"  {normalize_name(name).replace(' ', '')} "
+    return {compact[i:i + 3] for i in range(len(compact) - 2)}
+
+class _Entry:
+    __slots__ = ("name", "normalized", "phonetic", "phonetic_tokens", "trigrams")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.normalized = normalize_name(name)
+        self.phonetic = phonetic_key(name)
+        self.phonetic_tokens = set(self.phonetic.split())
+        self.trigrams = trigrams(name)
+
+class PatientNameIndex:
+    """
+    Per-tenant index of stored patient names.
+
+    Candidates for a query are gathered through an inverted trigram index and
+    the phonetic key, then scored:
+        1.0  same normalized name
+        0.9  same phonetic key
+        0.75 + 0.2 * similarity when every query token sounds like a token of
+             the name (a first name alone, or names in a different order)
+        otherwise the trigram Jaccard similarity
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, _Entry]] = {}
+        self._by_trigram: Dict[str, Dict[str, Set[str]]] = {}
+        self._by_phonetic: Dict[str, Dict[str, Set[str]]] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._entries
+
+    def load(self, user_id: str, names: Iterable[str]) -> None:
+        """Replaces a tenant's index with the given names."""
+        with self._lock:
+            self._entries[user_id] = {}
+            self._by_trigram[user_id] = {}
+            self._by_phonetic[user_id] = {}
+            for name in names:
+                self._add(user_id, name)
+
+    def add(self, user_id: str, name: str) -> None:
+        """Adds a name to a loaded tenant's index (names of unloaded tenants arrive with the load)."""
+        with self._lock:
+            if user_id in self._entries:
+                self._add(user_id, name)
+
+    def drop(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._by_trigram.pop(user_id, None)
+            self._by_phonetic.pop(user_id, None)
+
+    def _add(self, user_id: str, name: str) -> None:
+        """Caller holds the lock and has loaded the tenant."""
+        if not name or name in self._entries[user_id]:
+            return
+        entry = _Entry(name)
+        self._entries[user_id][name] = entry
+        for gram in entry.trigrams:
+            self._by_trigram[user_id].setdefault(gram, set()).add(name)
+        for token in entry.phonetic_tokens:
+            self._by_phonetic[user_id].setdefault(token, set()).add(name)
+
+    def search(self, user_id: str, query: str, limit: int = 5, min_score: float = 0.4) -> List[Tuple[str, float]]:
+        """Returns up to `limit` stored names matching query as (name, score), best first."""
+        probe = _Entry(query)
+        if not probe.normalized:
+            return []
+        with self._lock:
+            entries = self._entries.get(user_id, {})
+            candidates = set()
+            for gram in probe.trigrams:
+                candidates |= self._by_trigram.get(user_id, {}).get(gram, set())
+            for token in probe.phonetic_tokens:
+                candidates |= self._by_phonetic.get(user_id, {}).get(token, set())
+            scored = [(name, _score(probe, entries[name])) for name in candidates]
+        ranked = sorted((item for item in scored if item[1] >= min_score), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+def _score(probe: _Entry, entry: _Entry) -> float:
+    if probe.normalized == entry.normalized:
+        return 1.0
+    if probe.phonetic == entry.phonetic:
+        return 0.9
+    union = probe.trigrams | entry.trigrams
+    similarity = len(probe.trigrams & entry.trigrams) / len(union) if union else 0.0
+    if probe.phonetic_tokens <= entry.phonetic_tokens:
+        return 0.75 + 0.2 * similarity
+    return similarity
@@ -0,0 +1,105 @@
+"""
+Agent phone number index for the MCP server.
+Every inbound call starts by resolving the number that was dialled to the
+clinic that owns it. The mapping changes almost never, so it is kept in
+memory under E.164 keys, loaded with the tenants' settings and updated when a
+user_settings row changes. Numbers that belong to no clinic are remembered for
+a short while, so repeated calls to an unassigned number do not each query
+the database.
+"""
+
+import threading
+from typing import Dict, Optional
+
+from cache import TTLCache
+from metrics import METRICS
+from utils import normalize_phone_number
+
+def phone_key(phone: Optional[str]) -> Optional[str]:
+    """Returns the index key of a phone number: its E.164 form, or the trimmed input if it cannot be parsed."""
+    if not phone:
+        return None
+    return normalize_phone_number(phone) or str(phone).strip() or None
+
+class PhoneIndex:
+    """
+    Maps agent phone numbers to user_ids.
+
+    Args:
+        negative_ttl_seconds: How long a number found to belong to no tenant
+            is answered from memory
+    """
+
+    def __init__(self, negative_ttl_seconds: float = 60):
+        self._by_phone: Dict[str, str] = {}
+        self._by_user: Dict[str, str] = {}
+        self._missing = TTLCache(negative_ttl_seconds)
+        self._lock = threading.Lock()
+
+    def load(self, phones: Dict[str, str]) -> None:
+        """Replaces the index with {user_id: agent_phone}."""
+        by_phone = {}
+        by_user = {}
+        for user_id, phone in phones.items():
+            key = phone_key(phone)
+            if key is not None:
+                by_phone[key] = user_id
+                by_user[user_id] = key
+        with self._lock:
+            self._by_phone = by_phone
+            self._by_user = by_user
+        self._missing.clear()
+
+    def set(self, user_id: str, phone: Optional[str]) -> None:
+        """Records a tenant's agent phone, replacing the number it had before."""
+        key = phone_key(phone)
+        with self._lock:
+            previous = self._by_user.pop(user_id, None)
+            if previous is not None and self._by_phone.get(previous) == user_id:
+                del self._by_phone[previous]
+            if key is not None:
+                self._by_phone[key] = user_id
+                self._by_user[user_id] = key
+        if key is not None:
+            self._missing.delete(key)
+
+    def drop_user(self, user_id: str) -> None:
+        with self._lock:
+            key = self._by_user.pop(user_id, None)
+            if key is not None and self._by_phone.get(key) == user_id:
+                del self._by_phone[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_phone.clear()
+            self._by_user.clear()
+        self._missing.clear()
+
+    def lookup(self, phone: str) -> tuple:
+        """
+        Returns (known, user_id). known is False when the number has to be
+        looked up in the database; (True, None) means it recently matched no tenant.
+        """
+        key = phone_key(phone)
+        if key is None:
+            return True, None
+        with self._lock:
+            user_id = self._by_phone.get(key)
+        if user_id is not None:
+            METRICS.inc("phone_index_lookups_total", labels={"outcome": "hit"})
+            return True, user_id
+        if self._missing.get(key):
+            METRICS.inc("phone_index_lookups_total", labels={"outcome": "negative_hit"})
+            return True, None
+        METRICS.inc("phone_index_lookups_total", labels={"outcome": "miss"})
+        return False, None
+
+    def remember_missing(self, phone: str) -> None:
+        """Remembers that a number belongs to no tenant, for the negative TTL."""
+        key = phone_key(phone)
+        if key is not None:
+            self._missing.set(key, True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._by_phone)
@@ -0,0 +1,268 @@
+"""
+Opt-in request profiling for the MCP server.
+When an endpoint regresses, profiling can be switched on for chosen routes,
+chosen tenants, or requests carrying an X-Profile header. A bounded fraction
+of matching requests is profiled, one at a time, either by sampling the
+stack of the thread serving the request or with cProfile, and the result is
+written to disk: sampled stacks in collapsed ("folded") format for
+flamegraph.pl or speedscope, cProfile stats as .prof files for snakeviz.
+The middleware is only installed when a trigger is configured, so it costs
+nothing otherwise.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import cProfile
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Optional, Union
+
+from metrics import METRICS
+
+# Innermost frames of a thread waiting for I/O on an idle event loop; those
+# samples are not time spent on the request
+_IDLE_FRAMES = {("selectors.py", "select")}
+
+class StackSampler:
+    """
+    Samples the Python stacks of the request's threads every `interval_seconds`
+    on a background thread: the one serving it, plus any worker thread that
+    joins with profile_current_thread(). Samples of an idle event loop are
+    skipped.
+    """
+
+    def __init__(self, thread_id: int, interval_seconds: float):
+        self.thread_ids = {thread_id}
+        self.interval_seconds = interval_seconds
+        self.counts: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def add_thread(self, thread_id: int) -> None:
+        self.thread_ids = self.thread_ids | {thread_id}
+
+    def remove_thread(self, thread_id: int) -> None:
+        self.thread_ids = self.thread_ids - {thread_id}
+
+    @contextlib.contextmanager
+    def attach(self):
+        """Samples the calling thread until the block exits."""
+        thread_id = threading.get_ident()
+        self.add_thread(thread_id)
+        try:
+            yield
+        finally:
+            self.remove_thread(thread_id)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.counts[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """Returns the samples in collapsed-stack format, one "frame;frame;frame count" line per stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+class ThreadProfiles:
+    """
+    cProfile profiles of the request's threads. cProfile only observes the
+    thread that enabled it, so each thread joining with
+    profile_current_thread() gets its own profile; they are merged when
+    written.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def attach(self):
+        """Profiles the calling thread until the block exits."""
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def dump_stats(self, filename: str) -> None:
+        with self._lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(filename)
+
+# The profile of the request being profiled in this context, if any
+_active_profile: contextvars.ContextVar[Optional[Union[StackSampler, ThreadProfiles]]] = contextvars.ContextVar("active_profile", default=None)
+
+@contextlib.contextmanager
+def profile_current_thread():
+    """Adds the calling thread to the profile of the request being profiled, if any, until the block exits."""
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.attach():
+        yield
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and writes their profiles.
+
+    Args:
+        routes: Paths whose requests are profiled
+        tenants: user_ids whose requests are profiled
+        header_enabled: Profile requests sent with "X-Profile: 1"
+        sample_rate: Fraction of matching requests profiled
+        mode: "sample" (stack sampling) or "cprofile"
+        output_dir: Where profiles are written
+        interval_seconds: Stack sampling interval
+        max_files: Oldest profiles are deleted beyond this many
+    """
+
+    def __init__(
+        self,
+        routes: Iterable[str] = (),
+        tenants: Iterable[str] = (),
+        header_enabled: bool = False,
+        sample_rate: float = 0.1,
+        mode: str = "sample",
+        output_dir: str = "profiles",
+        interval_seconds: float = 0.005,
+        max_files: int = 200,
+    ):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.routes = set(routes)
+        self.tenants = {t.lower() for t in tenants}
+        self.header_enabled = header_enabled
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval_seconds = interval_seconds
+        self.max_files = max_files
+        # One profile at a time bounds the overhead and keeps profiles of
+        # concurrent requests on the event loop from overlapping
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.routes or self.tenants or self.header_enabled) and self.sample_rate > 0
+
+    def wants(self, path: str, tenant: Optional[str], header: bool) -> bool:
+        """Returns True if a request matches a trigger and is picked by the sample rate."""
+        matched = path in self.routes or (tenant is not None and tenant in self.tenants) or (header and self.header_enabled)
+        return matched and random.random() < self.sample_rate
+
+    def try_begin(self) -> bool:
+        return self._busy.acquire(blocking=False)
+
+    def end(self) -> None:
+        self._busy.release()
+
+    def write(self, path: str, tenant: Optional[str], suffix: str, write_fn) -> str:
+        """Writes one profile via write_fn(filename), prunes old ones and returns the filename."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        route = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+        filename = os.path.join(self.output_dir, f"{int(time.time() * 1000)}-{route}-{(tenant or 'none')[:8]}.{suffix}")
+        write_fn(filename)
+        METRICS.inc("profiles_written_total", labels={"route": path, "mode": self.mode})
+        profiles = sorted(
+            (os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir)),
+            key=os.path.getmtime,
+        )
+        for old in profiles[:-self.max_files]:
+            os.remove(old)
+        return filename
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles the requests a RequestProfiler picks.
+
+    Both modes observe the thread serving the request, i.e. the event loop,
+    where time spent by other requests interleaved on the loop shows up too,
+    and follow endpoints into the worker threads they run in (see
+    mcp_server.off_loop).
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tenant = None
+        header = False
+        for name, value in scope["headers"]:
+            if name == b"x-user-id":
+                tenant = value.decode("latin-1").strip().lower() or None
+            elif name == b"x-profile":
+                header = value.strip() in (b"1", b"true")
+        path = scope["path"]
+        if not self.profiler.wants(path, tenant, header) or not self.profiler.try_begin():
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            if self.profiler.mode == "cprofile":
+                profiles = ThreadProfiles()
+                token = _active_profile.set(profiles)
+                try:
+                    with profiles.attach():
+                        await self.app(scope, receive, send)
+                finally:
+                    _active_profile.reset(token)
+                write_fn, suffix = profiles.dump_stats, "prof"
+            else:
+                sampler = StackSampler(threading.get_ident(), self.profiler.interval_seconds)
+                sampler.start()
+                token = _active_profile.set(sampler)
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    _active_profile.reset(token)
+                    sampler.stop()
+
+                def write_fn(filename):
+                    with open(filename, "w") as f:
+                        f.write(sampler.folded())
+                suffix = "folded"
+        finally:
+            self.profiler.end()
+
+        elapsed = time.perf_counter() - started
+        try:
+            filename = await asyncio.to_thread(self.profiler.write, path, tenant, suffix, write_fn)
+            print(f"DEBUG: Profiled {path} ({elapsed:.3f}s) -> {filename}")
+        except Exception as e:
+            print(f"Warning: Could not write profile for {path}: {e}")
@@ -0,0 +1,118 @@
+"""
+Deploy readiness for the MCP server.
+A new replica warms up before it reports ready: it opens its clients, loads
+every tenant's settings and phone mapping, and builds the near-term free-slot
+tables. Readiness tracks those warmup steps and the latest dependency latency
+probes, so /ready only admits traffic once the first calls will be served
+from warm caches. Failed steps are retried with backoff; the replica stays
+unready until every required step has succeeded.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+class Readiness:
+    """
+    Records warmup steps and dependency probes.
+
+    Args:
+        steps: Warmup step names, in the order they run
+        probe: Returns {dependency: {"ok": bool, "latency_ms": float, ...}}
+        probe_interval_seconds: How long probe results are reused before /ready probes again
+        required_steps: Steps that must succeed before the server is ready (default: all)
+    """
+
+    def __init__(self, steps: List[str], probe: Callable[[], Dict[str, dict]], probe_interval_seconds: float = 10,
+                 required_steps: Optional[List[str]] = None):
+        self.steps = {step: {"status": "pending"} for step in steps}
+        self.required_steps = list(steps if required_steps is None else required_steps)
+        self.probe = probe
+        self.probe_interval_seconds = probe_interval_seconds
+        self.warm = False
+        self._probes: Dict[str, dict] = {}
+        self._probed_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def run_step(self, step: str, fn: Callable[[], Optional[dict]]) -> bool:
+        """Runs one warmup step, recording its duration and result. Returns False if it failed."""
+        with self._lock:
+            self.steps[step] = {"status": "running"}
+        started = time.perf_counter()
+        try:
+            detail = fn() or {}
+            status = {"status": "done", **detail}
+        except Exception as e:
+            print(f"Warning: Warmup step {step} failed: {e}")
+            status = {"status": "failed", "error": str(e)}
+        status["seconds"] = round(time.perf_counter() - started, 4)
+        with self._lock:
+            self.steps[step] = status
+        return status["status"] == "done"
+
+    def pending_steps(self) -> List[str]:
+        """Returns the steps from the first one not done on; later steps build on earlier ones."""
+        with self._lock:
+            names = list(self.steps)
+            first = next((i for i, step in enumerate(names) if self.steps[step]["status"] != "done"), len(names))
+        return names[first:]
+
+    def finish_warmup(self) -> bool:
+        """Marks the server warm if every required step is done. Returns whether it is."""
+        with self._lock:
+            self.warm = all(self.steps[step]["status"] == "done" for step in self.required_steps)
+            warm = self.warm
+        if warm:
+            print(f"Warmup completed: {self.steps}")
+        else:
+            print(f"Warning: Warmup incomplete: {self.steps}")
+        return warm
+
+    def run_warmup(self, fns: Dict[str, Callable[[], Optional[dict]]], retry_seconds: float = 5,
+                   max_retry_seconds: float = 60) -> bool:
+        """
+        Runs the warmup steps (blocking), rerunning failed steps and the ones
+        after them with exponential backoff until every required step has
+        succeeded. Optional steps that still fail are left failed. Returns
+        False if stop() was called first.
+        """
+        delay = retry_seconds
+        while True:
+            for step in self.pending_steps():
+                self.run_step(step, fns[step])
+            if self.finish_warmup():
+                return True
+            if self._stopped.wait(delay):
+                return False
+            delay = min(delay * 2, max_retry_seconds)
+
+    def stop(self) -> None:
+        """Stops run_warmup retrying (on shutdown)."""
+        self._stopped.set()
+
+    def probes(self) -> Dict[str, dict]:
+        """Returns the latest probe results, probing again once they are older than the interval."""
+        with self._lock:
+            fresh = self._probed_at is not None and time.monotonic() - self._probed_at < self.probe_interval_seconds
+            if fresh:
+                return self._probes
+        probes = self.probe()
+        with self._lock:
+            self._probes = probes
+            self._probed_at = time.monotonic()
+        return probes
+
+    def status(self, required: List[str]) -> dict:
+        """
+        Returns the readiness payload. The server is ready once every required
+        warmup step has succeeded and every dependency in `required` answered
+        its probe; failed optional steps are reported but do not hold
+        readiness back.
+        """
+        with self._lock:
+            warm = self.warm
+            steps = {step: dict(status) for step, status in self.steps.items()}
+        probes = self.probes() if warm else {}
+        ready = warm and all(probes.get(name, {}).get("ok") for name in required)
+        return {"ready": ready, "warmup": steps, "dependencies": probes}
@@ -0,0 +1,241 @@
+"""
+Deadlines, retries, hedged reads and circuit breakers for outbound calls.
+Supabase, Google Calendar and Gemini are reached through blocking client
+libraries. Each dependency gets a Dependency guard that runs calls on its own
+small thread pool, so a caller stops waiting at the deadline even when the
+library does not, retries idempotent reads with jittered backoff, optionally
+hedges slow reads with a second attempt, and trips a circuit breaker so a
+degraded dependency fails fast instead of piling up in-flight requests.
+"""
+
+import concurrent.futures
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from metrics import METRICS
+
+T = TypeVar("T")
+
+# Breaker states, as exported in the circuit_breaker_state gauge
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+_STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half_open", OPEN: "open"}
+
+class DependencyUnavailable(Exception):
+    """
+    Raised when a dependency's breaker is open or a call misses its deadline.
+    The message is phrased so the agent can read it to the caller.
+    """
+
+    def __init__(self, dependency: str, message: str):
+        super().__init__(message)
+        self.dependency = dependency
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`; then lets one trial call through (half-open) and closes
+    again if it succeeds.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        METRICS.set_gauge("circuit_breaker_state", CLOSED, labels={"dependency": name})
+
+    def _transition(self, state: int) -> None:
+        """Caller holds the lock."""
+        if state == self.state:
+            return
+        print(f"Circuit breaker {self.name}: {_STATE_NAMES[self.state]} -> {_STATE_NAMES[state]}")
+        self.state = state
+        METRICS.set_gauge("circuit_breaker_state", state, labels={"dependency": self.name})
+        METRICS.inc("circuit_breaker_transitions_total", labels={"dependency": self.name, "to": _STATE_NAMES[state]})
+
+    def allow(self) -> bool:
+        """Returns True if a call may proceed."""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self._opened_at >= self.reset_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                self._transition(OPEN)
+
+class Dependency:
+    """
+    Guards the calls to one dependency.
+
+    Args:
+        name: Label used in metrics and logs
+        deadline_seconds: Total time a caller waits, across retries
+        retries: Extra attempts for idempotent calls
+        backoff_seconds: Base of the full-jitter exponential backoff
+        hedge_after_seconds: If set, an idempotent call still running after
+            this long gets a second, parallel attempt; the first to finish wins
+        unavailable_message: What the caller is told when the call cannot be made
+        is_failure: Decides whether an error means the dependency is unhealthy;
+            other errors (e.g. "no rows", a constraint violation) are answers,
+            so they are raised at once without a retry or a breaker failure
+        max_workers: Concurrent calls in flight (threads of abandoned calls
+            count until the client library gives up on them)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        deadline_seconds: float,
+        retries: int = 2,
+        backoff_seconds: float = 0.1,
+        hedge_after_seconds: Optional[float] = None,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30,
+        unavailable_message: Optional[str] = None,
+        is_failure: Callable[[Exception], bool] = lambda error: True,
+        max_workers: int = 16,
+    ):
+        self.name = name
+        self.deadline_seconds = deadline_seconds
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.hedge_after_seconds = hedge_after_seconds
+        self.unavailable_message = unavailable_message or f"The {name} service is not responding right now. Please try again in a moment."
+        self.is_failure = is_failure
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"dep-{name}")
+
+    def call(self, fn: Callable[[], T], idempotent: bool = False) -> T:
+        """
+        Runs fn() under the dependency's deadline and breaker.
+
+        Only idempotent calls are retried or hedged. Errors raised by fn itself
+        are re-raised after the last attempt; a missed deadline or an open
+        breaker raises DependencyUnavailable.
+
+        Blocks the calling thread until the deadline, including the backoff
+        between retries, so call it from a worker thread, not an event loop.
+        """
+        deadline = time.monotonic() + self.deadline_seconds
+        attempts = 1 + (self.retries if idempotent else 0)
+        last_error: Optional[BaseException] = None
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                METRICS.inc("dependency_calls_total", labels={"dependency": self.name, "outcome": "rejected"})
+                raise DependencyUnavailable(self.name, self.unavailable_message)
+            started = time.monotonic()
+            try:
+                result = self._attempt(fn, deadline, hedge=idempotent)
+            except concurrent.futures.TimeoutError:
+                self.breaker.record_failure()
+                METRICS.inc("dependency_calls_total", labels={"dependency": self.name, "outcome": "timeout"})
+                print(f"{self.name} call missed its {self.deadline_seconds}s deadline")
+                raise DependencyUnavailable(self.name, self.unavailable_message)
+            except Exception as e:
+                if not self.is_failure(e):
+                    self.breaker.record_success()
+                    METRICS.inc("dependency_calls_total", labels={"dependency": self.name, "outcome": "answered_error"})
+                    raise
+                self.breaker.record_failure()
+                METRICS.inc("dependency_calls_total", labels={"dependency": self.name, "outcome": "error"})
+                last_error = e
+                # Full jitter keeps retries from many callers from arriving together
+                delay = random.uniform(0, self.backoff_seconds * (2 ** attempt))
+                if attempt + 1 < attempts and time.monotonic() + delay < deadline:
+                    print(f"Retrying {self.name} call after error: {e}")
+                    time.sleep(delay)
+                    continue
+                raise
+            self.breaker.record_success()
+            METRICS.inc("dependency_calls_total", labels={"dependency": self.name, "outcome": "ok"})
+            METRICS.observe("dependency_latency_seconds", time.monotonic() - started, labels={"dependency": self.name})
+            return result
+        raise last_error
+
+    def _attempt(self, fn: Callable[[], T], deadline: float, hedge: bool) -> T:
+        """Runs one (possibly hedged) attempt, waiting at most until deadline."""
+        first = self._executor.submit(fn)
+        if not hedge or self.hedge_after_seconds is None:
+            return first.result(timeout=max(deadline - time.monotonic(), 0))
+
+        done, _ = concurrent.futures.wait([first], timeout=min(self.hedge_after_seconds, max(deadline - time.monotonic(), 0)))
+        if done:
+            return first.result()
+        METRICS.inc("dependency_hedged_calls_total", labels={"dependency": self.name})
+        futures = [first, self._executor.submit(fn)]
+        while futures:
+            done, pending = concurrent.futures.wait(
+                futures, timeout=max(deadline - time.monotonic(), 0), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if not done:
+                raise concurrent.futures.TimeoutError()
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+            futures = list(pending)
+        # Both attempts failed: report the first one's error
+        return first.result()
+
+class GuardedQuery:
+    """
+    Wraps a Supabase query builder so that execute() goes through a Dependency.
+    Selects are idempotent reads; inserts, updates, upserts and deletes are not.
+    """
+
+    _WRITES = {"insert", "update", "upsert", "delete"}
+
+    def __init__(self, builder, dependency: Dependency, idempotent: bool = True):
+        self._builder = builder
+        self._dependency = dependency
+        self._idempotent = idempotent
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # Properties such as .not_ return a builder too
+            return GuardedQuery(attr, self._dependency, self._idempotent) if hasattr(attr, "execute") else attr
+        idempotent = self._idempotent and name not in self._WRITES
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return GuardedQuery(result, self._dependency, idempotent) if hasattr(result, "execute") else result
+        return chained
+
+    def execute(self):
+        return self._dependency.call(self._builder.execute, idempotent=self._idempotent)
+
+class GuardedClient:
+    """Wraps a Supabase client so every table query is guarded by a Dependency."""
+
+    def __init__(self, client, dependency: Dependency):
+        self.client = client
+        self.dependency = dependency
+
+    def table(self, name: str) -> GuardedQuery:
+        return GuardedQuery(self.client.table(name), self.dependency)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,81 @@
+"""
+Per-tenant schedule change feed for the MCP server.
+Every booking mutation publishes a delta here; agent workers subscribed over
+the /schedule_stream SSE endpoint apply those deltas to their local replica
+of the day schedule (see schedule_replica.py).
+"""
+
+import asyncio
+import threading
+import uuid
+from typing import Dict, Optional, Set
+
+class ScheduleFeed:
+    """
+    Fans out schedule deltas to subscribers of each tenant.
+
+    Deltas carry a per-tenant version that increases by one per delta, so a
+    subscriber can detect gaps and reload its snapshot. Versions only count
+    within one feed, so deltas and snapshots also carry the feed's epoch: a
+    random id per feed (per server worker and restart). A subscriber that sees
+    another epoch must reload its snapshot instead of comparing versions.
+    publish() may be called from worker threads; delivery always happens on
+    the server's event loop.
+    """
+
+    def __init__(self, queue_size: int = 1000, epoch: Optional[str] = None):
+        self.queue_size = queue_size
+        self.epoch = epoch or uuid.uuid4().hex
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Sets the event loop that subscriber queues belong to."""
+        self._loop = loop
+
+    def version(self, user_id: str) -> int:
+        """Returns the version of the last delta published for a tenant."""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Registers a subscriber queue for a tenant's deltas."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        """Removes a subscriber queue."""
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id: str, delta: dict) -> dict:
+        """Stamps delta with the feed epoch and the tenant's next version and delivers it to every subscriber."""
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            subscribers = list(self._subscribers.get(user_id, ()))
+        message = {**delta, "epoch": self.epoch, "version": version}
+        if subscribers and self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._deliver, subscribers, message)
+            except RuntimeError:
+                # The loop is closed (server shutting down)
+                pass
+        return message
+
+    @staticmethod
+    def _deliver(subscribers, message: dict) -> None:
+        for queue in subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A slow subscriber misses the delta and resyncs on the version gap
+                pass
@@ -0,0 +1,207 @@
+"""
+Agent-local replica of the clinic's near-term schedule.
+The replica loads a snapshot of today's and tomorrow's working hours and
+bookings from the MCP server and keeps it current from the server's SSE
+delta stream. Availability questions about dates inside the window are then
+answered in-process; anything else falls back to the server.
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from utils import IST
+
+# Appointment slots are 30 minutes long and get_available_slots offers at most 4
+SLOT_MINUTES = 30
+MAX_SLOTS = 4
+
+class ScheduleReplica:
+    """
+    In-memory copy of a tenant's schedule for the snapshot window.
+
+    Snapshot layout (as served by /schedule_snapshot):
+        {"epoch": str, "version": int, "dates": {date: {doctor: {"working": [start, end] | None,
+                                                  "busy": [[start_iso, end_iso], ...]}}},
+         "appointments": [{"appointment_id", "assigned_doctor", "appointment_date", "appointment_time"}, ...],
+         "holds": [{"hold_id", "call_id", "assigned_doctor", "appointment_date", "appointment_time"}, ...]}
+
+    Slots held by other calls count as taken; the own call's holds do not.
+    Deltas are only applied on top of a snapshot from the same feed epoch.
+    """
+
+    def __init__(self, call_id: Optional[str] = None):
+        self.call_id = call_id
+        self.epoch: Optional[str] = None
+        self.version = 0
+        self._dates: Dict[str, dict] = {}
+        self._appointments: Dict[str, Tuple[str, str, str]] = {}
+        self._holds: Dict[str, Tuple[str, str, str]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, snapshot: dict) -> None:
+        """Replaces the replica contents with a snapshot."""
+        with self._lock:
+            self.epoch = snapshot.get("epoch")
+            self.version = snapshot.get("version", 0)
+            self._dates = snapshot.get("dates", {})
+            self._appointments = {
+                a["appointment_id"]: (a["assigned_doctor"], a["appointment_date"], a["appointment_time"])
+                for a in snapshot.get("appointments", [])
+            }
+            self._holds = {
+                h["hold_id"]: (h["assigned_doctor"], h["appointment_date"], h["appointment_time"])
+                for h in snapshot.get("holds", [])
+                if h.get("call_id") != self.call_id
+            }
+            self.loaded = True
+
+    def apply(self, delta: dict) -> bool:
+        """
+        Applies one delta from the stream.
+
+        Returns False if the delta comes from another feed epoch or does not
+        follow the replica's version, in which case the caller should reload
+        the snapshot.
+        """
+        with self._lock:
+            if delta.get("epoch") != self.epoch:
+                return False
+            version = delta.get("version", 0)
+            if version <= self.version:
+                return True  # Already reflected in the snapshot
+            if version != self.version + 1:
+                return False
+            self.version = version
+            op = delta.get("op")
+            if op == "upsert":
+                self._appointments[delta["appointment_id"]] = (delta["assigned_doctor"], delta["appointment_date"], delta["appointment_time"])
+            elif op == "remove":
+                self._appointments.pop(delta["appointment_id"], None)
+            elif op == "hold":
+                if delta.get("call_id") != self.call_id:
+                    self._holds[delta["hold_id"]] = (delta["assigned_doctor"], delta["appointment_date"], delta["appointment_time"])
+            elif op == "release":
+                self._holds.pop(delta["hold_id"], None)
+            return True
+
+    def covers(self, doctor_name: str, appointment_date: str) -> bool:
+        """Returns True if the replica can answer for this doctor and date."""
+        with self._lock:
+            return self.loaded and doctor_name in self._dates.get(appointment_date, {})
+
+    def _is_free(self, doctor_name: str, appointment_date: str, slot_start: datetime) -> bool:
+        """Checks one slot against bookings, other calls' holds and calendar busy time. Caller holds the lock."""
+        time_str = slot_start.strftime("%H:%M:%S")
+        for doctor, day, booked_time in (*self._appointments.values(), *self._holds.values()):
+            if doctor == doctor_name and day == appointment_date and booked_time == time_str:
+                return False
+        slot_end = slot_start + timedelta(minutes=SLOT_MINUTES)
+        for busy_start, busy_end in self._dates[appointment_date][doctor_name].get("busy", []):
+            if datetime.fromisoformat(busy_start) < slot_end and datetime.fromisoformat(busy_end) > slot_start:
+                return False
+        return True
+
+    def check_availability(self, doctor_name: str, appointment_date: str, appointment_time: str) -> Optional[str]:
+        """Answers check_availability locally, or returns None if outside the window."""
+        if not self.covers(doctor_name, appointment_date):
+            return None
+        with self._lock:
+            slot_start = IST.localize(datetime.strptime(f"{appointment_date} {appointment_time}", "%Y-%m-%d %H:%M:%S"))
+            if self._is_free(doctor_name, appointment_date, slot_start):
+                return f"Doctor {doctor_name} is available at {appointment_time} on {appointment_date}."
+            return f"Doctor {doctor_name} is not available at {appointment_time} on {appointment_date}."
+
+    def available_slots(self, doctor_name: str, appointment_date: str) -> Optional[List[str]]:
+        """Answers get_available_slots locally, or returns None if outside the window."""
+        if not self.covers(doctor_name, appointment_date):
+            return None
+        with self._lock:
+            working = self._dates[appointment_date][doctor_name].get("working")
+            if not working:
+                return []
+            current = IST.localize(datetime.strptime(f"{appointment_date} {working[0]}", "%Y-%m-%d %H:%M:%S"))
+            end = IST.localize(datetime.strptime(f"{appointment_date} {working[1]}", "%Y-%m-%d %H:%M:%S"))
+            slots = []
+            while current < end and len(slots) < MAX_SLOTS:
+                if self._is_free(doctor_name, appointment_date, current):
+                    slots.append(current.strftime("%H:%M:%S"))
+                current += timedelta(minutes=SLOT_MINUTES)
+            return slots
+
+class ScheduleReplicaClient:
+    """
+    Keeps a ScheduleReplica current for one tenant: subscribes to the SSE
+    stream, loads the snapshot, applies deltas, and reloads on gaps,
+    reconnects, and periodically (to pick up calendar busy-time changes).
+    """
+
+    def __init__(self, server_url: str, user_id: str, call_id: str, refresh_seconds: float = 300):
+        self.server_url = server_url
+        self.headers = {"X-User-Id": user_id, "X-Call-Id": call_id or ""}
+        self.refresh_seconds = refresh_seconds
+        self.replica = ScheduleReplica(call_id=call_id)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Starts following the stream in the background."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops following the stream."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _load_snapshot(self, client: httpx.AsyncClient, stream_epoch: Optional[str]) -> None:
+        response = await client.post(f"{self.server_url}/schedule_snapshot", json={}, headers=self.headers)
+        response.raise_for_status()
+        self.replica.load(response.json()["result"])
+        if self.replica.epoch != stream_epoch:
+            # Served by another worker (or across a restart): its versions do not line up with the stream
+            self.replica.loaded = False
+            raise RuntimeError(f"schedule snapshot epoch {self.replica.epoch} does not match stream epoch {stream_epoch}")
+        print(f"DEBUG: Loaded schedule snapshot epoch {self.replica.epoch} version {self.replica.version}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, read=None)) as client:
+                    async with client.stream("GET", f"{self.server_url}/schedule_stream", headers=self.headers) as stream:
+                        stream.raise_for_status()
+                        # Subscribed before loading, so no delta can fall between the two;
+                        # the snapshot is loaded once the stream's hello names its epoch
+                        stream_epoch = None
+                        loaded_at = None
+                        async for line in stream.aiter_lines():
+                            if loaded_at is not None and asyncio.get_running_loop().time() - loaded_at > self.refresh_seconds:
+                                await self._load_snapshot(client, stream_epoch)
+                                loaded_at = asyncio.get_running_loop().time()
+                            if not line.startswith("data:"):
+                                continue
+                            delta = json.loads(line[len("data:"):].strip())
+                            if delta.get("op") == "hello":
+                                stream_epoch = delta.get("epoch")
+                                await self._load_snapshot(client, stream_epoch)
+                                loaded_at = asyncio.get_running_loop().time()
+                                continue
+                            if not self.replica.apply(delta):
+                                print("DEBUG: Schedule stream gap or epoch change detected, reloading snapshot")
+                                await self._load_snapshot(client, stream_epoch)
+                                loaded_at = asyncio.get_running_loop().time()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WARNING: Schedule replica stream error: {e}")
+            # Until reconnected, answers come from the server
+            self.replica.loaded = False
+            await asyncio.sleep(2)
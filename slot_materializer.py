@@ -0,0 +1,311 @@
+"""
+Precomputed free-slot tables for the MCP server.
+For each tenant and doctor this module keeps the 30-minute slot grid of the
+next two weeks with a booking count per slot, built once from working hours
+and booked rows and then updated incrementally on every booking mutation.
+Slot and availability endpoints read it instead of querying Supabase.
+
+Calendar busy time and holds change independently of bookings and are
+applied by the caller at lookup time.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+SLOT_MINUTES = 30
+
+def _minutes(time_str: str) -> int:
+    hours, minutes, _ = time_str.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def _time_str(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+class DaySlots:
+    """
+    One doctor's slot grid for one date: the first slot's start (minutes after
+    midnight) and a booking count per slot.
+    """
+
+    __slots__ = ("start", "booked")
+
+    def __init__(self, start: int, slot_count: int):
+        self.start = start
+        self.booked = bytearray(slot_count)
+
+    def index(self, time_str: str) -> Optional[int]:
+        """Returns the slot index of a HH:MM:SS time, or None if it is not on the grid."""
+        offset = _minutes(time_str) - self.start
+        if offset < 0 or offset % SLOT_MINUTES or time_str[-2:] != "00":
+            return None
+        index = offset // SLOT_MINUTES
+        return index if index < len(self.booked) else None
+
+    def free_times(self) -> List[str]:
+        return [_time_str(self.start + i * SLOT_MINUTES) for i, count in enumerate(self.booked) if not count]
+
+class SlotMaterializer:
+    """
+    Free-slot tables per tenant, kept for `days` days from the build date.
+
+    Layout: user_id -> doctor_name -> date -> DaySlots, plus each tenant's
+    booked appointments (appointment_id -> (doctor, date, time)) so that an
+    upsert can free the slot an appointment previously occupied.
+
+    Lookups return None when a tenant or date is not materialized; callers
+    then fall back to querying Supabase.
+
+    Bookings committed while a tenant's tables are being computed are missing
+    from the query they were computed from. A builder therefore calls
+    record_changes() before querying and passes the returned log to
+    build_tenant(), which replays the changes onto the new tables before
+    swapping them in.
+    """
+
+    def __init__(self, days: int = 14, path: Optional[str] = None):
+        self.days = days
+        self.path = path
+        self.built_on: Optional[str] = None
+        self._tables: Dict[str, Dict[str, Dict[str, DaySlots]]] = {}
+        self._appointments: Dict[str, Dict[str, Tuple[str, str, str]]] = {}
+        self._recording: Dict[str, List[list]] = {}
+        self._lock = threading.Lock()
+
+    def window(self, today: str) -> List[str]:
+        """Returns the dates materialized when building on `today`."""
+        start = datetime.strptime(today, "%Y-%m-%d")
+        return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(self.days)]
+
+    @staticmethod
+    def compute(working_hours: Dict[str, Callable[[str], Optional[Tuple[str, str]]]], dates: Iterable[str],
+                appointments: Iterable[dict]) -> Tuple[Dict[str, Dict[str, DaySlots]], Dict[str, Tuple[str, str, str]]]:
+        """
+        Computes a tenant's tables from scratch.
+
+        Args:
+            working_hours: doctor name -> function returning the (start, end)
+                HH:MM:SS working interval on a date, or None for a day off
+            dates: Dates to materialize
+            appointments: Scheduled rows with appointment_id, assigned_doctor,
+                appointment_date and appointment_time
+        """
+        table: Dict[str, Dict[str, DaySlots]] = {}
+        for doctor_name, hours_on in working_hours.items():
+            table[doctor_name] = {}
+            for day in dates:
+                hours = hours_on(day)
+                if hours is None:
+                    continue
+                start, end = _minutes(hours[0]), _minutes(hours[1])
+                table[doctor_name][day] = DaySlots(start, max(0, -(-(end - start) // SLOT_MINUTES)))
+
+        booked = {}
+        for row in appointments:
+            slot = (row["assigned_doctor"], row["appointment_date"], row["appointment_time"])
+            booked[row["appointment_id"]] = slot
+            _adjust(table, slot, 1)
+        return table, booked
+
+    def record_changes(self, user_id: str) -> list:
+        """Starts logging a tenant's booking changes for a build; pass the log to build_tenant()."""
+        changes = []
+        with self._lock:
+            self._recording.setdefault(user_id, []).append(changes)
+        return changes
+
+    def stop_recording(self, user_id: str, changes: list) -> None:
+        """Stops logging into changes (e.g. when the build was abandoned)."""
+        with self._lock:
+            self._stop_recording(user_id, changes)
+
+    def _stop_recording(self, user_id: str, changes: list) -> None:
+        """Caller holds the lock."""
+        logs = self._recording.get(user_id, [])
+        if any(log is changes for log in logs):
+            logs[:] = [log for log in logs if log is not changes]
+            if not logs:
+                del self._recording[user_id]
+
+    def build_tenant(self, user_id: str, working_hours: dict, today: str, appointments: Iterable[dict],
+                     changes: Optional[list] = None) -> None:
+        """
+        (Re)builds a tenant's tables for the window starting today. changes is
+        the log from record_changes() taken before appointments were queried.
+        """
+        table, booked = self.compute(working_hours, self.window(today), appointments)
+        with self._lock:
+            if changes is not None:
+                # Changes the query may have missed; replaying the ones it saw is a no-op
+                for change in changes:
+                    if change[0] == "upsert":
+                        _upsert(table, booked, change[1], change[2])
+                    else:
+                        _remove(table, booked, change[1])
+                self._stop_recording(user_id, changes)
+            if self.built_on != today:
+                # The window moved: every other tenant is stale until rebuilt
+                self._tables.clear()
+                self._appointments.clear()
+                self.built_on = today
+            self._tables[user_id] = table
+            self._appointments[user_id] = booked
+
+    def drop_tenant(self, user_id: str) -> None:
+        """Forgets a tenant (e.g. after its doctors or working hours change)."""
+        with self._lock:
+            self._tables.pop(user_id, None)
+            self._appointments.pop(user_id, None)
+
+    def tenants(self) -> List[str]:
+        with self._lock:
+            return list(self._tables)
+
+    def has_tenant(self, user_id: str, today: str) -> bool:
+        with self._lock:
+            return self.built_on == today and user_id in self._tables
+
+    def apply_upsert(self, user_id: str, appointment_id: str, doctor_name: str, appointment_date: str, appointment_time: str) -> None:
+        """Records that an appointment is scheduled at a slot (moving it if it was elsewhere)."""
+        slot = (doctor_name, appointment_date, appointment_time)
+        with self._lock:
+            for changes in self._recording.get(user_id, ()):
+                changes.append(("upsert", appointment_id, slot))
+            table = self._tables.get(user_id)
+            if table is None:
+                return
+            _upsert(table, self._appointments[user_id], appointment_id, slot)
+
+    def apply_remove(self, user_id: str, appointment_id: str) -> None:
+        """Records that an appointment no longer occupies its slot."""
+        with self._lock:
+            for changes in self._recording.get(user_id, ()):
+                changes.append(("remove", appointment_id))
+            table = self._tables.get(user_id)
+            if table is None:
+                return
+            _remove(table, self._appointments[user_id], appointment_id)
+
+    def free_times(self, user_id: str, doctor_name: str, appointment_date: str) -> Optional[List[str]]:
+        """
+        Returns the unbooked slot times of a doctor on a date ([] on days off),
+        or None if the tenant or date is not materialized.
+        """
+        with self._lock:
+            table = self._tables.get(user_id)
+            if table is None or doctor_name not in table or not self._covers(appointment_date):
+                return None
+            day = table[doctor_name].get(appointment_date)
+            return day.free_times() if day else []
+
+    def is_free(self, user_id: str, doctor_name: str, appointment_date: str, appointment_time: str) -> Optional[bool]:
+        """
+        Returns whether no booking occupies the slot, or None if not materialized.
+        Times off the slot grid are only checked for an exact booking match.
+        """
+        with self._lock:
+            table = self._tables.get(user_id)
+            if table is None or doctor_name not in table or not self._covers(appointment_date):
+                return None
+            day = table[doctor_name].get(appointment_date)
+            index = day.index(appointment_time) if day else None
+            if index is not None:
+                return not day.booked[index]
+            slot = (doctor_name, appointment_date, appointment_time)
+            return slot not in self._appointments[user_id].values()
+
+    def _covers(self, appointment_date: str) -> bool:
+        """Returns True if the date is inside the window. Caller holds the lock."""
+        if self.built_on is None:
+            return False
+        offset = (datetime.strptime(appointment_date, "%Y-%m-%d") - datetime.strptime(self.built_on, "%Y-%m-%d")).days
+        return 0 <= offset < self.days
+
+    def diff(self, user_id: str, expected: Dict[str, Dict[str, DaySlots]]) -> List[dict]:
+        """Compares a tenant's tables with a full recompute and returns the mismatching doctor dates."""
+        with self._lock:
+            table = self._tables.get(user_id, {})
+            mismatches = []
+            for doctor_name in sorted(set(table) | set(expected)):
+                days = set(table.get(doctor_name, {})) | set(expected.get(doctor_name, {}))
+                for day in sorted(days):
+                    actual_slots = table.get(doctor_name, {}).get(day)
+                    expected_slots = expected.get(doctor_name, {}).get(day)
+                    actual = actual_slots.free_times() if actual_slots else None
+                    wanted = expected_slots.free_times() if expected_slots else None
+                    if actual != wanted:
+                        mismatches.append({"doctor_name": doctor_name, "date": day, "materialized": actual, "recomputed": wanted})
+            return mismatches
+
+    def save(self) -> None:
+        """Writes the tables to `path`, if set."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "built_on": self.built_on,
+                "tenants": {
+                    user_id: {
+                        "slots": {
+                            doctor: {day: [slots.start, list(slots.booked)] for day, slots in days.items()}
+                            for doctor, days in table.items()
+                        },
+                        "appointments": self._appointments[user_id],
+                    }
+                    for user_id, table in self._tables.items()
+                },
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp_path, self.path)
+
+    def load(self, today: str) -> bool:
+        """Loads tables saved on `today` from `path`. Returns True if anything was loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            data = orjson.loads(f.read())
+        if data.get("built_on") != today:
+            return False
+        with self._lock:
+            self.built_on = today
+            for user_id, tenant in data.get("tenants", {}).items():
+                table = {}
+                for doctor, days in tenant["slots"].items():
+                    table[doctor] = {}
+                    for day, (start, booked) in days.items():
+                        slots = DaySlots(start, len(booked))
+                        slots.booked[:] = bytes(booked)
+                        table[doctor][day] = slots
+                self._tables[user_id] = table
+                self._appointments[user_id] = {k: tuple(v) for k, v in tenant["appointments"].items()}
+        return True
+
+def _upsert(table: Dict[str, Dict[str, DaySlots]], booked: Dict[str, Tuple[str, str, str]], appointment_id: str,
+            slot: Tuple[str, str, str]) -> None:
+    """Moves an appointment's booking to slot, freeing the slot it occupied before."""
+    previous = booked.get(appointment_id)
+    if previous == slot:
+        return
+    if previous:
+        _adjust(table, previous, -1)
+    booked[appointment_id] = slot
+    _adjust(table, slot, 1)
+
+def _remove(table: Dict[str, Dict[str, DaySlots]], booked: Dict[str, Tuple[str, str, str]], appointment_id: str) -> None:
+    """Frees the slot an appointment occupied, if any."""
+    previous = booked.pop(appointment_id, None)
+    if previous:
+        _adjust(table, previous, -1)
+
+def _adjust(table: Dict[str, Dict[str, DaySlots]], slot: Tuple[str, str, str], delta: int) -> None:
+    """Adds delta to the booking count of a (doctor, date, time) slot, if it is on the grid."""
+    doctor_name, appointment_date, appointment_time = slot
+    day = table.get(doctor_name, {}).get(appointment_date)
+    index = day.index(appointment_time) if day else None
+    if index is not None:
+        day.booked[index] = max(0, min(255, day.booked[index] + delta))
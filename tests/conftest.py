@@ -0,0 +1,65 @@
+import pytest
+
+from tests.fakes import FakeSupabase
+
+TENANT = "11111111-1111-1111-1111-111111111111"
+DOCTOR = "Dr. Asha Rao"
+
+def tenant_settings(working_hours: str = "Monday-Sunday: 9:00 AM - 5:00 PM") -> dict:
+    return {
+        "user_id": TENANT,
+        "agent_phone": "+919876543210",
+        "calendar_auth": None,
+        "doctor_details": [{
+            "name": DOCTOR,
+            "specialty": "Cardiology",
+            "calendarId": "asha@example.com",
+            "working_hours": working_hours,
+            "services": [],
+        }],
+    }
+
+@pytest.fixture
+def server(monkeypatch):
+    """
+    The mcp_server module backed by a FakeSupabase holding one tenant, with
+    fresh per-process caches. Yields (module, fake).
+    """
+    import mcp_server as m
+    from cache import TTLCache
+    from holds import HoldManager
+    from idempotency import IdempotencyStore
+    from name_index import PatientNameIndex
+    from phone_index import PhoneIndex
+    from schedule_feed import ScheduleFeed
+    from slot_materializer import SlotMaterializer
+
+    fake = FakeSupabase()
+    fake.tables["user_settings"] = [tenant_settings()]
+    fake.tables["appointment_details"] = []
+    fake.tables["profiles"] = [{"id": TENANT, "name": "Sunrise Clinic"}]
+    monkeypatch.setattr(m, "_supabase_client", fake)
+    monkeypatch.setattr(m, "SETTINGS_CACHE", TTLCache(60))
+    monkeypatch.setattr(m, "_LOCAL_APPOINTMENT_CHANGES", TTLCache(30))
+    monkeypatch.setattr(m, "IDEMPOTENCY", IdempotencyStore(600))
+    monkeypatch.setattr(m, "HOLDS", HoldManager(m.HOLD_TTL_SECONDS, on_expire=m.HOLDS.on_expire))
+    monkeypatch.setattr(m, "SLOT_MATERIALIZER", SlotMaterializer(days=m.SLOT_MATERIALIZER.days))
+    monkeypatch.setattr(m, "SCHEDULE_FEED", ScheduleFeed())
+    monkeypatch.setattr(m, "PATIENT_NAMES", PatientNameIndex())
+    monkeypatch.setattr(m, "AGENT_PHONES", PhoneIndex())
+    yield m, fake
+
+@pytest.fixture
+def client(server):
+    """A TestClient for a freshly built app (lifespan not run)."""
+    from fastapi.testclient import TestClient
+    m, _ = server
+    return TestClient(m.create_app())
+
+def future_date(days: int = 1) -> str:
+    from datetime import datetime, timedelta
+    from utils import IST
+    return (datetime.now(IST) + timedelta(days=days)).strftime("%Y-%m-%d")
+
+def headers(call_id: str = "call-1") -> dict:
+    return {"X-User-Id": TENANT, "X-Call-Id": call_id}
@@ -0,0 +1,205 @@
+"""
+In-memory stand-in for the Supabase client used by the tests.
+Supports the subset of the PostgREST query builder the server uses, plus
+optional latency and error injection per table.
+"""
+
+import operator
+import threading
+import time
+
+_OPERATORS = {"eq": operator.eq, "neq": operator.ne, "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+def _split_terms(expression):
+    """Splits a PostgREST logic expression on the commas outside parentheses and quotes."""
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(expression):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            terms.append(expression[start:i])
+            start = i + 1
+    terms.append(expression[start:])
+    return terms
+
+def _logic_filter(expression, combine=any):
+    """Builds a row predicate from an or()/and() expression such as 'a.gt."1",and(a.eq."1",b.gt."2")'."""
+    predicates = []
+    for term in _split_terms(expression):
+        if term.startswith(("and(", "or(")):
+            name, inner = term.split("(", 1)
+            predicates.append(_logic_filter(inner[:-1], all if name == "and" else any))
+            continue
+        column, op, value = term.split(".", 2)
+        value = value.strip('"')
+        compare = _OPERATORS[op]
+        predicates.append(lambda row, column=column, compare=compare, value=value: row.get(column) is not None and compare(str(row.get(column)), value))
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeAPIError(Exception):
+    """An error with a PostgREST code, like postgrest.exceptions.APIError."""
+
+    def __init__(self, message: str, code: str = None):
+        super().__init__(message)
+        self.code = code
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.op = "select"
+        self.payload = None
+        self.columns = "*"
+        self._single = False
+        self._limit = None
+        self._range = None
+        self._order = []
+
+    def select(self, columns="*", **kwargs):
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) <= value)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def like(self, column, pattern):
+        prefix = pattern.rstrip("%")
+        self.filters.append(lambda row: str(row.get(column, "")).startswith(prefix))
+        return self
+
+    def ilike(self, column, pattern):
+        return self.like(column, pattern)
+
+    def or_(self, expression):
+        # Values are compared as strings, which orders dates, times and ids
+        self.filters.append(_logic_filter(expression))
+        return self
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._single = True
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, **kwargs):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def execute(self):
+        self.client.before_execute(self)
+        with self.client.lock:
+            rows = self.client.tables.setdefault(self.table, [])
+            if self.op == "insert":
+                items = self.payload if isinstance(self.payload, list) else [self.payload]
+                rows.extend(dict(item) for item in items)
+                return FakeResponse([dict(item) for item in items])
+            matched = [row for row in rows if all(f(row) for f in self.filters)]
+            if self.op == "update":
+                for row in matched:
+                    row.update(self.payload)
+                return FakeResponse([dict(row) for row in matched])
+            if self.op == "delete":
+                for row in matched:
+                    rows.remove(row)
+                return FakeResponse(matched)
+            for column, desc in reversed(self._order):
+                matched.sort(key=lambda row: str(row.get(column)), reverse=desc)
+            if self._range is not None:
+                matched = matched[self._range[0]:self._range[1] + 1]
+            if self._limit is not None:
+                matched = matched[:self._limit]
+            matched = [dict(row) for row in matched]
+        if self._single:
+            if len(matched) != 1:
+                raise FakeAPIError(f"single() found {len(matched)} rows", code="PGRST116")
+            return FakeResponse(matched[0])
+        return FakeResponse(matched)
+
+class FakeSupabase:
+    """
+    Fake Supabase client. `latency[table]` seconds are slept before each
+    query on that table; `errors[table]` is raised (once per entry) instead
+    of running it.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.latency = {}
+        self.errors = {}
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def before_execute(self, query):
+        with self.lock:
+            self.queries += 1
+            errors = self.errors.get(query.table)
+            error = errors.pop(0) if errors else None
+        delay = self.latency.get(query.table)
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            raise error
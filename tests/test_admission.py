@@ -0,0 +1,94 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from admission import AdmissionController, AdmissionMiddleware, LaneLimits, TokenBucket
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def controller(capacity: int = 4, clock=None, **kwargs) -> AdmissionController:
+    return AdmissionController(capacity, {
+        "live": LaneLimits(share=1.0, tenant_concurrency=10, rate=100, burst=100),
+        "bulk": LaneLimits(share=0.5, tenant_concurrency=10, rate=100, burst=100),
+    }, clock=clock or FakeClock(), **kwargs)
+
+def test_lower_lanes_only_fill_their_share():
+    admission = controller(capacity=4)
+
+    assert admission.try_admit("bulk", "a") is None
+    assert admission.try_admit("bulk", "b") is None
+    # Half the capacity is in use: bulk is shed, live calls still get in
+    assert admission.try_admit("bulk", "c").status == 503
+    assert admission.try_admit("live", "c") is None
+    assert admission.try_admit("live", "d") is None
+    assert admission.try_admit("live", "e").reason == "server_busy"
+
+    admission.release("live", "d")
+    assert admission.try_admit("live", "e") is None
+
+def test_tenant_concurrency_is_per_tenant():
+    admission = AdmissionController(10, {"live": LaneLimits(share=1.0, tenant_concurrency=1, rate=100, burst=100)}, clock=FakeClock())
+
+    assert admission.try_admit("live", "a") is None
+    rejection = admission.try_admit("live", "a")
+    assert (rejection.status, rejection.reason) == (429, "tenant_concurrency")
+    assert admission.try_admit("live", "b") is None
+
+def test_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+    assert bucket.try_take() == 0 and bucket.try_take() == 0
+    assert bucket.try_take() == 0.5
+    clock.now = 0.5
+    assert bucket.try_take() == 0
+    clock.now = 10
+    assert bucket.is_full()
+    assert bucket.try_take() == 0 and bucket.try_take() == 0 and bucket.try_take() > 0
+
+def test_rejections_carry_status_and_retry_after():
+    app = FastAPI()
+    app.add_api_route("/tool", lambda: {"result": "ok"}, methods=["POST"])
+    admission = AdmissionController(1, {
+        "live": LaneLimits(share=1.0, tenant_concurrency=5, rate=0.25, burst=1),
+        "admin": LaneLimits(share=0, tenant_concurrency=1, rate=1, burst=1),
+    })
+    app.add_middleware(AdmissionMiddleware, controller=admission, classify=lambda method, path: "admin" if path.startswith("/admin") else "live")
+    client = TestClient(app)
+
+    assert client.post("/tool", headers={"X-User-Id": "a"}).status_code == 200
+    limited = client.post("/tool", headers={"X-User-Id": "a"})
+    assert limited.status_code == 429
+    assert limited.json()["error"] == "tenant_rate"
+    assert int(limited.headers["Retry-After"]) >= 3
+
+    busy = client.post("/admin/tool", headers={"X-User-Id": "a"})
+    assert busy.status_code == 503
+    assert busy.json()["error"] == "server_busy"
+    assert busy.headers["Retry-After"] == "1"
+
+def test_idle_tenant_buckets_are_evicted():
+    clock = FakeClock()
+    admission = controller(capacity=1000, clock=clock, sweep_seconds=60)
+    for i in range(50):
+        assert admission.try_admit("live", f"tenant-{i}") is None
+        admission.release("live", f"tenant-{i}")
+    assert len(admission._buckets) == 50
+
+    # Refilled by now, so they are no different from new buckets
+    clock.now = 61
+    admission.try_admit("live", "busy")
+    assert list(admission._buckets) == [("live", "busy")]
+
+def test_tenant_buckets_are_bounded():
+    admission = controller(capacity=1000, max_tenants=10)
+    for i in range(100):
+        admission.try_admit("live", f"forged-{i}")
+        admission.release("live", f"forged-{i}")
+
+    assert len(admission._buckets) == 10
+    assert ("live", "forged-99") in admission._buckets
@@ -0,0 +1,122 @@
+import asyncio
+import base64
+import json
+
+import orjson
+
+from tests.conftest import DOCTOR, TENANT, future_date, headers
+
+def appointment(appointment_id: str, patient: str, time: str = "10:00:00") -> dict:
+    return {
+        "appointment_id": appointment_id, "user_id": TENANT, "patient_name": patient,
+        "assigned_doctor": DOCTOR, "appointment_date": future_date(), "appointment_time": time,
+        "appointment_reason": "Checkup", "current_status": "scheduled", "event_id": None,
+        "call_id": "call-0", "patient_phone": None,
+    }
+
+def test_list_endpoint_serves_rows_over_http_and_in_process(server, client):
+    m, fake = server
+    fake.tables["appointment_details"] = [appointment("SUN-000001", "Ravi Kumar")]
+
+    response = client.post("/list_appointments_for_patient", json={"patient_name": "Ravi Kumar"}, headers=headers())
+    assert response.headers["content-type"] == "application/json"
+    assert [row["appointment_id"] for row in response.json()["result"]] == ["SUN-000001"]
+
+    direct = asyncio.run(m.list_appointments_for_patient(m.ListAppointmentsBody(patient_name="Ravi Kumar"), user_id=TENANT, call_id="c"))
+    assert isinstance(direct, m.ResultResponse)
+    assert direct["result"][0]["appointment_id"] == "SUN-000001"
+    assert direct.get("next_cursor") is None
+
+def test_similar_names_are_offered_for_confirmation_not_merged(server, client):
+    _, fake = server
+    fake.tables["appointment_details"] = [
+        appointment("SUN-000001", "Ramesh Kumar"),
+        appointment("SUN-000002", "Ramesh Sharma", time="11:00:00"),
+        appointment("SUN-000003", "Ramesh Kumaar", time="12:00:00"),
+    ]
+
+    # A first name alone, and a spelling two stored patients sound like
+    for heard, expected in [("Ramesh", ["Ramesh Kumaar", "Ramesh Kumar", "Ramesh Sharma"]), ("Ramesh Kumarr", ["Ramesh Kumaar", "Ramesh Kumar"])]:
+        response = client.post("/list_appointments_for_patient", json={"patient_name": heard}, headers=headers()).json()
+        assert isinstance(response["result"], str) and "which one" in response["result"]
+        assert sorted(response["candidates"]) == expected
+
+def test_one_confident_spelling_is_looked_up_alone(server, client):
+    _, fake = server
+    fake.tables["appointment_details"] = [
+        appointment("SUN-000001", "Ramesh Kumar"),
+        appointment("SUN-000002", "Suresh Kumar", time="11:00:00"),
+    ]
+
+    response = client.post("/get_appointment_details", json={"patient_name": "ramesh kumaar"}, headers=headers()).json()
+
+    assert [row["appointment_id"] for row in response["result"]] == ["SUN-000001"]
+    assert "candidates" not in response
+
+def test_exact_name_is_looked_up_alone(server, client):
+    _, fake = server
+    fake.tables["appointment_details"] = [
+        appointment("SUN-000001", "Ravi Kumar"),
+        appointment("SUN-000002", "Ravi Kumaar", time="11:00:00"),
+    ]
+
+    response = client.post("/list_appointments_for_patient", json={"patient_name": "Mr. Ravi Kumar"}, headers=headers()).json()
+
+    assert [row["patient_name"] for row in response["result"]] == ["Ravi Kumar"]
+
+def test_crafted_cursor_is_rejected(server, client):
+    m, fake = server
+    fake.tables["appointment_details"] = [appointment("SUN-000001", "Ravi Kumar")]
+    valid = m.encode_appointment_cursor(appointment("SUN-000001", "Ravi Kumar"))
+    crafted = [
+        [future_date(), '10:00:00",user_id.neq."x', "SUN-000001"],
+        ["2025-13-01", "10:00:00", "SUN-000001"],
+        [future_date(), "10:00:00", 'SUN-1),or(id.gt.0'],
+        [future_date(), "10:00", "SUN-000001"],
+    ]
+
+    for key in crafted:
+        cursor = base64.urlsafe_b64encode(orjson.dumps(key)).decode("ascii")
+        response = client.post("/list_appointments_for_patient", json={"patient_name": "Ravi Kumar", "cursor": cursor}, headers=headers())
+        assert response.status_code == 422, key
+    response = client.post("/get_appointment_details", json={"patient_name": "Ravi Kumar", "cursor": "not base64!"}, headers=headers())
+    assert response.status_code == 422
+    response = client.post("/list_appointments_for_patient", json={"patient_name": "Ravi Kumar", "cursor": valid}, headers=headers())
+    assert response.status_code == 200
+
+def test_next_cursor_pages_through_appointments(server, client):
+    _, fake = server
+    fake.tables["appointment_details"] = [
+        appointment("SUN-000003", "Ravi Kumar", time="11:00:00"),
+        appointment("SUN-000001", "Ravi Kumar"),
+        appointment("SUN-000002", "Ravi Kumar"),
+    ]
+
+    first = client.post("/get_appointment_details", json={"patient_name": "Ravi Kumar", "limit": 2}, headers=headers()).json()
+    assert [row["appointment_id"] for row in first["result"]] == ["SUN-000001", "SUN-000002"]
+    assert first["next_cursor"]
+
+    second = client.post("/get_appointment_details", json={"patient_name": "Ravi Kumar", "limit": 2, "cursor": first["next_cursor"]}, headers=headers()).json()
+    assert [row["appointment_id"] for row in second["result"]] == ["SUN-000003"]
+    assert second["next_cursor"] is None
+
+def test_mcp_tools_pass_the_cursor_through(server, monkeypatch):
+    import mcp_transport
+    _, fake = server
+    fake.tables["appointment_details"] = [
+        appointment("SUN-000001", "Ravi Kumar"),
+        appointment("SUN-000002", "Ravi Kumar", time="11:00:00"),
+    ]
+    monkeypatch.setattr(mcp_transport, "_require_identity", lambda ctx: (TENANT, "call-1"))
+    mcp = mcp_transport.build_mcp_server()
+
+    async def page(cursor=None):
+        content = await mcp.call_tool("list_appointments_for_patient", {"patient_name": "Ravi Kumar", "limit": 1, "cursor": cursor})
+        blocks = content[0] if isinstance(content, tuple) else content
+        return json.loads(blocks[0].text)
+
+    first = asyncio.run(page())
+    second = asyncio.run(page(first["next_cursor"]))
+
+    assert [row["appointment_id"] for row in first["appointments"] + second["appointments"]] == ["SUN-000001", "SUN-000002"]
+    assert second["next_cursor"] is None
@@ -0,0 +1,36 @@
+from tests.conftest import DOCTOR, future_date, headers
+
+def schedule(time: str, patient: str) -> dict:
+    return {"tool": "schedule_appointment", "args": {
+        "patient_name": patient, "assigned_doctor": DOCTOR,
+        "appointment_date": future_date(), "appointment_time": time,
+        "appointment_reason": "Checkup",
+    }}
+
+def test_schedule_items_in_one_batch_get_distinct_ids(server, client):
+    _, fake = server
+    # Slow queries widen the window between reading the last ID and inserting
+    fake.latency["appointment_details"] = 0.02
+    invocations = [schedule("10:00 AM", "Ravi Kumar"), schedule("10:30 AM", "Meena Iyer"), schedule("11:00 AM", "Arjun Das")]
+    response = client.post("/batch", json={"invocations": invocations}, headers=headers())
+
+    items = response.json()["result"]
+    assert [item["error"] for item in items] == [None, None, None]
+    ids = sorted(row["appointment_id"] for row in fake.tables["appointment_details"])
+    assert ids == ["SUN-000001", "SUN-000002", "SUN-000003"]
+
+def test_batch_runs_reads_before_writes_and_keeps_order(server, client, monkeypatch):
+    m, _ = server
+    order = []
+    run = m._run_batch_item
+
+    async def recording(invocation, identity):
+        order.append(invocation.tool)
+        return await run(invocation, identity)
+    monkeypatch.setattr(m, "_run_batch_item", recording)
+
+    invocations = [schedule("10:00 AM", "Ravi Kumar"), {"tool": "get_doctor_details_for_user", "args": {}}]
+    items = client.post("/batch", json={"invocations": invocations}, headers=headers()).json()["result"]
+
+    assert order == ["get_doctor_details_for_user", "schedule_appointment"]
+    assert [item["tool"] for item in items] == ["schedule_appointment", "get_doctor_details_for_user"]
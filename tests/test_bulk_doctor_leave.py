@@ -0,0 +1,53 @@
+from tests.conftest import DOCTOR, TENANT, future_date, headers
+from tests.test_appointment_lists import appointment
+
+def leave(client, dates, shift_days=1):
+    body = {"doctor_name": DOCTOR, "dates": dates, "action": "reschedule", "shift_days": shift_days}
+    return client.post("/bulk_doctor_leave", json=body, headers=headers()).json()
+
+def dates_by_id(fake):
+    return {row["appointment_id"]: row["appointment_date"] for row in fake.tables["appointment_details"]}
+
+def test_shift_into_existing_booking_is_reported_not_written(server, client):
+    _, fake = server
+    day1, day2 = future_date(1), future_date(2)
+    fake.tables["appointment_details"] = [
+        {**appointment("SUN-000001", "Ravi Kumar", "10:00:00"), "appointment_date": day1},
+        {**appointment("SUN-000002", "Meena Iyer", "11:00:00"), "appointment_date": day1},
+        {**appointment("SUN-000003", "Arjun Das", "10:00:00"), "appointment_date": day2},
+    ]
+
+    result = leave(client, [day1])
+
+    assert result["affected"] == 1
+    assert [(r["appointment_id"], r["reason"]) for r in result["not_moved"]] == [("SUN-000001", "the slot is already booked")]
+    assert dates_by_id(fake) == {"SUN-000001": day1, "SUN-000002": day2, "SUN-000003": day2}
+
+def test_shift_into_slot_vacated_by_the_same_leave_moves_both(server, client):
+    _, fake = server
+    day1, day2, day3 = future_date(1), future_date(2), future_date(3)
+    fake.tables["appointment_details"] = [
+        {**appointment("SUN-000001", "Ravi Kumar", "10:00:00"), "appointment_date": day1},
+        {**appointment("SUN-000002", "Arjun Das", "10:00:00"), "appointment_date": day2},
+    ]
+
+    result = leave(client, [day1, day2])
+
+    assert result["not_moved"] == []
+    assert dates_by_id(fake) == {"SUN-000001": day2, "SUN-000002": day3}
+
+def test_shift_onto_closed_day_or_held_slot_is_rejected(server, client):
+    m, fake = server
+    fake.tables["user_settings"][0]["doctor_details"][0]["working_hours"] = "Monday-Sunday: 9:00 AM - 10:30 AM"
+    day1, day2 = future_date(1), future_date(2)
+    fake.tables["appointment_details"] = [
+        {**appointment("SUN-000001", "Ravi Kumar", "10:00:00"), "appointment_date": day1},
+        {**appointment("SUN-000002", "Meena Iyer", "11:00:00"), "appointment_date": day1},
+    ]
+    m.HOLDS.place((TENANT, DOCTOR, day2, "10:00:00"), "other-call")
+
+    result = leave(client, [day1])
+
+    reasons = {r["appointment_id"]: r["reason"] for r in result["not_moved"]}
+    assert reasons == {"SUN-000001": "the slot is held by another call", "SUN-000002": "outside the doctor's working hours"}
+    assert result["affected"] == 0
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from calendar_sync import BusyIntervalStore, CalendarSyncer
+from utils import IST
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+class FakeEvents:
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.calls = []
+
+    def list(self, **params):
+        self.calls.append(params)
+        return FakeRequest(self.pages.pop(0))
+
+class FakeService:
+    def __init__(self, pages):
+        self._events = FakeEvents(pages)
+
+    def events(self):
+        return self._events
+
+def timed_event(event_id: str, start: str, end: str) -> dict:
+    return {"id": event_id, "status": "confirmed", "start": {"dateTime": start}, "end": {"dateTime": end}}
+
+def test_full_sync_starts_at_today_and_incremental_sync_uses_the_token():
+    today = datetime.now(IST).strftime("%Y-%m-%d")
+    service = FakeService([
+        {"items": [timed_event("e1", f"{today}T23:00:00+05:30", f"{today}T23:30:00+05:30")], "nextPageToken": "p2"},
+        {"items": [], "nextSyncToken": "sync-1"},
+        {"items": [], "nextSyncToken": "sync-2"},
+    ])
+    store = BusyIntervalStore()
+    syncer = CalendarSyncer(store)
+
+    syncer.sync_calendar(service, "cal")
+    syncer.sync_calendar(service, "cal")
+
+    full_first, full_second, incremental = service.events().calls
+    assert full_first["timeMin"] == f"{today}T00:00:00+05:30"
+    assert full_second["timeMin"] == full_first["timeMin"] and full_second["pageToken"] == "p2"
+    assert incremental["syncToken"] == "sync-1" and "timeMin" not in incremental
+    assert store.is_busy("cal", today, "23:00:00")
+
+def test_server_sync_runs_under_the_calendar_dependency(server, monkeypatch):
+    m, _ = server
+    calls = []
+    monkeypatch.setattr(m.CALENDAR, "call", lambda fn, idempotent=False: calls.append(idempotent) or fn())
+    service = FakeService([{"items": [], "nextSyncToken": "sync-1"}])
+
+    m.CALENDAR_SYNCER.sync_calendar(service, "server-cal")
+
+    assert calls == [True]
+
+class ThreadPerTask(ThreadPoolExecutor):
+    """Runs every task on a new thread, so separate worker calls never share one."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        threading.Thread(target=run).start()
+        return future
+
+def test_service_is_built_and_used_in_the_same_thread():
+    threads = {}
+    service = FakeService([{"items": [], "nextSyncToken": "sync-1"}])
+
+    def get_service(calendar_auth):
+        threads["built"] = threading.current_thread()
+        return service
+
+    def execute(request):
+        threads["used"] = threading.current_thread()
+        return request.execute()
+
+    async def sync_once():
+        asyncio.get_running_loop().set_default_executor(ThreadPerTask())
+        syncer = CalendarSyncer(BusyIntervalStore(), interval_seconds=60, execute=execute)
+        task = asyncio.create_task(syncer.run_forever(lambda: [({"token": "t"}, "cal")], get_service))
+        while "used" not in threads:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(sync_once())
+
+    assert threads["built"] is threads["used"] is not threading.main_thread()
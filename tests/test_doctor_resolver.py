@@ -0,0 +1,58 @@
+from collections import namedtuple
+
+from doctor_resolver import DoctorResolver
+
+Doctor = namedtuple("Doctor", "name specialty")
+
+ANITA = Doctor("Dr. Anita Sharma", "Cardiology")
+RAHUL = Doctor("Dr. Rahul Sharma", "Pediatrics")
+MEERA = Doctor("Dr. Meera Iyer", "Interventional Cardiology")
+VIKRAM = Doctor("Dr. Vikram Rao", "Dentistry")
+LATA = Doctor("Dr. Lata Menon", "ENT")
+
+def test_names_resolve_however_they_are_spelled():
+    resolver = DoctorResolver([ANITA, RAHUL])
+
+    assert resolver.resolve("Dr. Anita Sharma") is ANITA
+    assert resolver.resolve("DR ANITA SHARMA") is ANITA
+    assert resolver.resolve("doctor anita sharma") is ANITA
+    assert resolver.resolve("anita") is ANITA
+
+def test_shared_surname_is_ambiguous():
+    resolver = DoctorResolver([ANITA, RAHUL])
+
+    assert resolver.resolve("sharma") is None
+    assert resolver.resolve("Dr. Sharma") is None
+    assert resolver.resolve("Dr. Gupta") is None
+
+def test_unique_specialty_resolves_to_its_doctor():
+    resolver = DoctorResolver([ANITA, RAHUL])
+
+    assert resolver.resolve("the cardiologist") is ANITA
+    assert resolver.resolve("kids doctor") is RAHUL
+
+def test_specialty_aliases():
+    resolver = DoctorResolver([ANITA, RAHUL, VIKRAM, LATA])
+
+    assert resolver.for_specialty("heart specialist") == [ANITA]
+    assert resolver.for_specialty("cardiologist") == [ANITA]
+    assert resolver.for_specialty("children") == [RAHUL]
+    assert resolver.for_specialty("paediatrician") == [RAHUL]
+    assert resolver.for_specialty("teeth") == [VIKRAM]
+    assert resolver.for_specialty("dentist") == [VIKRAM]
+    assert resolver.for_specialty("throat doctor") == [LATA]
+    assert resolver.for_specialty("ENT") == [LATA]
+
+def test_specialty_matches_whole_stems_only():
+    resolver = DoctorResolver([VIKRAM])
+
+    # "ent" is a substring of the dentistry stem "dent"
+    assert resolver.for_specialty("ENT") == []
+    assert resolver.for_specialty("ear nose throat") == []
+
+def test_specialty_matches_a_longer_stored_specialty():
+    resolver = DoctorResolver([ANITA, MEERA])
+
+    assert resolver.for_specialty("interventional cardiologist") == [MEERA]
+    assert resolver.for_specialty("cardiologist") == [ANITA, MEERA]
+    assert resolver.for_specialty("interventional") == [MEERA]
@@ -0,0 +1,107 @@
+from holds import HoldManager, TimerWheel
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+KEY = ("tenant", "Dr. Asha Rao", "2025-07-01", "10:00:00")
+OTHER = ("tenant", "Dr. Asha Rao", "2025-07-01", "10:30:00")
+
+def manager(ttl_seconds: float = 120):
+    clock = FakeClock()
+    expired = []
+    holds = HoldManager(ttl_seconds, on_expire=lambda key, hold: expired.append(key), clock=clock)
+    return holds, clock, expired
+
+def test_hold_expires_at_its_ttl_and_not_before():
+    holds, clock, expired = manager()
+    holds.place(KEY, "call-1")
+
+    clock.now = 119.999
+    assert holds.holder(KEY) == "call-1"
+    clock.now = 120
+    assert holds.holder(KEY) is None
+    assert expired == [KEY]
+
+def test_unaligned_timer_is_never_early():
+    clock = FakeClock(0.5)
+    wheel = TimerWheel(clock=clock)
+    wheel.schedule("k", 10)
+
+    # Due at 10.5: fires on the first tick at or after it
+    clock.now = 10.9
+    assert wheel.advance() == []
+    clock.now = 11
+    assert wheel.advance() == ["k"]
+
+def test_timers_more_than_one_revolution_out():
+    holds, clock, _ = manager(ttl_seconds=600)
+    holds.place(KEY, "call-1")
+
+    # Step through the wheel, passing the hold's bucket before it is due
+    for now in range(50, 600, 50):
+        clock.now = now
+        assert holds.holder(KEY) == "call-1", now
+    clock.now = 600
+    assert holds.holder(KEY) is None
+
+def test_jump_past_a_revolution_expires_due_timers():
+    clock = FakeClock()
+    wheel = TimerWheel(clock=clock)
+    wheel.schedule("soon", 5)
+    wheel.schedule("late", 1500)
+
+    clock.now = 1000
+    assert wheel.advance() == ["soon"]
+    clock.now = 1500
+    assert wheel.advance() == ["late"]
+
+def test_booking_blocks_expiry():
+    holds, clock, expired = manager()
+    holds.place(KEY, "call-1")
+    hold, created = holds.begin_booking(KEY, "call-1")
+    assert hold is not None and not created
+
+    clock.now = 500
+    holds.sweep()
+    assert holds.holder(KEY) == "call-1"
+    assert expired == []
+    # Another call can neither hold nor book the slot meanwhile
+    assert holds.place(KEY, "call-2") == (None, False)
+    assert holds.begin_booking(KEY, "call-2") == (None, False)
+
+def test_finish_booking_keep_resumes_the_original_expiry():
+    holds, clock, _ = manager()
+    holds.place(KEY, "call-1")
+    clock.now = 30
+    holds.begin_booking(KEY, "call-1")
+    clock.now = 60
+    holds.finish_booking(KEY, keep=True)
+
+    clock.now = 119
+    assert holds.holder(KEY) == "call-1"
+    clock.now = 120
+    assert holds.holder(KEY) is None
+
+def test_finish_booking_without_keep_drops_the_hold():
+    holds, _, expired = manager()
+    holds.begin_booking(KEY, "call-1")
+
+    assert holds.finish_booking(KEY, keep=False).call_id == "call-1"
+    assert holds.holder(KEY) is None
+    assert expired == []
+
+def test_release_call_skips_holds_being_booked():
+    holds, _, _ = manager()
+    holds.place(KEY, "call-1")
+    holds.place(OTHER, "call-1")
+    holds.begin_booking(KEY, "call-1")
+
+    released = holds.release_call("tenant", "call-1")
+
+    assert [key for key, _ in released] == [OTHER]
+    assert holds.holder(KEY) == "call-1"
+    assert holds.holder(OTHER) is None
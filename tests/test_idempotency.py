@@ -0,0 +1,82 @@
+import asyncio
+
+from idempotency import IdempotencyStore
+from metrics import METRICS
+from tests.conftest import DOCTOR, future_date, headers
+
+BOOKED = "Appointment scheduled successfully."
+
+def booking(time: str = "10:00 AM") -> dict:
+    return {
+        "patient_name": "Ravi Kumar", "assigned_doctor": DOCTOR, "appointment_date": future_date(),
+        "appointment_time": time, "appointment_reason": "Checkup",
+    }
+
+def replays() -> float:
+    return METRICS.snapshot()["counters"].get("idempotent_replays_total", 0)
+
+def test_repeat_with_the_same_derived_key_is_replayed(server, client):
+    _, fake = server
+    assert client.post("/schedule_appointment", json=booking(), headers=headers()).json()["result"] == BOOKED
+    queries, replayed = fake.queries, replays()
+
+    repeat = client.post("/schedule_appointment", json=booking(), headers=headers()).json()
+
+    assert repeat["result"] == BOOKED
+    assert fake.queries == queries
+    assert replays() == replayed + 1
+    assert len(fake.tables["appointment_details"]) == 1
+
+def test_same_body_on_another_call_is_not_replayed(server, client):
+    _, fake = server
+    client.post("/schedule_appointment", json=booking(), headers=headers("call-1"))
+    client.post("/schedule_appointment", json=booking("11:00 AM"), headers=headers("call-2"))
+
+    assert len(fake.tables["appointment_details"]) == 2
+
+def test_book_cancel_book_in_one_call_books_again(server, client):
+    _, fake = server
+    assert client.post("/schedule_appointment", json=booking(), headers=headers()).json()["result"] == BOOKED
+    appointment_id = fake.tables["appointment_details"][0]["appointment_id"]
+    cancelled = client.post("/cancel_appointment", json={"appointment_id": appointment_id}, headers=headers()).json()
+    assert "cancelled" in cancelled["result"].lower()
+    replayed = replays()
+
+    again = client.post("/schedule_appointment", json=booking(), headers=headers()).json()
+
+    assert again["result"] == BOOKED
+    assert replays() == replayed
+    assert len(fake.tables["appointment_details"]) == 2
+
+def test_concurrent_duplicate_waits_for_the_first_result():
+    store = IdempotencyStore(ttl_seconds=60)
+    calls = []
+
+    async def book():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"result": BOOKED, "attempt": len(calls)}
+
+    async def both():
+        run = lambda: store.run(("tenant", "call-1"), "key", True, book, lambda r: r["result"] == BOOKED)
+        return await asyncio.gather(run(), run())
+
+    first, second = asyncio.run(both())
+
+    assert calls == [1]
+    assert first == second == {"result": BOOKED, "attempt": 1}
+
+def test_failed_attempt_is_not_stored():
+    store = IdempotencyStore(ttl_seconds=60)
+    results = iter([{"result": "Failed to schedule appointment."}, {"result": BOOKED}])
+
+    async def book():
+        return next(results)
+
+    async def twice():
+        run = lambda: store.run(("tenant", "call-1"), "key", True, book, lambda r: r["result"] == BOOKED)
+        return await run(), await run()
+
+    first, second = asyncio.run(twice())
+
+    assert first["result"] != BOOKED and second["result"] == BOOKED
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from invalidation import InvalidationBus, LocalPubSub
+from metrics import METRICS
+from tests.conftest import DOCTOR, TENANT, future_date, tenant_settings
+
+# A change must reach the other worker within this many milliseconds
+DELIVERY_MS = 100
+
+def staleness(table: str) -> dict:
+    return METRICS.snapshot()["histograms"].get(f"invalidation_staleness_seconds{{table={table}}}", {"count": 0})
+
+def test_booking_on_one_worker_reaches_the_other_within_the_deadline(server):
+    m, _ = server
+    pubsub = LocalPubSub()
+    worker_a, worker_b = InvalidationBus(), InvalidationBus()
+    seen_by_a = []
+    worker_a.subscribe("appointment_details", seen_by_a.append)
+    # Worker B runs the server's handlers against its caches and schedule feed
+    worker_b.subscribe("user_settings", m.on_user_settings_change)
+    worker_b.subscribe("appointment_details", m.on_appointment_change)
+    pubsub.attach(worker_a)
+    pubsub.attach(worker_b)
+    before = staleness("appointment_details")["count"]
+    row = {
+        "user_id": TENANT, "appointment_id": "SUN-000042", "patient_name": "Ravi Kumar",
+        "assigned_doctor": DOCTOR, "appointment_date": future_date(), "appointment_time": "10:00:00",
+        "current_status": "scheduled",
+    }
+
+    async def book_on_a_and_wait_on_b():
+        m.SCHEDULE_FEED.bind_loop(asyncio.get_running_loop())
+        queue = m.SCHEDULE_FEED.subscribe(TENANT)
+        started = time.monotonic()
+        # Realtime delivers A's commit from its listener thread
+        await asyncio.to_thread(pubsub.publish, "appointment_details", "INSERT", row)
+        delta = await asyncio.wait_for(queue.get(), timeout=DELIVERY_MS / 1000)
+        return delta, (time.monotonic() - started) * 1000
+
+    delta, elapsed_ms = asyncio.run(book_on_a_and_wait_on_b())
+
+    assert elapsed_ms < DELIVERY_MS
+    assert delta["op"] == "upsert" and delta["appointment_id"] == "SUN-000042"
+    assert seen_by_a[0]["record"]["appointment_id"] == "SUN-000042"
+    histogram = staleness("appointment_details")
+    # Once per worker
+    assert histogram["count"] == before + 2
+    assert histogram["max"] < DELIVERY_MS / 1000
+
+def test_settings_change_on_one_worker_evicts_the_other_workers_cache(server):
+    m, _ = server
+    pubsub = LocalPubSub()
+    worker_a, worker_b = InvalidationBus(), InvalidationBus()
+    worker_b.subscribe("user_settings", m.on_user_settings_change)
+    pubsub.attach(worker_a)
+    pubsub.attach(worker_b)
+    m.SETTINGS_CACHE.set(TENANT, "cached settings")
+    before = staleness("user_settings")["count"]
+
+    started = time.monotonic()
+    pubsub.publish("user_settings", "UPDATE", tenant_settings("Monday-Sunday: 10:00 AM - 2:00 PM"))
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    assert m.SETTINGS_CACHE.get(TENANT) is None
+    assert elapsed_ms < DELIVERY_MS
+    assert staleness("user_settings")["count"] == before + 2
+    assert METRICS.snapshot()["gauges"]["invalidation_last_staleness_seconds{table=user_settings}"] < DELIVERY_MS / 1000
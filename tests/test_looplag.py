@@ -0,0 +1,29 @@
+import asyncio
+import json
+
+from looplag import LoopLagMonitor
+
+def lag_reports(output: str) -> list:
+    lines = (json.loads(line) for line in output.splitlines() if line.startswith("{"))
+    return [line for line in lines if line["event"] == "event_loop_lag"]
+
+async def run_monitor(monitor: LoopLagMonitor) -> None:
+    monitor.start()
+    await asyncio.sleep(0.1)
+    monitor.stop()
+
+def test_agent_lag_summary_carries_metrics_snapshot(capsys):
+    asyncio.run(run_monitor(LoopLagMonitor("agent", interval_seconds=0.005, report_seconds=0.02, log_metrics=True)))
+
+    reports = lag_reports(capsys.readouterr().out)
+    assert reports
+    metrics = reports[-1]["metrics"]
+    assert metrics["histograms"]["event_loop_lag_seconds{process=agent}"]["count"] > 0
+    assert "event_loop_lag_max_seconds{process=agent}" in metrics["gauges"]
+
+def test_server_lag_summary_leaves_metrics_to_endpoint(capsys):
+    asyncio.run(run_monitor(LoopLagMonitor("mcp_server", interval_seconds=0.005, report_seconds=0.02)))
+
+    reports = lag_reports(capsys.readouterr().out)
+    assert reports
+    assert all("metrics" not in report for report in reports)
@@ -0,0 +1,21 @@
+from metrics import Histogram, Metrics
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot["buckets"] == {"le_0.1": 2, "le_1.0": 3, "le_inf": 4}
+    assert snapshot["count"] == 4 and snapshot["max"] == 2.0
+
+def test_labelled_metrics_render_in_the_snapshot():
+    metrics = Metrics()
+    metrics.inc("requests_total", labels={"route": "/x"})
+    metrics.observe("latency_seconds", 0.2, buckets=(0.1, 1.0))
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["counters"] == {"requests_total{route=/x}": 1}
+    assert snapshot["histograms"]["latency_seconds"]["buckets"] == {"le_0.1": 0, "le_1.0": 1, "le_inf": 1}
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from calendar_sync import BusyIntervalStore
+from tests.conftest import DOCTOR, TENANT, headers, tenant_settings
+from utils import IST
+
+def next_sunday() -> datetime:
+    day = datetime.now(IST).date() + timedelta(days=1)
+    while day.weekday() != 6:
+        day += timedelta(days=1)
+    return datetime.combine(day, datetime.min.time())
+
+SUNDAY = next_sunday()
+MONDAY = (SUNDAY + timedelta(days=1)).strftime("%Y-%m-%d")
+TUESDAY = (SUNDAY + timedelta(days=2)).strftime("%Y-%m-%d")
+
+@pytest.fixture
+def clinic(server, monkeypatch):
+    """A doctor working 9-11 AM except on Sundays, with an empty calendar."""
+    m, fake = server
+    fake.tables["user_settings"] = [tenant_settings("Monday-Saturday: 9:00 AM - 11:00 AM")]
+    monkeypatch.setattr(m, "BUSY_STORE", BusyIntervalStore())
+    return m, fake
+
+def search(client, days: int, k: int = 3) -> list:
+    body = {"doctor_name": DOCTOR, "from_date": SUNDAY.strftime("%Y-%m-%d"), "from_time": "09:00", "days": days, "k": k}
+    return client.post("/next_available", json=body, headers=headers()).json()["result"]
+
+def slots(openings: list) -> list:
+    return [(o["appointment_date"], o["appointment_time"]) for o in openings]
+
+def test_search_crosses_a_day_off(clinic, client):
+    openings = search(client, days=2)
+
+    assert slots(openings) == [(MONDAY, "09:00:00"), (MONDAY, "09:30:00"), (MONDAY, "10:00:00")]
+    assert {o["doctor_name"] for o in openings} == {DOCTOR}
+
+def test_held_and_calendar_busy_slots_are_skipped(clinic, client):
+    m, _ = clinic
+    m.HOLDS.place((TENANT, DOCTOR, MONDAY, "09:00:00"), "another-call")
+    busy_start = IST.localize(datetime.strptime(f"{MONDAY} 09:30", "%Y-%m-%d %H:%M"))
+    m.BUSY_STORE.replace_calendar("asha@example.com", {"event-1": [(busy_start, busy_start + timedelta(minutes=30))]})
+
+    assert slots(search(client, days=2)) == [(MONDAY, "10:00:00"), (MONDAY, "10:30:00")]
+
+def test_booked_slots_are_skipped(clinic, client):
+    _, fake = clinic
+    fake.tables["appointment_details"] = [{
+        "appointment_id": "SUN-000001", "user_id": TENANT, "patient_name": "Ravi Kumar",
+        "assigned_doctor": DOCTOR, "appointment_date": MONDAY, "appointment_time": "09:00:00",
+        "current_status": "scheduled",
+    }]
+
+    assert slots(search(client, days=2, k=1)) == [(MONDAY, "09:30:00")]
+
+def test_search_stops_at_the_horizon(clinic, client):
+    # Sunday off and Monday's four slots: a two-day window has no fifth opening
+    assert len(search(client, days=2, k=10)) == 4
+    assert slots(search(client, days=3, k=5))[-1] == (TUESDAY, "09:00:00")
+    # A one-day window holds only the day off
+    assert search(client, days=1) == []
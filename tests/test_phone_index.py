@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from phone_index import PhoneIndex, phone_key
+from tests.conftest import TENANT
+
+OTHER_TENANT = "22222222-2222-2222-2222-222222222222"
+
+@pytest.mark.parametrize("dialled", ["9876543210", "09876543210", "098765 43210", "+91 98765 43210", "+91-98765-43210", "919876543210"])
+def test_local_and_international_forms_share_one_key(dialled):
+    assert phone_key(dialled) == "+919876543210"
+
+def test_unparseable_numbers_are_kept_trimmed():
+    assert phone_key(" 12345 ") == "12345"
+    assert phone_key("") is None
+
+def test_lookup_matches_any_spelling_of_an_indexed_number():
+    index = PhoneIndex()
+    index.load({TENANT: "+91 98765 43210"})
+
+    assert index.lookup("09876543210") == (True, TENANT)
+    assert index.lookup("9876543210") == (True, TENANT)
+    assert index.lookup("+919000000000") == (False, None)
+
+def test_unassigned_number_is_remembered_for_the_negative_ttl():
+    index = PhoneIndex(negative_ttl_seconds=0.05)
+    index.remember_missing("09000000000")
+
+    assert index.lookup("+919000000000") == (True, None)
+    time.sleep(0.06)
+    assert index.lookup("+919000000000") == (False, None)
+
+def test_assigning_a_remembered_number_forgets_that_it_was_missing():
+    index = PhoneIndex()
+    index.remember_missing("+919000000000")
+    index.set(TENANT, "09000000000")
+
+    assert index.lookup("+919000000000") == (True, TENANT)
+
+def test_index_follows_settings_changes(server):
+    m, _ = server
+    m.AGENT_PHONES.load({TENANT: "+919876543210"})
+
+    # The clinic moves to a new number
+    m.on_user_settings_change({"type": "UPDATE", "record": {"user_id": TENANT, "agent_phone": "09123456780"}, "old_record": {}})
+    assert m.AGENT_PHONES.lookup("+919123456780") == (True, TENANT)
+    assert m.AGENT_PHONES.lookup("+919876543210") == (False, None)
+
+    # Its old number is given to another clinic
+    m.on_user_settings_change({"type": "INSERT", "record": {"user_id": OTHER_TENANT, "agent_phone": "+919876543210"}, "old_record": {}})
+    assert m.AGENT_PHONES.lookup("9876543210") == (True, OTHER_TENANT)
+
+    m.on_user_settings_change({"type": "DELETE", "record": {}, "old_record": {"user_id": OTHER_TENANT}})
+    assert m.AGENT_PHONES.lookup("9876543210") == (False, None)
+
+def test_endpoint_answers_unassigned_numbers_from_memory(server, client):
+    _, fake = server
+    fake.tables["user_settings"] = []
+    body = {"agent_phone": "+919000000000"}
+
+    assert client.post("/get_user_id_by_agent_phone", json=body, headers={"X-Call-Id": "c"}).json()["result"] is None
+    queries = fake.queries
+    assert client.post("/get_user_id_by_agent_phone", json=body, headers={"X-Call-Id": "c"}).json()["result"] is None
+    assert fake.queries == queries
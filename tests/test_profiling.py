@@ -0,0 +1,56 @@
+import os
+import pstats
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from profiling import ProfilingMiddleware, RequestProfiler
+
+def busy_work(seconds: float) -> int:
+    """Spins the CPU for `seconds`."""
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+def profiled_client(server, tmp_path, mode: str) -> TestClient:
+    m, _ = server
+
+    @m.off_loop
+    async def work():
+        return {"result": busy_work(0.1)}
+
+    app = FastAPI()
+    app.add_api_route("/work", work, methods=["POST"])
+    profiler = RequestProfiler(header_enabled=True, sample_rate=1, mode=mode, output_dir=str(tmp_path), interval_seconds=0.002)
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    return TestClient(app)
+
+def written_profile(tmp_path, suffix: str) -> str:
+    files = [name for name in os.listdir(tmp_path) if name.endswith(suffix)]
+    assert len(files) == 1
+    return os.path.join(tmp_path, files[0])
+
+def test_cprofile_records_handler_work_in_its_worker_thread(server, tmp_path):
+    client = profiled_client(server, tmp_path, "cprofile")
+
+    assert client.post("/work", headers={"X-Profile": "1"}).status_code == 200
+
+    stats = pstats.Stats(written_profile(tmp_path, ".prof")).stats
+    busy = [timing for (filename, _, name), timing in stats.items() if name == "busy_work"]
+    assert busy
+    # (calls, primitive calls, total time, cumulative time, callers)
+    assert busy[0][3] >= 0.05
+
+def test_sampled_stacks_cover_handler_and_skip_idle_loop(server, tmp_path):
+    client = profiled_client(server, tmp_path, "sample")
+
+    assert client.post("/work", headers={"X-Profile": "1"}).status_code == 200
+
+    with open(written_profile(tmp_path, ".folded")) as f:
+        stacks = [line.rsplit(" ", 1)[0] for line in f.read().splitlines()]
+    assert any("busy_work" in stack for stack in stacks)
+    # The event loop waiting in select() while the worker runs is not request time
+    assert not any(stack.split(";")[-1].startswith("select (selectors.py") for stack in stacks)
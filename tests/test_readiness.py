@@ -0,0 +1,61 @@
+from readiness import Readiness
+
+def make_readiness(required_steps=None) -> Readiness:
+    return Readiness(
+        ["connections", "settings", "calendar"],
+        probe=lambda: {"supabase": {"ok": True}},
+        required_steps=required_steps,
+    )
+
+def flaky(failures: int, calls: list):
+    """A step that raises `failures` times before succeeding, appending to calls."""
+    def step():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError("connection refused")
+        return {"rows": 1}
+    return step
+
+def test_failed_required_step_keeps_server_unready():
+    readiness = make_readiness()
+    readiness.run_step("connections", lambda: None)
+    readiness.run_step("settings", flaky(1, []))
+    readiness.run_step("calendar", lambda: None)
+
+    assert readiness.finish_warmup() is False
+    status = readiness.status(["supabase"])
+    assert status["ready"] is False
+    assert status["warmup"]["settings"]["status"] == "failed"
+
+def test_failed_optional_step_does_not_hold_readiness_back():
+    readiness = make_readiness(required_steps=["connections", "settings"])
+    readiness.run_step("connections", lambda: None)
+    readiness.run_step("settings", lambda: None)
+    readiness.run_step("calendar", flaky(1, []))
+
+    assert readiness.finish_warmup() is True
+    assert readiness.status(["supabase"])["ready"] is True
+
+def test_run_warmup_retries_failed_step_and_the_steps_after_it():
+    readiness = make_readiness()
+    connections, settings, calendar = [], [], []
+
+    assert readiness.run_warmup({
+        "connections": flaky(0, connections),
+        "settings": flaky(2, settings),
+        "calendar": flaky(0, calendar),
+    }, retry_seconds=0.01)
+
+    assert (len(connections), len(settings), len(calendar)) == (1, 3, 3)
+    assert readiness.status(["supabase"])["ready"] is True
+
+def test_stop_ends_retries_without_marking_ready():
+    readiness = make_readiness()
+    readiness.stop()
+
+    assert readiness.run_warmup({
+        "connections": flaky(100, []),
+        "settings": lambda: None,
+        "calendar": lambda: None,
+    }, retry_seconds=0.01) is False
+    assert readiness.status(["supabase"])["ready"] is False
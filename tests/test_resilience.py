@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Dependency, DependencyUnavailable
+from tests.conftest import TENANT
+
+class FlakyCall:
+    """A dependency call with injected latency per attempt and failures for the first `failures` attempts."""
+
+    def __init__(self, latencies=(), failures: int = 0, result="ok"):
+        self.latencies = list(latencies)
+        self.failures = failures
+        self.result = result
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            attempt = self.attempts
+            self.attempts += 1
+        if attempt < len(self.latencies):
+            time.sleep(self.latencies[attempt])
+        if attempt < self.failures:
+            raise ConnectionError(f"attempt {attempt} failed")
+        return f"{self.result} from attempt {attempt}"
+
+def test_deadline_bounds_the_wait():
+    dependency = Dependency("slow", deadline_seconds=0.1, retries=2)
+    started = time.monotonic()
+    with pytest.raises(DependencyUnavailable):
+        dependency.call(FlakyCall(latencies=[0.5]), idempotent=True)
+    assert time.monotonic() - started < 0.3
+
+def test_idempotent_calls_are_retried_and_writes_are_not():
+    dependency = Dependency("flaky", deadline_seconds=2, retries=2, backoff_seconds=0.01)
+    read = FlakyCall(failures=2)
+    assert dependency.call(read, idempotent=True) == "ok from attempt 2"
+
+    write = FlakyCall(failures=1)
+    with pytest.raises(ConnectionError):
+        dependency.call(write)
+    assert write.attempts == 1
+
+def test_answers_are_not_retried():
+    dependency = Dependency("answers", deadline_seconds=1, retries=2, is_failure=lambda error: False)
+    call = FlakyCall(failures=1)
+    with pytest.raises(ConnectionError):
+        dependency.call(call, idempotent=True)
+    assert call.attempts == 1
+    assert dependency.breaker.state == CLOSED
+
+def test_slow_read_is_hedged():
+    dependency = Dependency("hedged", deadline_seconds=2, hedge_after_seconds=0.05)
+    started = time.monotonic()
+    assert dependency.call(FlakyCall(latencies=[0.5, 0.0]), idempotent=True) == "ok from attempt 1"
+    assert time.monotonic() - started < 0.3
+
+def test_breaker_opens_half_opens_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker("breaker", failure_threshold=2, reset_seconds=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # One trial at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+def test_open_breaker_fails_fast_without_calling():
+    dependency = Dependency("down", deadline_seconds=1, retries=0, failure_threshold=1, reset_seconds=60)
+    with pytest.raises(ConnectionError):
+        dependency.call(FlakyCall(failures=1))
+    call = FlakyCall()
+    with pytest.raises(DependencyUnavailable):
+        dependency.call(call)
+    assert call.attempts == 0
+
+def test_slow_queries_and_retry_backoff_do_not_block_the_event_loop(server, monkeypatch):
+    m, fake = server
+    fake.latency["user_settings"] = 0.1
+    # The first two attempts fail with an outage and are retried after a backoff
+    fake.errors["user_settings"] = [ConnectionError("reset"), ConnectionError("reset")]
+    monkeypatch.setattr(m.SUPABASE, "backoff_seconds", 0.1)
+    monkeypatch.setattr(m.SUPABASE, "breaker", CircuitBreaker("supabase"))
+
+    async def measure():
+        ticks = 0
+        task = asyncio.ensure_future(m.get_doctor_details_for_user(m.GetDoctorDetailsBody(), user_id=TENANT, call_id="call-1"))
+        started = time.monotonic()
+        while not task.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        return task.result(), ticks, time.monotonic() - started
+
+    response, ticks, elapsed = asyncio.run(measure())
+
+    assert response["result"][0]["name"] == "Dr. Asha Rao"
+    assert elapsed >= 0.3
+    # The loop kept ticking while the endpoint waited on Supabase
+    assert ticks >= elapsed / 0.01 * 0.5
+
+def test_endpoints_run_on_their_own_executor(server):
+    m, _ = server
+    threads = []
+
+    @m.off_loop
+    async def endpoint():
+        threads.append(threading.current_thread().name)
+        return {"result": "ok"}
+
+    assert asyncio.run(endpoint()) == {"result": "ok"}
+    assert threads[0].startswith("endpoint")
+    assert m.ENDPOINT_EXECUTOR._max_workers == m.ADMISSION.capacity
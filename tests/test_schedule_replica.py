@@ -0,0 +1,38 @@
+from schedule_feed import ScheduleFeed
+from schedule_replica import ScheduleReplica
+from tests.conftest import DOCTOR, future_date, headers
+
+def upsert(feed: ScheduleFeed, appointment_id: str, time: str) -> dict:
+    return feed.publish("tenant", {
+        "op": "upsert", "appointment_id": appointment_id, "assigned_doctor": DOCTOR,
+        "appointment_date": future_date(), "appointment_time": time,
+    })
+
+def test_replica_rejects_deltas_from_another_feed_epoch():
+    day = future_date()
+    worker_a, worker_b = ScheduleFeed(), ScheduleFeed()
+    for _ in range(5):
+        worker_a.publish("tenant", {"op": "release", "hold_id": "h"})
+    replica = ScheduleReplica()
+    replica.load({"epoch": worker_a.epoch, "version": 5, "dates": {day: {DOCTOR: {"working": ["09:00:00", "17:00:00"], "busy": []}}}})
+
+    # Worker B (or A after a restart) starts at version 1, which used to be
+    # dropped as "already reflected in the snapshot"
+    assert replica.apply(upsert(worker_b, "SUN-000001", "09:00:00")) is False
+    assert replica.check_availability(DOCTOR, day, "09:00:00").endswith(f"is available at 09:00:00 on {day}.")
+
+    assert replica.apply(upsert(worker_a, "SUN-000002", "09:30:00")) is True
+    assert replica.version == 6
+    assert "not available" in replica.check_availability(DOCTOR, day, "09:30:00")
+
+def test_snapshot_carries_the_feed_epoch(server, client):
+    m, _ = server
+    m.SCHEDULE_FEED.publish("tenant", {"op": "release", "hold_id": "h"})
+    snapshot = client.post("/schedule_snapshot", json={}, headers=headers()).json()["result"]
+    assert snapshot["epoch"] == m.SCHEDULE_FEED.epoch
+
+    replica = ScheduleReplica()
+    replica.load(snapshot)
+    restarted = ScheduleFeed()
+    assert restarted.epoch != snapshot["epoch"]
+    assert replica.apply({"op": "remove", "appointment_id": "SUN-000001", "epoch": restarted.epoch, "version": 1}) is False
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from tests.conftest import DOCTOR, TENANT, future_date
+from utils import IST
+
+def booking(appointment_id: str, time: str) -> dict:
+    return {
+        "user_id": TENANT, "appointment_id": appointment_id, "assigned_doctor": DOCTOR,
+        "appointment_date": future_date(), "appointment_time": time, "current_status": "scheduled",
+    }
+
+def test_changes_committed_during_a_build_are_replayed(server, monkeypatch):
+    m, fake = server
+    fake.tables["appointment_details"] = [booking("SUN-000001", "09:00:00")]
+    compute = m.db_compute_slot_tables
+
+    def compute_then_race(user_id, today):
+        computed = compute(user_id, today)
+        # Committed after the query read the rows, before the tables are swapped in
+        m.apply_slot_change(TENANT, booking("SUN-000002", "10:00:00"))
+        m.apply_slot_change(TENANT, {**booking("SUN-000001", "09:00:00"), "current_status": "cancelled"})
+        return computed
+    monkeypatch.setattr(m, "db_compute_slot_tables", compute_then_race)
+
+    assert m.materialize_tenant(TENANT)
+
+    day = future_date()
+    assert m.SLOT_MATERIALIZER.is_free(TENANT, DOCTOR, day, "10:00:00") is False
+    assert m.SLOT_MATERIALIZER.is_free(TENANT, DOCTOR, day, "09:00:00") is True
+    assert m.SLOT_MATERIALIZER._recording == {}
+
+def test_failed_build_stops_recording(server, monkeypatch):
+    m, _ = server
+
+    def failing(user_id, today):
+        raise RuntimeError("connection reset")
+    monkeypatch.setattr(m, "db_compute_slot_tables", failing)
+
+    assert not m.materialize_tenant(TENANT)
+
+    assert not m.SLOT_MATERIALIZER.has_tenant(TENANT, datetime.now(IST).strftime("%Y-%m-%d"))
+    assert m.SLOT_MATERIALIZER._recording == {}
+
+def test_unreadable_working_hours_skip_only_that_doctor(server):
+    m, fake = server
+    settings = fake.tables["user_settings"][0]
+    settings["doctor_details"].append({**settings["doctor_details"][0], "name": "Dr. Vikram Shah", "working_hours": "Monday-Sunday: 9:00 XM - 5:00 PM"})
+
+    assert m.materialize_tenant(TENANT)
+
+    day = future_date()
+    assert m.SLOT_MATERIALIZER.is_free(TENANT, DOCTOR, day, "09:00:00") is True
+    assert m.SLOT_MATERIALIZER.is_free(TENANT, "Dr. Vikram Shah", day, "09:00:00") is None
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_python(code: str, **env) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env={**os.environ, **env},
+        capture_output=True, text=True, check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+def test_import_does_not_build_app_or_load_mcp_transport():
+    out = run_python(
+        "import sys, mcp_server; print('app' in vars(mcp_server), 'mcp_transport' in sys.modules)",
+        MCP_PROTOCOL_ENABLED="true",
+    )
+    assert out == "False False"
+
+def test_app_is_built_on_first_access():
+    out = run_python(
+        "import sys, mcp_server; app = mcp_server.app; print(app is mcp_server.app, 'mcp_transport' in sys.modules)",
+        MCP_PROTOCOL_ENABLED="false",
+    )
+    assert out == "True False"
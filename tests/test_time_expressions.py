@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+
+from utils import parse_datetime_expression, resolve_time
+
+NOW = datetime(2025, 7, 1, 10, 0)
+
+@pytest.mark.parametrize("spoken, expected", [
+    ("10.30 am", "10:30:00"),
+    ("10.30 pm", "22:30:00"),
+    ("at 7.45 p.m.", "19:45:00"),
+    ("half past ten", "10:30:00"),
+    ("quarter to eleven", "10:45:00"),
+    ("ten thirty", "10:30:00"),
+    ("ten thirty pm", "22:30:00"),
+    ("two forty-five", "14:45:00"),
+    ("ten o five", "10:05:00"),
+    ("seven o'clock", "19:00:00"),
+    ("fifteen thirty", "15:30:00"),
+])
+def test_dotted_and_spoken_times(spoken, expected):
+    assert resolve_time(spoken) == expected
+
+@pytest.mark.parametrize("spoken, expected", [
+    # Closed at 7 AM, open at 7 PM: the caller means the evening
+    ("at 7", "19:00:00"),
+    ("at seven", "19:00:00"),
+    ("at 3", "15:00:00"),
+    # Open in the morning, so taken as said
+    ("at 10", "10:00:00"),
+    # Closed either way: not guessed
+    ("at 8", "08:00:00"),
+    # An explicit part of the day wins
+    ("at 7 in the morning", "07:00:00"),
+])
+def test_bare_hours_fall_within_clinic_hours(spoken, expected):
+    assert parse_datetime_expression(spoken, NOW) == (None, expected)
+
+def test_number_words_with_dates():
+    assert parse_datetime_expression("tomorrow at half past four", NOW) == ("2025-07-02", "16:30:00")
+    assert parse_datetime_expression("in two days at ten thirty", NOW) == ("2025-07-03", "10:30:00")
+    assert parse_datetime_expression("15.03.2025 at 3", NOW) == ("2025-03-15", "15:00:00")
+
+@pytest.mark.parametrize("spoken, expected", [
+    ("10 in the morning", "10:00:00"),
+    ("4 in the afternoon", "16:00:00"),
+    ("evening 6", "18:00:00"),
+    ("morning at 11", "11:00:00"),
+    ("seven in the evening", "19:00:00"),
+    # A lone hour, as a digit or a word, follows the clinic-hours rule
+    ("5", "17:00:00"),
+    ("five", "17:00:00"),
+    ("10", "10:00:00"),
+    # Only a part of the day: its start
+    ("evening", "17:00:00"),
+])
+def test_hours_with_a_part_of_the_day(spoken, expected):
+    assert resolve_time(spoken) == expected
+
+def test_hour_next_to_part_of_the_day_keeps_the_hour():
+    assert parse_datetime_expression("tomorrow morning 11", NOW) == ("2025-07-02", "11:00:00")
+    assert parse_datetime_expression("tonight 8", NOW) == ("2025-07-01", "20:00:00")
+    assert parse_datetime_expression("tomorrow evening", NOW) == ("2025-07-02", "17:00:00")
+
+def test_unreadable_hour_is_not_replaced_by_the_part_of_the_day():
+    with pytest.raises(ValueError):
+        resolve_time("morning 99")
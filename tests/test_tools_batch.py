@@ -0,0 +1,47 @@
+import asyncio
+
+import httpx
+import pytest
+
+pytest.importorskip("livekit.agents")
+import tools  # noqa: E402
+
+from tests.conftest import TENANT  # noqa: E402
+
+INVOCATIONS = [
+    {"tool": "get_doctor_details_for_user", "args": {}},
+    {"tool": "get_caller_profile", "args": {}},
+]
+
+def serve(monkeypatch, handler):
+    monkeypatch.setattr(tools, "mcp_http_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+@pytest.mark.parametrize("status, body", [
+    (429, b'{"result": "The clinic system is busy."}'),
+    (503, b"<html>Service Unavailable</html>"),
+    (500, b"Internal Server Error"),
+])
+def test_failed_batch_returns_an_error_item_per_invocation(monkeypatch, status, body):
+    serve(monkeypatch, lambda request: httpx.Response(status, content=body))
+
+    items = asyncio.run(tools.call_mcp_batch(INVOCATIONS, user_id=TENANT, call_id="call-1"))
+
+    assert [item["tool"] for item in items] == ["get_doctor_details_for_user", "get_caller_profile"]
+    assert all(item["result"] is None and item["error"] for item in items)
+
+def test_timed_out_batch_returns_an_error_item_per_invocation(monkeypatch):
+    def handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+    serve(monkeypatch, handler)
+
+    items = asyncio.run(tools.call_mcp_batch(INVOCATIONS, user_id=TENANT, call_id="call-1"))
+
+    assert len(items) == 2
+    assert all("did not respond in time" in item["error"] for item in items)
+
+def test_shed_response_without_json_body_uses_the_default_message(monkeypatch):
+    serve(monkeypatch, lambda request: httpx.Response(503, content=b"upstream connect error"))
+
+    response = asyncio.run(tools.call_mcp_endpoint("get_caller_profile", {}, user_id=TENANT, call_id="call-1"))
+
+    assert response == {"result": "The clinic system is busy. Please try again in a moment."}
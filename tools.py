@@ -1,27 +1,160 @@
+import asyncio
 import httpx
+import json
 from livekit.agents import function_tool
 import os
 from datetime import datetime
-from typing import Optional, List
-from utils import format_time_for_db, validate_user_id
+from typing import Optional, List, Union
+from utils import IST, parse_datetime_expression, validate_user_id
+from schedule_replica import ScheduleReplicaClient
 
 # The URL of the MCP server (configurable for deployment)
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8000")
 
+# Timeouts for MCP server calls (the server bounds its own dependency calls
+# below this); requests that fail to connect are retried
+MCP_TIMEOUT = httpx.Timeout(float(os.getenv("MCP_TIMEOUT_SECONDS", "10")), connect=float(os.getenv("MCP_CONNECT_TIMEOUT_SECONDS", "2")))
+MCP_CONNECT_RETRIES = int(os.getenv("MCP_CONNECT_RETRIES", "2"))
+
+# "mcp" routes tool calls over one Model Context Protocol session per call;
+# "http" (the default) uses one REST POST per tool call
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "http").lower()
+
 # Global variables to store the correct user_id and call_id
 CORRECT_USER_ID = None
 CORRECT_CALL_ID = None
+# Caller's phone number, sent with every request so bookings are indexed by it
+CALLER_NUMBER = None
 
-def set_correct_ids(user_id: str, call_id: str) -> None:
-    """Set the correct user_id and call_id to be used by all tools"""
-    global CORRECT_USER_ID, CORRECT_CALL_ID
+# Local replica of today's/tomorrow's schedule, answering availability questions
+# in-process (see start_schedule_replica)
+SCHEDULE_REPLICA_ENABLED = os.getenv("SCHEDULE_REPLICA_ENABLED", "true").lower() != "false"
+SCHEDULE_REPLICA_CLIENT = None
+
+# Long-lived MCP client session for the current call (see open_mcp_session)
+MCP_SESSION = None
+_MCP_SESSION_TASK = None
+_MCP_SESSION_STOP = None
+
+def set_correct_ids(user_id: str, call_id: str, caller_number: str = None) -> None:
+    """Set the correct user_id, call_id and caller number to be used by all tools"""
+    global CORRECT_USER_ID, CORRECT_CALL_ID, CALLER_NUMBER
     CORRECT_USER_ID = user_id
     CORRECT_CALL_ID = call_id
-    print(f"DEBUG: Set correct IDs - user_id: {user_id}, call_id: {call_id}")
+    CALLER_NUMBER = caller_number
+    print(f"DEBUG: Set correct IDs - user_id: {user_id}, call_id: {call_id}, caller_number: {caller_number}")
+
+async def _run_mcp_session(headers: dict, ready: asyncio.Future, stop: asyncio.Event) -> None:
+    """Owns the MCP client session for its whole lifetime (anyio requires one task)."""
+    global MCP_SESSION
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    try:
+        async with streamablehttp_client(f"{MCP_SERVER_URL}/mcp/", headers=headers) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                MCP_SESSION = session
+                ready.set_result(True)
+                await stop.wait()
+    except Exception as e:
+        print(f"WARNING: MCP session error: {e}")
+    finally:
+        MCP_SESSION = None
+        if not ready.done():
+            ready.set_result(False)
+
+async def open_mcp_session(user_id: str, call_id: str) -> bool:
+    """
+    Opens one MCP session for the call, binding user_id and call_id at session start.
+
+    Returns True if the session is open. Does nothing unless MCP_TRANSPORT is "mcp";
+    on failure tool calls keep using plain HTTP.
+    """
+    global _MCP_SESSION_TASK, _MCP_SESSION_STOP
+    if MCP_TRANSPORT != "mcp":
+        return False
+    await close_mcp_session()
+
+    headers = {"X-Call-Id": call_id or ""}
+    if CALLER_NUMBER:
+        headers["X-Caller-Number"] = CALLER_NUMBER
+    try:
+        headers["X-User-Id"] = validate_user_id(user_id)
+    except ValueError:
+        print(f"WARNING: Opening MCP session without a valid user_id: {user_id}")
+
+    ready = asyncio.get_running_loop().create_future()
+    _MCP_SESSION_STOP = asyncio.Event()
+    _MCP_SESSION_TASK = asyncio.create_task(_run_mcp_session(headers, ready, _MCP_SESSION_STOP))
+    if not await ready:
+        print("WARNING: Could not open MCP session, falling back to HTTP")
+        return False
+    print(f"DEBUG: Opened MCP session for call_id: {call_id}")
+    return True
+
+async def close_mcp_session() -> None:
+    """Closes the call's MCP session, if one is open."""
+    global _MCP_SESSION_TASK, _MCP_SESSION_STOP
+    task, stop = _MCP_SESSION_TASK, _MCP_SESSION_STOP
+    _MCP_SESSION_TASK = None
+    _MCP_SESSION_STOP = None
+    if task is not None:
+        stop.set()
+        await task
+
+async def start_schedule_replica(user_id: str, call_id: str) -> None:
+    """Starts following the clinic's schedule so near-term availability is answered locally."""
+    global SCHEDULE_REPLICA_CLIENT
+    if not SCHEDULE_REPLICA_ENABLED:
+        return
+    await stop_schedule_replica()
+    try:
+        validated_user_id = validate_user_id(user_id)
+    except ValueError:
+        print(f"WARNING: Not starting schedule replica for invalid user_id: {user_id}")
+        return
+    SCHEDULE_REPLICA_CLIENT = ScheduleReplicaClient(MCP_SERVER_URL, validated_user_id, call_id)
+    await SCHEDULE_REPLICA_CLIENT.start()
+
+async def stop_schedule_replica() -> None:
+    """Stops the schedule replica, if running."""
+    global SCHEDULE_REPLICA_CLIENT
+    client = SCHEDULE_REPLICA_CLIENT
+    SCHEDULE_REPLICA_CLIENT = None
+    if client is not None:
+        await client.stop()
+
+def mcp_http_client() -> httpx.AsyncClient:
+    """Returns an HTTP client for the MCP server with timeouts and connection retries."""
+    return httpx.AsyncClient(timeout=MCP_TIMEOUT, transport=httpx.AsyncHTTPTransport(retries=MCP_CONNECT_RETRIES))
+
+async def call_mcp_tool(tool_name: str, data: dict) -> dict:
+    """Invokes a tool over the open MCP session and returns it as {"result": ...}"""
+    result = await MCP_SESSION.call_tool(tool_name, data)
+    text = "".join(getattr(item, "text", "") for item in result.content)
+    if result.isError:
+        raise RuntimeError(f"MCP tool {tool_name} failed: {text}")
+    try:
+        return {"result": json.loads(text)}
+    except ValueError:
+        return {"result": text}
+
+def _json_body(response: httpx.Response) -> dict:
+    """Returns a response's JSON object body, or {} if it is not JSON (e.g. a proxy's error page)."""
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
 
 async def call_mcp_endpoint(endpoint: str, data: dict, user_id: str = None, call_id: str = None) -> dict:
     """Call an MCP endpoint with the correct user_id and call_id"""
     global CORRECT_USER_ID, CORRECT_CALL_ID
+
+    # Identity is already bound to the MCP session, so reuse it directly
+    if MCP_SESSION is not None:
+        return await call_mcp_tool(endpoint, data)
     
     # Use the correct IDs if available, otherwise use the provided ones
     actual_user_id = CORRECT_USER_ID if CORRECT_USER_ID else user_id
@@ -47,29 +180,84 @@ async def call_mcp_endpoint(endpoint: str, data: dict, user_id: str = None, call
                 validated_user_id = CORRECT_USER_ID
     
     # Make the API call
-    async with httpx.AsyncClient() as client:
+    async with mcp_http_client() as client:
         headers = {}
         if validated_user_id:
             headers["X-User-Id"] = validated_user_id
         if actual_call_id:
             headers["X-Call-Id"] = actual_call_id
+        if CALLER_NUMBER:
+            headers["X-Caller-Number"] = CALLER_NUMBER
         
-        response = await client.post(
-            f"{MCP_SERVER_URL}/{endpoint}",
-            json=data,
-            headers=headers
-        )
+        try:
+            response = await client.post(
+                f"{MCP_SERVER_URL}/{endpoint}",
+                json=data,
+                headers=headers
+            )
+        except httpx.TimeoutException:
+            print(f"WARNING: MCP call {endpoint} timed out")
+            return {"result": "The clinic system did not respond in time. Please try again in a moment."}
+        if response.status_code == 422:
+            # Arguments the server could not read (e.g. a date it could not
+            # understand): tell the model what to correct instead of failing
+            errors = _json_body(response).get("detail") or []
+            messages = [e.get("msg", str(e)) if isinstance(e, dict) else str(e) for e in errors] if isinstance(errors, list) else [str(errors)]
+            return {"result": f"Invalid arguments: {'; '.join(messages)}"}
+        if response.status_code in (429, 503):
+            # Shed by the server's admission control: relay its message
+            print(f"WARNING: MCP call {endpoint} rejected ({response.status_code})")
+            return {"result": _json_body(response).get("result", "The clinic system is busy. Please try again in a moment.")}
         response.raise_for_status()
         return response.json()
 
+def _appointment_page(response: dict) -> Union[dict, str]:
+    """
+    Returns a page of appointments as {"appointments": [...], "next_cursor": ...},
+    or the server's message (e.g. which patient is meant) as is. Over an MCP
+    session the tool already returns the page in that shape.
+    """
+    result = response.get("result")
+    if isinstance(result, list):
+        return {"appointments": result, "next_cursor": response.get("next_cursor")}
+    return result
+
+async def call_mcp_batch(invocations: List[dict], user_id: str = None, call_id: str = None) -> List[dict]:
+    """
+    Runs several independent tool calls in one round-trip.
+
+    Each invocation is {"tool": <endpoint>, "args": {...}}. Returns one
+    {"tool", "result", "error", "elapsed_ms"} item per invocation, in order.
+    If the batch as a whole fails (timeout, shed with 429/503, HTTP error),
+    every item carries the failure in "error" and a None result.
+    """
+    if MCP_SESSION is not None:
+        # Pipeline the calls over the open MCP session instead
+        async def run(invocation: dict) -> dict:
+            try:
+                response = await call_mcp_tool(invocation["tool"], invocation.get("args", {}))
+                return {"tool": invocation["tool"], "result": response["result"], "error": None}
+            except Exception as e:
+                return {"tool": invocation["tool"], "result": None, "error": str(e)}
+        return list(await asyncio.gather(*(run(inv) for inv in invocations)))
+
+    try:
+        response = await call_mcp_endpoint("batch", {"invocations": invocations}, user_id=user_id, call_id=call_id)
+        items = response.get("result")
+        error = None if isinstance(items, list) and len(items) == len(invocations) else str(items)
+    except Exception as e:
+        error = str(e)
+    if error is not None:
+        print(f"WARNING: MCP batch failed: {error}")
+        return [{"tool": inv["tool"], "result": None, "error": error, "elapsed_ms": None} for inv in invocations]
+    return items
+
 @function_tool
 async def schedule_appointment(patient_name: str, assigned_doctor: str, appointment_date: str, appointment_time: str, appointment_reason: str, user_id: str = None, call_id: str = None) -> str:
     """
     Schedules an appointment for a patient with a doctor.
+    Dates and times may be given as the caller said them ("tomorrow", "next Friday", "5 pm").
     """
-    # Format time consistently before sending to server
-    formatted_time = format_time_for_db(appointment_time)
-    
     # Call the MCP endpoint with the correct user_id and call_id
     response = await call_mcp_endpoint(
         "schedule_appointment",
@@ -77,7 +265,7 @@ async def schedule_appointment(patient_name: str, assigned_doctor: str, appointm
             "patient_name": patient_name,
             "assigned_doctor": assigned_doctor,
             "appointment_date": appointment_date,
-            "appointment_time": formatted_time,  # Using formatted time in HH:MM:SS format
+            "appointment_time": appointment_time,  # Resolved to HH:MM:SS by the server
             "appointment_reason": appointment_reason,
         },
         user_id=user_id,
@@ -101,9 +289,19 @@ async def schedule_appointment(patient_name: str, assigned_doctor: str, appointm
 async def check_availability(doctor_name: str, appointment_date: str, appointment_time: str, user_id: str = None, call_id: str = None) -> str:
     """
     Checks the availability of a doctor at a specific time.
+    Dates and times may be given as the caller said them ("tomorrow", "next Friday", "5 pm").
     """
-    # Format time consistently before sending to server
-    formatted_time = format_time_for_db(appointment_time)
+    # Answer from the local schedule replica when the date is inside its window
+    if SCHEDULE_REPLICA_CLIENT is not None:
+        try:
+            resolved_date = parse_datetime_expression(appointment_date)[0]
+            resolved_time = parse_datetime_expression(appointment_time)[1]
+        except ValueError:
+            resolved_date = resolved_time = None
+        if resolved_date and resolved_time:
+            local_result = SCHEDULE_REPLICA_CLIENT.replica.check_availability(doctor_name, resolved_date, resolved_time)
+            if local_result is not None:
+                return local_result
     
     # Call the MCP endpoint with the correct user_id and call_id
     response = await call_mcp_endpoint(
@@ -111,7 +309,7 @@ async def check_availability(doctor_name: str, appointment_date: str, appointmen
         {
             "doctor_name": doctor_name,
             "appointment_date": appointment_date,
-            "appointment_time": formatted_time
+            "appointment_time": appointment_time
         },
         user_id=user_id,
         call_id=call_id
@@ -119,21 +317,57 @@ async def check_availability(doctor_name: str, appointment_date: str, appointmen
     
     return response["result"]
 
+@function_tool
+async def hold_slot(doctor_name: str, appointment_date: str, appointment_time: str, user_id: str = None, call_id: str = None) -> str:
+    """
+    Holds a doctor's slot for this call while the caller confirms, so no other caller can take it.
+    """
+    # Call the MCP endpoint with the correct user_id and call_id
+    response = await call_mcp_endpoint(
+        "hold_slot",
+        {
+            "doctor_name": doctor_name,
+            "appointment_date": appointment_date,
+            "appointment_time": appointment_time
+        },
+        user_id=user_id,
+        call_id=call_id
+    )
+
+    return response["result"]
+
+@function_tool
+async def release_hold(doctor_name: str = None, appointment_date: str = None, appointment_time: str = None, user_id: str = None, call_id: str = None) -> str:
+    """
+    Releases a slot held for this call (or all of its held slots) when the caller declines it.
+    """
+    # Call the MCP endpoint with the correct user_id and call_id
+    response = await call_mcp_endpoint(
+        "release_hold",
+        {
+            "doctor_name": doctor_name,
+            "appointment_date": appointment_date,
+            "appointment_time": appointment_time
+        },
+        user_id=user_id,
+        call_id=call_id
+    )
+
+    return response["result"]
+
 @function_tool
 async def reschedule_appointment(appointment_id: str, new_date: str, new_time: str, user_id: str = None, call_id: str = None) -> str:
     """
     Reschedules an existing appointment.
+    Dates and times may be given as the caller said them ("tomorrow", "next Friday", "5 pm").
     """
-    # Format time consistently before sending to server
-    formatted_time = format_time_for_db(new_time)
-    
     # Call the MCP endpoint with the correct user_id and call_id
     response = await call_mcp_endpoint(
         "reschedule_appointment",
         {
             "appointment_id": appointment_id,
             "new_date": new_date,
-            "new_time": formatted_time
+            "new_time": new_time
         },
         user_id=user_id,
         call_id=call_id
@@ -238,7 +472,7 @@ async def call_mcp(tool_name: str, args: dict) -> dict:
     """
     Calls an MCP tool dynamically.
     """
-    async with httpx.AsyncClient() as client:
+    async with mcp_http_client() as client:
         response = await client.post(
             f"{MCP_SERVER_URL}/{{tool_name}}",
             json=args,
@@ -251,6 +485,12 @@ async def get_available_slots(doctor_name: str, appointment_date: str, user_id:
     """
     Fetches available 30-minute appointment slots for a given doctor on a specific date.
     """
+    # Answer from the local schedule replica when the date is inside its window
+    if SCHEDULE_REPLICA_CLIENT is not None:
+        local_slots = SCHEDULE_REPLICA_CLIENT.replica.available_slots(doctor_name, appointment_date)
+        if local_slots is not None:
+            return local_slots
+
     # Call the MCP endpoint with the correct user_id and call_id
     response = await call_mcp_endpoint(
         "get_available_slots",
@@ -264,19 +504,42 @@ async def get_available_slots(doctor_name: str, appointment_date: str, user_id:
     
     return response["result"]
 
+@function_tool
+async def next_available(doctor_name: str = None, specialty: str = None, from_date: str = None, from_time: str = None, days: int = 7, user_id: str = None, call_id: str = None) -> list:
+    """
+    Finds the earliest openings for a doctor, or any doctor of a specialty, across the next few days.
+    Returns up to 3 openings (doctor_name, appointment_date, appointment_time), closest to the requested date and time first.
+    from_date and from_time may be given as the caller said them ("tomorrow", "evening").
+    """
+    # Call the MCP endpoint with the correct user_id and call_id
+    response = await call_mcp_endpoint(
+        "next_available",
+        {
+            "doctor_name": doctor_name,
+            "specialty": specialty,
+            "from_date": from_date,
+            "from_time": from_time,
+            "days": days,
+        },
+        user_id=user_id,
+        call_id=call_id
+    )
+
+    return response["result"]
+
 @function_tool
 def get_today_date() -> str:
     """
-    Returns the current date in YYYY-MM-DD format.
+    Returns the current date (IST) in YYYY-MM-DD format.
     """
-    return datetime.now().strftime("%Y-%m-%d")
+    return datetime.now(IST).strftime("%Y-%m-%d")
 
 @function_tool
 async def summarize_call(transcript: str) -> str:
     """
     Summarizes a given conversation transcript using an LLM.
     """
-    async with httpx.AsyncClient() as client:
+    async with mcp_http_client() as client:
         response = await client.post(
             f"{MCP_SERVER_URL}/summarize_call",
             json={
@@ -287,9 +550,15 @@ async def summarize_call(transcript: str) -> str:
         return response.json()["result"]
 
 @function_tool
-async def get_appointment_details(patient_name: str, user_id: str = None, call_id: str = None, assigned_doctor: Optional[str] = None, appointment_date: Optional[str] = None) -> List[dict]:
+async def get_appointment_details(patient_name: str, user_id: str = None, call_id: str = None, assigned_doctor: Optional[str] = None, appointment_date: Optional[str] = None, include_past: bool = False, limit: int = 5, cursor: Optional[str] = None) -> Union[dict, str]:
     """
     Fetches appointment details based on patient name, doctor, and date.
+    Without a date, only the next few upcoming appointments are returned
+    unless include_past is set. Returns {"appointments": [...], "next_cursor": ...};
+    when next_cursor is set, more appointments exist: pass it as cursor to get them.
+    If several patients have names like the one given, returns a message
+    listing them instead; ask the caller which one they mean and call again
+    with that exact name.
     """
     # Call the MCP endpoint with the correct user_id and call_id
     response = await call_mcp_endpoint(
@@ -298,29 +567,39 @@ async def get_appointment_details(patient_name: str, user_id: str = None, call_i
             "patient_name": patient_name,
             "assigned_doctor": assigned_doctor,
             "appointment_date": appointment_date,
+            "include_past": include_past,
+            "limit": limit,
+            "cursor": cursor,
         },
         user_id=user_id,
         call_id=call_id
     )
     
-    return response["result"]
+    return _appointment_page(response)
 
 @function_tool
-async def list_appointments_for_patient(patient_name: str, user_id: str = None, call_id: str = None) -> List[dict]:
+async def list_appointments_for_patient(patient_name: str, user_id: str = None, call_id: str = None, limit: int = 5, cursor: Optional[str] = None) -> Union[dict, str]:
     """
-    Lists all upcoming appointments for a given patient.
+    Lists the next upcoming appointments for a given patient.
+    Returns {"appointments": [...], "next_cursor": ...}; when next_cursor is
+    set, more appointments exist: pass it as cursor to get them.
+    If several patients have names like the one given, returns a message
+    listing them instead; ask the caller which one they mean and call again
+    with that exact name.
     """
     # Call the MCP endpoint with the correct user_id and call_id
     response = await call_mcp_endpoint(
         "list_appointments_for_patient",
         {
             "patient_name": patient_name,
+            "limit": limit,
+            "cursor": cursor,
         },
         user_id=user_id,
         call_id=call_id
     )
     
-    return response["result"]
+    return _appointment_page(response)
 
 @function_tool
 async def get_user_id_by_agent_phone(agent_phone: str, call_id: str = None) -> Optional[str]:
@@ -1,18 +1,167 @@
 """
 Utility functions for data type consistency in the AI receptionist system.
 This module provides standardized functions for handling time formats, user IDs,
-and timezone conversions to ensure consistency across the application.
+phone numbers, timezone conversions and spoken date/time expressions to ensure
+consistency across the application.
 """
 
+import functools
+import os
 import re
 import uuid
-from datetime import datetime
-from typing import Optional, Union
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple, Union
+import phonenumbers
 import pytz
 
 # Define Indian Standard Time (IST) timezone
 IST = pytz.timezone('Asia/Kolkata')
 
+# Machine-formatted dates and times ("14:30", "2:30 PM", "2025-07-01T14:30:00Z",
+# "01/07/2025 9:00 am") are read in a single scan over one token stream. These
+# are parsed for every slot, working-hours range and calendar event, so the
+# public parsers memoize their results.
+
+_TOKEN_RE = re.compile(r"""
+    (?P<num>\d+)
+  | (?P<frac>\.\d+)
+  | (?P<meridiem>[ap]\.?m\b\.?)
+  | (?P<zulu>z\b)
+  | (?P<sep>[:/+t-])
+  | (?P<space>[\s,]+)
+""", re.VERBOSE | re.IGNORECASE)
+
+def _scan(text: str) -> Tuple[Optional[Tuple[int, int, int]], Optional[Tuple[int, int, int]]]:
+    """
+    Reads `[date] [time]` from text, where date is YYYY-MM-DD or DD/MM/YYYY and
+    time is H:MM[:SS[.fff]] with optional AM/PM and UTC offset (ignored), or H AM/PM.
+    
+    Returns:
+        ((year, month, day) or None, (hour, minute, second) or None)
+        
+    Raises:
+        ValueError: If anything in the text is not part of a valid date or time
+    """
+    tokens = []
+    pos, text = 0, text.strip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            raise ValueError(f"Unexpected character {text[pos]!r} in {text!r}")
+        if match.lastgroup != "space":
+            tokens.append((match.lastgroup, match.group().lower()))
+        pos = match.end()
+
+    def kind(j):
+        return tokens[j][0] if j < len(tokens) else None
+
+    def value(j):
+        return tokens[j][1] if j < len(tokens) else None
+
+    i = 0
+    day = clock = None
+    if kind(0) == "num" and kind(1) == "sep" and value(1) in "-/" and kind(2) == "num" \
+            and value(3) == value(1) and kind(4) == "num":
+        first, month, last = int(value(0)), int(value(2)), int(value(4))
+        if len(value(0)) == 4:
+            day = (first, month, last)
+        else:
+            day = (last + (2000 if len(value(4)) == 2 else 0), month, first)
+        date(*day)  # Rejects impossible dates
+        i = 5
+        if value(i) == "t":
+            i += 1
+
+    if kind(i) == "num":
+        hour, minute, second = int(value(i)), 0, 0
+        i += 1
+        has_minutes = False
+        if value(i) == ":" and kind(i + 1) == "num" and len(value(i + 1)) == 2:
+            minute, has_minutes = int(value(i + 1)), True
+            i += 2
+            if value(i) == ":" and kind(i + 1) == "num" and len(value(i + 1)) == 2:
+                second = int(value(i + 1))
+                i += 2
+                if kind(i) == "frac":
+                    i += 1
+        if kind(i) == "meridiem":
+            if not 1 <= hour <= 12:
+                raise ValueError(f"Invalid 12-hour time in {text!r}")
+            hour = hour % 12 + (12 if value(i).startswith("p") else 0)
+            i += 1
+        elif not has_minutes:
+            raise ValueError(f"Missing minutes or AM/PM in {text!r}")
+        if kind(i) == "zulu":
+            i += 1
+        elif kind(i) == "sep" and value(i) in "+-" and kind(i + 1) == "num":
+            i += 2
+            if value(i) == ":" and kind(i + 1) == "num":
+                i += 2
+        if hour > 23 or minute > 59 or second > 59:
+            raise ValueError(f"Invalid time in {text!r}")
+        clock = (hour, minute, second)
+
+    if i != len(tokens) or (day is None and clock is None):
+        raise ValueError(f"Unrecognized date/time format: {text!r}")
+    return day, clock
+
+@functools.lru_cache(maxsize=8192)
+def parse_time(value: str) -> str:
+    """
+    Parses a time (or the time part of a datetime) to HH:MM:SS.
+    
+    Raises:
+        ValueError: If the value is not a valid time
+    """
+    _, clock = _scan(value)
+    if clock is None:
+        raise ValueError(f"No time in {value!r}")
+    return "%02d:%02d:%02d" % clock
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(value: str) -> str:
+    """
+    Parses a date (or the date part of a datetime) to YYYY-MM-DD.
+    
+    Raises:
+        ValueError: If the value is not a valid date
+    """
+    day, _ = _scan(value)
+    if day is None:
+        raise ValueError(f"No date in {value!r}")
+    return "%04d-%02d-%02d" % day
+
+@functools.lru_cache(maxsize=4096)
+def parse_datetime(value: str) -> datetime:
+    """
+    Parses a date with a time (e.g. "2025-07-01 14:30", "01/07/2025 2:30 PM") to a naive datetime.
+    
+    Raises:
+        ValueError: If the value is not a valid date and time
+    """
+    day, clock = _scan(value)
+    if day is None or clock is None:
+        raise ValueError(f"Expected a date and a time in {value!r}")
+    return datetime(*day, *clock)
+
+def normalize_times(values: Iterable[str]) -> List[str]:
+    """
+    Parses a batch of times (slot lists, bulk imports) to HH:MM:SS, in order.
+    
+    Raises:
+        ValueError: If any value is not a valid time
+    """
+    return [parse_time(value) for value in values]
+
+def normalize_dates(values: Iterable[str]) -> List[str]:
+    """
+    Parses a batch of dates to YYYY-MM-DD, in order.
+    
+    Raises:
+        ValueError: If any value is not a valid date
+    """
+    return [parse_date(value) for value in values]
+
 def format_time_for_db(time_str: str) -> str:
     """
     Ensures time is in HH:MM:SS format for database operations.
@@ -23,6 +172,9 @@ def format_time_for_db(time_str: str) -> str:
     Returns:
         A string in HH:MM:SS format
         
+    Raises:
+        ValueError: If the time format is not recognized
+        
     Examples:
         >>> format_time_for_db("14:30")
         "14:30:00"
@@ -31,61 +183,12 @@ def format_time_for_db(time_str: str) -> str:
         >>> format_time_for_db("14:30:45")
         "14:30:45"
     """
-    # Handle ISO format timestamps (common in API responses)
-    iso_match = re.match(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})', time_str)
-    if iso_match:
-        try:
-            dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-            return dt.strftime('%H:%M:%S')
-        except ValueError:
-            pass
-    
-    # Check if time is in 12-hour format with AM/PM
-    am_pm_match = re.match(r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*(AM|PM)', time_str, re.IGNORECASE)
-    if am_pm_match:
-        hour = int(am_pm_match.group(1))
-        minute = int(am_pm_match.group(2))
-        second = int(am_pm_match.group(3)) if am_pm_match.group(3) else 0
-        
-        # Convert to 24-hour format
-        if am_pm_match.group(4).upper() == 'PM' and hour < 12:
-            hour += 12
-        elif am_pm_match.group(4).upper() == 'AM' and hour == 12:
-            hour = 0
-            
-        return f"{hour:02d}:{minute:02d}:{second:02d}"
-    
-    # Check if time is in 24-hour format without seconds
-    hour_minute_match = re.match(r'(\d{1,2}):(\d{2})$', time_str)
-    if hour_minute_match:
-        hour = int(hour_minute_match.group(1))
-        minute = int(hour_minute_match.group(2))
-        return f"{hour:02d}:{minute:02d}:00"
-    
-    # Check if time is already in HH:MM:SS format
-    full_time_match = re.match(r'(\d{1,2}):(\d{2}):(\d{2})$', time_str)
-    if full_time_match:
-        hour = int(full_time_match.group(1))
-        minute = int(full_time_match.group(2))
-        second = int(full_time_match.group(3))
-        return f"{hour:02d}:{minute:02d}:{second:02d}"
-    
-    # If format is not recognized, try to parse with datetime
     try:
-        # Try various formats
-        for fmt in ('%H:%M', '%I:%M %p', '%H:%M:%S', '%I:%M:%S %p'):
-            try:
-                dt = datetime.strptime(time_str, fmt)
-                return dt.strftime('%H:%M:%S')
-            except ValueError:
-                continue
-        
-        # If all parsing attempts fail, raise an exception
-        raise ValueError(f"Time format not recognized: {time_str}")
-    except Exception as e:
-        # If all else fails, return the original string with a warning
+        return parse_time(time_str)
+    except (ValueError, TypeError) as e:
+        # Never let an unparseable time reach the database
         print(f"Warning: Could not format time string '{time_str}': {e}")
-        return time_str
+        raise ValueError(f"Time format not recognized: {time_str}")
 
 def validate_user_id(user_id: Union[str, uuid.UUID]) -> str:
     """
@@ -117,6 +220,36 @@ def validate_user_id(user_id: Union[str, uuid.UUID]) -> str:
     except (ValueError, AttributeError, TypeError) as e:
         raise ValueError(f"Invalid user_id format: {user_id}. Error: {e}")
 
+def normalize_phone_number(phone_number: Optional[str], default_region: str = "IN") -> Optional[str]:
+    """
+    Normalizes a phone number to E.164 format so it can be used as a lookup key.
+    
+    Args:
+        phone_number: A phone number in any common format; numbers without a
+            country code are read as numbers of default_region
+        default_region: ISO country code assumed for national numbers
+        
+    Returns:
+        The number in E.164 format, or None if it is missing or not a valid number
+        
+    Examples:
+        >>> normalize_phone_number("098765 43210")
+        "+919876543210"
+        >>> normalize_phone_number("+91-98765-43210")
+        "+919876543210"
+        >>> normalize_phone_number("12345")
+        None
+    """
+    if not phone_number:
+        return None
+    try:
+        parsed = phonenumbers.parse(str(phone_number).strip(), default_region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
 def convert_to_ist(dt: Union[datetime, str], input_format: Optional[str] = None) -> datetime:
     """
     Converts a datetime object or string to Indian Standard Time (IST).
@@ -175,12 +308,8 @@ def format_datetime_for_google_calendar(dt: Union[datetime, None] = None, date_s
     """
     if dt is None:
         if date_str and time_str:
-            # Ensure time is in HH:MM:SS format
-            time_str = format_time_for_db(time_str)
-            # Combine date and time strings
-            dt_str = f"{date_str} {time_str}"
-            # Parse the combined string
-            dt = datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
+            # Parse the combined date and time (any format parse_time accepts)
+            dt = parse_datetime(f"{date_str} {time_str}")
             # Localize to IST
             dt = IST.localize(dt)
         else:
@@ -193,4 +322,239 @@ def format_datetime_for_google_calendar(dt: Union[datetime, None] = None, date_s
         dt = dt.astimezone(IST)
     
     # Return ISO formatted string
-    return dt.isoformat()
\ No newline at end of file
+    return dt.isoformat()
+
+# Spoken date/time expressions ("tomorrow evening", "next Friday at 5",
+# "15th March 3:30 pm"), resolved in IST. A phrase is matched by the date rules
+# first; the time rules then run on the rest of the text.
+
+_WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thurs": 3, "friday": 4, "fri": 4, "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+_MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+_COUNTS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+# Start of each part of the day, and whether bare hours in it are afternoon hours
+_PARTS_OF_DAY = {"morning": (9, False), "afternoon": (14, True), "evening": (17, True), "night": (19, True), "tonight": (19, True)}
+# Number words read as digits ("half past ten", "ten thirty", "at seven")
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50,
+}
+_NUMBER_WORD_RE = re.compile(rf"\b({'|'.join(sorted(_NUMBER_WORDS, key=len, reverse=True))})\b")
+
+# Clinic opening hours (24-hour clock) used to read a bare hour such as "at 7":
+# it is taken as an afternoon hour when the clinic is closed at that hour in
+# the morning but open at it in the afternoon
+CLINIC_OPEN_HOUR = int(os.getenv("CLINIC_OPEN_HOUR", "9"))
+CLINIC_CLOSE_HOUR = int(os.getenv("CLINIC_CLOSE_HOUR", "19"))
+
+_WEEKDAY = "|".join(sorted(_WEEKDAYS, key=len, reverse=True))
+_MONTH = "|".join(sorted(_MONTHS, key=len, reverse=True))
+_COUNT = "|".join(_COUNTS)
+
+_DATE_RULES = [
+    ("iso", re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")),
+    ("dmy", re.compile(r"\b(\d{1,2})[/.](\d{1,2})[/.](\d{2}|\d{4})\b")),
+    ("relative", re.compile(r"\b(day after tomorrow|tomorrow|today|tonight)\b")),
+    ("offset", re.compile(rf"\bin (\d+|{_COUNT}) (days?|weeks?)\b")),
+    ("next_week", re.compile(r"\bnext week\b")),
+    ("weekday", re.compile(rf"\b(?:(this|next|coming) )?({_WEEKDAY})\b")),
+    ("day_month", re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?(?: of)? ({_MONTH})\b(?:,? (\d{{4}}))?")),
+    ("month_day", re.compile(rf"\b({_MONTH}) (\d{{1,2}})(?:st|nd|rd|th)?\b(?:,? (\d{{4}}))?")),
+    ("ordinal", re.compile(r"\b(?:the )?(\d{1,2})(?:st|nd|rd|th)\b")),
+]
+
+_TIME_RULES = [
+    ("clock", re.compile(r"\b(\d{1,2})[:.](\d{2})(?:[:.](\d{2}))?(?:\s*(am|pm))?\b")),
+    ("spoken", re.compile(r"\b(\d{1,2}) (\d{2})(?:\s*(am|pm))?\b")),
+    ("hour", re.compile(r"\b(\d{1,2})\s*(am|pm)\b")),
+    ("fraction", re.compile(r"\b(half|quarter) (past|to) (\d{1,2})\b")),
+    ("oclock", re.compile(r"\b(\d{1,2}) oclock\b")),
+    ("at", re.compile(r"\bat (\d{1,2})\b")),
+    ("hour_part", re.compile(rf"\b(\d{{1,2}}) (?:in the )?({'|'.join(_PARTS_OF_DAY)})\b")),
+    ("part_hour", re.compile(rf"\b({'|'.join(_PARTS_OF_DAY)}) (?:at )?(\d{{1,2}})\b")),
+    ("noon", re.compile(r"\b(noon|midday|midnight)\b")),
+    # A lone hour ("5", "five"), once any date has been taken out
+    ("bare", re.compile(r"^\s*(\d{1,2})\s*$")),
+]
+_PART_OF_DAY_RULE = re.compile(rf"\b({'|'.join(_PARTS_OF_DAY)})\b")
+
+def _normalize_expression(text: str) -> str:
+    text = text.strip().lower()
+    text = re.sub(r"(\d)t(\d)", r"\1 \2", text)  # ISO datetime separator
+    text = re.sub(r"(\d{1,2}:\d{2}(?::\d{2})?)(?:\.\d+)?(?:z|[+-]\d{2}:?\d{2})", r"\1", text)  # UTC offset
+    text = text.replace("a.m.", "am").replace("p.m.", "pm").replace("o'clock", "oclock")
+    text = re.sub(r"\b(twenty|thirty|forty|fifty)[ -](five)\b", lambda m: str(_NUMBER_WORDS[m.group(1)] + 5), text)
+    text = _NUMBER_WORD_RE.sub(lambda m: str(_NUMBER_WORDS[m.group(1)]), text)
+    text = re.sub(r"\b(\d{1,2}) o (\d)\b", r"\1 0\2", text)  # "ten o five"
+    return re.sub(r"\s+", " ", text)
+
+def _next_date_with_day(today: date, day: int) -> date:
+    """Returns the first date on or after today with the given day of month."""
+    year, month = today.year, today.month
+    for _ in range(13):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            candidate = None
+        if candidate and candidate >= today:
+            return candidate
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    raise ValueError(f"Invalid day of month: {day}")
+
+def _resolve_date_rule(rule: str, match: re.Match, today: date) -> date:
+    groups = match.groups()
+    if rule == "iso":
+        return date(int(groups[0]), int(groups[1]), int(groups[2]))
+    if rule == "dmy":
+        year = int(groups[2]) + (2000 if len(groups[2]) == 2 else 0)
+        return date(year, int(groups[1]), int(groups[0]))
+    if rule == "relative":
+        return today + timedelta(days={"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}[groups[0]])
+    if rule == "offset":
+        count = int(groups[0]) if groups[0].isdigit() else _COUNTS[groups[0]]
+        return today + timedelta(days=count * (7 if groups[1].startswith("week") else 1))
+    if rule == "next_week":
+        return today + timedelta(days=7)
+    if rule == "weekday":
+        weekday = _WEEKDAYS[groups[1]]
+        if groups[0] == "next":
+            # "next Friday" is the Friday of next week
+            return today + timedelta(days=7 - today.weekday() + weekday)
+        return today + timedelta(days=(weekday - today.weekday()) % 7)
+    if rule in ("day_month", "month_day"):
+        day, month = (groups[0], groups[1]) if rule == "day_month" else (groups[1], groups[0])
+        if groups[2]:
+            return date(int(groups[2]), _MONTHS[month], int(day))
+        candidate = date(today.year, _MONTHS[month], int(day))
+        return candidate if candidate >= today else date(today.year + 1, _MONTHS[month], int(day))
+    return _next_date_with_day(today, int(groups[0]))
+
+def _resolve_time_rule(rule: str, match: re.Match, part_of_day: Optional[str]) -> Tuple[int, int, int]:
+    groups = match.groups()
+    meridiem = None
+    hour, minute, second = 0, 0, 0
+    if rule == "clock":
+        hour, minute, second = int(groups[0]), int(groups[1]), int(groups[2] or 0)
+        meridiem = groups[3]
+    elif rule == "spoken":
+        hour, minute, meridiem = int(groups[0]), int(groups[1]), groups[2]
+    elif rule == "hour":
+        hour, meridiem = int(groups[0]), groups[1]
+    elif rule == "fraction":
+        hour = int(groups[2])
+        minute = 30 if groups[0] == "half" else 15
+        if groups[1] == "to":
+            hour, minute = (hour - 1) % 12 or 12, 60 - minute
+    elif rule in ("oclock", "at", "bare"):
+        hour = int(groups[0])
+    elif rule == "hour_part":
+        hour, part_of_day = int(groups[0]), groups[1]
+    elif rule == "part_hour":
+        hour, part_of_day = int(groups[1]), groups[0]
+    else:
+        return (0, 0, 0) if groups[0] == "midnight" else (12, 0, 0)
+
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid hour for {meridiem}: {hour}")
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    elif hour < 12 and (part_of_day or rule != "clock"):
+        # A bare hour is in the afternoon if the caller said so, or if the
+        # clinic is closed then in the morning but open in the afternoon
+        afternoon = _PARTS_OF_DAY[part_of_day][1] if part_of_day else 1 <= hour < CLINIC_OPEN_HOUR and hour + 12 <= CLINIC_CLOSE_HOUR
+        if afternoon:
+            hour += 12
+    if hour > 23 or minute > 59 or second > 59:
+        raise ValueError(f"Invalid time: {match.group(0)}")
+    return hour, minute, second
+
+@functools.lru_cache(maxsize=4096)
+def _parse_expression(text: str, today: date) -> Tuple[Optional[date], Optional[str]]:
+    """Parses a normalized expression into (date, HH:MM:SS time); either part may be missing."""
+    part_match = _PART_OF_DAY_RULE.search(text)
+    part_of_day = part_match.group(1) if part_match else None
+    resolved_date = None
+    for rule, pattern in _DATE_RULES:
+        match = pattern.search(text)
+        if match:
+            resolved_date = _resolve_date_rule(rule, match, today)
+            text = text[:match.start()] + " " + text[match.end():]
+            break
+
+    resolved_time = None
+    for rule, pattern in _TIME_RULES:
+        match = pattern.search(text)
+        if match:
+            resolved_time = "%02d:%02d:%02d" % _resolve_time_rule(rule, match, part_of_day)
+            break
+    if resolved_time is None and part_of_day and not re.search(r"\d", text):
+        # Only a part of the day ("tomorrow evening"); a number left over
+        # that no rule could read is not replaced by the part's start
+        resolved_time = "%02d:00:00" % _PARTS_OF_DAY[part_of_day][0]
+    return resolved_date, resolved_time
+
+def parse_datetime_expression(text: str, now: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Resolves a date and/or time as a caller might say it, relative to now in IST.
+    
+    Args:
+        text: An expression such as "tomorrow evening", "next Friday at 5",
+            "15th March 3:30 pm", "2025-07-01" or "14:30"
+        now: Reference time (defaults to the current time in IST)
+        
+    Returns:
+        (YYYY-MM-DD or None, HH:MM:SS or None)
+        
+    Raises:
+        ValueError: If the expression names an impossible date or time
+        
+    Examples:
+        >>> parse_datetime_expression("tomorrow evening", datetime(2025, 7, 1, 10, 0))
+        ("2025-07-02", "17:00:00")
+        >>> parse_datetime_expression("next friday at 5", datetime(2025, 7, 1, 10, 0))
+        ("2025-07-11", "17:00:00")
+    """
+    today = (now or datetime.now(IST)).date()
+    resolved_date, resolved_time = _parse_expression(_normalize_expression(text), today)
+    return (resolved_date.strftime("%Y-%m-%d") if resolved_date else None), resolved_time
+
+def resolve_date(text: str, now: Optional[datetime] = None) -> str:
+    """
+    Resolves a date expression ("today", "next Monday", "2025-07-01") to YYYY-MM-DD.
+    
+    Raises:
+        ValueError: If no valid date can be read from the text
+    """
+    try:
+        return parse_date(str(text))
+    except ValueError:
+        pass
+    resolved_date, _ = parse_datetime_expression(str(text), now)
+    if resolved_date is None:
+        raise ValueError(f"Could not understand the date '{text}'")
+    return resolved_date
+
+def resolve_time(text: str) -> str:
+    """
+    Resolves a time expression ("5 pm", "half past 3", "evening", "14:30") to HH:MM:SS.
+    
+    Raises:
+        ValueError: If no valid time can be read from the text
+    """
+    try:
+        return parse_time(str(text))
+    except ValueError:
+        pass
+    _, resolved_time = parse_datetime_expression(str(text))
+    if resolved_time is None:
+        raise ValueError(f"Could not understand the time '{text}'")
+    return resolved_time